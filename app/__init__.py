@@ -34,10 +34,16 @@ def create_app(config_name='default'):
     app.config['THUMBNAIL_FOLDER'] = 'static/uploads/thumbnails'
     app.config['PHOTOBOOTH_FOLDER'] = 'static/uploads/photobooth'
     app.config['BORDER_FOLDER'] = 'static/uploads/borders'
+    app.config['DERIVATIVE_FOLDER'] = 'static/uploads/derivatives'
+    app.config['RENDITION_FOLDER'] = 'static/uploads/renditions'  # Cached slideshow image sizes
+    app.config['BACKUP_FOLDER'] = os.environ.get('BACKUP_FOLDER', 'data/backups')
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB for videos
     app.config['ALLOWED_IMAGE_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     app.config['ALLOWED_VIDEO_EXTENSIONS'] = {'mp4', 'mov', 'avi', 'webm'}
     app.config['MAX_VIDEO_DURATION'] = 15  # seconds
+    app.config['IMAGE_DERIVATIVE_WIDTHS'] = (320, 640, 1280)  # Responsive image sizes
+    app.config['IMAGE_THUMBNAIL_WIDTH'] = 640  # Gallery cards use the smallest derivative at least this wide
+    app.config['IMAGE_DERIVATIVE_QUALITY'] = 82  # JPEG quality for derivatives
 
     # Email configuration
     app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -59,6 +65,19 @@ def create_app(config_name='default'):
         from app.utils.settings_utils import format_datetime_in_timezone
         return format_datetime_in_timezone(dt, format_str)
 
+    # Register Jinja2 filters for responsive gallery images
+    @app.template_filter('photo_thumbnail_url')
+    def photo_thumbnail_url(photo, min_width=None):
+        """Smallest image rendition suitable for a gallery card"""
+        from app.utils.image_utils import get_photo_thumbnail_url
+        return get_photo_thumbnail_url(photo, min_width)
+
+    @app.template_filter('photo_srcset')
+    def photo_srcset(photo):
+        """srcset attribute value listing a photo's derivatives"""
+        from app.utils.image_utils import get_photo_srcset
+        return get_photo_srcset(photo)
+
     # Ensure upload directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['GUESTBOOK_UPLOAD_FOLDER'], exist_ok=True)
@@ -67,6 +86,8 @@ def create_app(config_name='default'):
     os.makedirs(app.config['THUMBNAIL_FOLDER'], exist_ok=True)
     os.makedirs(app.config['PHOTOBOOTH_FOLDER'], exist_ok=True)
     os.makedirs(app.config['BORDER_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['DERIVATIVE_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['RENDITION_FOLDER'], exist_ok=True)
 
     # Register blueprints
     from app.views.main import main_bp
@@ -1,17 +1,19 @@
-from app.models.photo import Photo, Comment, Like
+from app.models.photo import Photo, Comment, Like, Tag, PhotoTag
 from app.models.guestbook import GuestbookEntry
 from app.models.messages import Message, MessageComment, MessageLike
 from app.models.settings import Settings
-from app.models.email import EmailLog, ImmichSyncLog
-from app.models.notifications import NotificationUser, Notification
+from app.models.email import EmailLog, ProcessedEmail, ImmichSyncLog, ImmichAsset
+from app.models.notifications import NotificationUser, Notification, NotificationBroadcast
 from app.models.slideshow import SlideshowSettings, SlideshowActivity
+from app.models.jobs import MediaJob, LeaderLease
 
 __all__ = [
-    'Photo', 'Comment', 'Like',
+    'Photo', 'Comment', 'Like', 'Tag', 'PhotoTag',
     'GuestbookEntry',
     'Message', 'MessageComment', 'MessageLike',
     'Settings',
-    'EmailLog', 'ImmichSyncLog',
-    'NotificationUser', 'Notification',
-    'SlideshowSettings', 'SlideshowActivity'
+    'EmailLog', 'ProcessedEmail', 'ImmichSyncLog', 'ImmichAsset',
+    'NotificationUser', 'Notification', 'NotificationBroadcast',
+    'SlideshowSettings', 'SlideshowActivity',
+    'MediaJob', 'LeaderLease'
 ] 
\ No newline at end of file
@@ -10,8 +10,24 @@ class EmailLog(db.Model):
     status = db.Column(db.String(50), nullable=False)  # 'success', 'rejected', 'error'
     photo_count = db.Column(db.Integer, default=0)
     error_message = db.Column(db.Text)
-    response_sent = db.Column(db.Boolean, default=False)
+    response_sent = db.Column(db.Boolean, default=False)  # True once the reply was delivered
     response_type = db.Column(db.String(50))  # 'confirmation', 'rejection'
+    response_details = db.Column(db.Text)  # JSON needed to build the reply (photo count, gallery URL or reason)
+    delivery_status = db.Column(db.String(20))  # 'pending', 'sending', 'sent', 'failed'; None when no reply is sent
+    delivery_attempts = db.Column(db.Integer, default=0)
+    delivery_error = db.Column(db.Text)
+    next_delivery_at = db.Column(db.DateTime, index=True)  # When a pending reply is (re)tried
+    delivered_at = db.Column(db.DateTime)
+
+class ProcessedEmail(db.Model):
+    """Incoming emails already taken for processing, so duplicates are skipped across restarts and workers"""
+    id = db.Column(db.Integer, primary_key=True)
+    message_key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the Message-ID, or of sender, subject, date and attachments without one
+    message_id = db.Column(db.String(255))
+    sender_email = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='processing')  # 'processing', 'done'
+    claimed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    processed_at = db.Column(db.DateTime)
 
 class ImmichSyncLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,6 +39,26 @@ class ImmichSyncLog(db.Model):
     error_message = db.Column(db.Text)
     retry_count = db.Column(db.Integer, default=0)
     last_retry = db.Column(db.DateTime)
+    next_retry_at = db.Column(db.DateTime, index=True)  # When a failed sync is retried; None once resolved or given up
+    description = db.Column(db.Text)  # Asset description, kept so retries upload the same metadata
+
+class ImmichAsset(db.Model):
+    """Per-file Immich sync state, used to skip unchanged files and resume interrupted syncs"""
+    id = db.Column(db.Integer, primary_key=True)
+    file_path = db.Column(db.String(500), unique=True, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    source_type = db.Column(db.String(20))  # 'photo', 'video', 'photobooth', 'guestbook', 'message'
+    source_id = db.Column(db.Integer)
+    checksum = db.Column(db.String(40))  # SHA-1 of the uploaded content, as Immich stores it
+    file_size = db.Column(db.BigInteger)
+    file_mtime = db.Column(db.Float)
+    status = db.Column(db.String(20), default='pending', index=True)  # 'pending', 'synced', 'error'
+    immich_asset_id = db.Column(db.String(255))
+    album_added = db.Column(db.Boolean, default=False)
+    attempts = db.Column(db.Integer, default=0)
+    error_message = db.Column(db.Text)
+    last_attempt_at = db.Column(db.DateTime)
+    synced_at = db.Column(db.DateTime)
 
 class SystemLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,24 @@
+from app import db
+from datetime import datetime
+
+class MediaJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)  # 'process_video', 'image_derivatives', 'immich_sync', 'immich_bulk_sync', 'immich_album_flush', 'immich_retry', 'send_email_responses', 'create_backup', 'send_broadcast_push'
+    payload = db.Column(db.Text)  # JSON arguments for the job handler
+    status = db.Column(db.String(20), default='pending', index=True)  # 'pending', 'running', 'success', 'error'
+    user_identifier = db.Column(db.String(100), index=True)  # Uploader who triggered the job
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    error_message = db.Column(db.Text)
+    worker_id = db.Column(db.String(100))  # Worker currently holding the job
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Earliest time the job may run
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class LeaderLease(db.Model):
+    """Time-limited lease electing the one process that runs singleton background services"""
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)  # host:pid:token of the process holding the lease
+    expires_at = db.Column(db.DateTime, nullable=False)  # free for others to take once this has passed
+    acquired_at = db.Column(db.DateTime)
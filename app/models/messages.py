@@ -10,6 +10,7 @@ class Message(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     likes = db.Column(db.Integer, default=0)
     is_hidden = db.Column(db.Boolean, default=False)
+    comment_count = db.Column(db.Integer, default=0)  # Denormalized count of visible comments
     message_comments = db.relationship('MessageComment', backref='message', lazy=True, cascade='all, delete-orphan')
 
 class MessageComment(db.Model):
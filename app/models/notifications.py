@@ -25,4 +25,20 @@ class Notification(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     # Navigation fields
     content_type = db.Column(db.String(50))  # 'photo', 'message', 'admin'
-    content_id = db.Column(db.Integer)  # ID of the photo, message, etc. 
\ No newline at end of file
+    content_id = db.Column(db.Integer)  # ID of the photo, message, etc.
+    broadcast_id = db.Column(db.Integer, index=True)  # NotificationBroadcast this copy was fanned out from
+
+class NotificationBroadcast(db.Model):
+    """A mass notification, sent once and fanned out to every enabled user"""
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    notification_type = db.Column(db.String(50), default='admin')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    recipient_count = db.Column(db.Integer, default=0)
+    # Push delivery progress, kept so an interrupted job resumes where it stopped
+    push_status = db.Column(db.String(20), default='pending')  # 'pending', 'sending', 'done'
+    push_cursor = db.Column(db.Integer, default=0)  # Last NotificationUser id handled
+    push_sent = db.Column(db.Integer, default=0)
+    push_failed = db.Column(db.Integer, default=0)
+    push_finished_at = db.Column(db.DateTime)
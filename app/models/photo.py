@@ -15,7 +15,13 @@ class Photo(db.Model):
     thumbnail_filename = db.Column(db.String(255))  # For video thumbnails
     duration = db.Column(db.Float)  # Video duration in seconds
     is_photobooth = db.Column(db.Boolean, default=False)  # Track photobooth photos
+    derivatives = db.Column(db.Text)  # JSON map of width -> resized image filename
+    width = db.Column(db.Integer)  # Original image width in pixels
+    height = db.Column(db.Integer)  # Original image height in pixels
+    comment_count = db.Column(db.Integer, default=0)  # Denormalized len(comments), kept in sync on add/delete
+    is_pending = db.Column(db.Boolean, default=False)  # Kept out of the gallery and slideshow until background checks pass
     comments = db.relationship('Comment', backref='photo', lazy=True, cascade='all, delete-orphan')
+    tag_links = db.relationship('PhotoTag', backref='photo', lazy=True, cascade='all, delete-orphan')
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -28,4 +34,16 @@ class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), nullable=False)
     user_identifier = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)  # Display name as first entered
+    slug = db.Column(db.String(50), nullable=False, unique=True, index=True)  # Lowercased name used for lookups
+    photo_count = db.Column(db.Integer, default=0)  # Denormalized number of tagged photos
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PhotoTag(db.Model):
+    photo_id = db.Column(db.Integer, db.ForeignKey('photo.id'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'), primary_key=True, index=True)
+    tag = db.relationship('Tag')
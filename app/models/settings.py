@@ -1,15 +1,28 @@
+import threading
+import time
+from flask import g, has_request_context
 from app import db
 
+# Row whose value is bumped on every write so other processes know to reload
+SETTINGS_VERSION_KEY = '_settings_version'
+
+# How often code running outside a request (background threads) rechecks the version
+SETTINGS_VERSION_CHECK_INTERVAL = 5  # seconds
+
+# Process-wide snapshot of every setting, replaced wholesale on reload
+_settings_cache = {'version': None, 'values': None, 'checked_at': 0}
+_settings_lock = threading.Lock()
+
 class Settings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False)
     value = db.Column(db.Text)
-    
+
     @staticmethod
     def get(key, default=None):
-        setting = Settings.query.filter_by(key=key).first()
-        return setting.value if setting else default
-    
+        values = Settings.snapshot()
+        return values[key] if key in values else default
+
     @staticmethod
     def set(key, value):
         setting = Settings.query.filter_by(key=key).first()
@@ -18,4 +31,68 @@ class Settings(db.Model):
         else:
             setting = Settings(key=key, value=value)
             db.session.add(setting)
-        db.session.commit() 
\ No newline at end of file
+        Settings.bump_version()
+        db.session.commit()
+        Settings.invalidate_cache()
+
+    @staticmethod
+    def snapshot():
+        """Get {key: value} for all settings, reloading only when the version row changed.
+
+        The version is read at most once per request, or every few seconds outside one.
+        """
+        # Read the cache once into locals: invalidate_cache() may clear it from another thread
+        # at any time. The version is read first because reloads store it after the values.
+        cached_version = _settings_cache['version']
+        values = _settings_cache['values']
+        if values is not None and not Settings._version_check_due():
+            return values
+
+        version = Settings._read_version()
+        if values is not None and version == cached_version:
+            return values
+
+        with _settings_lock:
+            values = _settings_cache['values']
+            if values is None or version != _settings_cache['version']:
+                rows = db.session.query(Settings.key, Settings.value).all()
+                values = {row.key: row.value for row in rows if row.key != SETTINGS_VERSION_KEY}
+                _settings_cache['values'] = values
+                _settings_cache['version'] = version
+            return values
+
+    @staticmethod
+    def bump_version():
+        """Increment the settings version in the current transaction (caller commits)"""
+        updated = Settings.query.filter_by(key=SETTINGS_VERSION_KEY).update(
+            {'value': db.cast(db.func.coalesce(db.cast(Settings.value, db.Integer), 0) + 1, db.Text)},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(Settings(key=SETTINGS_VERSION_KEY, value='1'))
+
+    @staticmethod
+    def invalidate_cache():
+        """Drop this process's snapshot so the next read reloads it"""
+        _settings_cache['values'] = None
+        _settings_cache['version'] = None
+        if has_request_context():
+            g.pop('settings_version_checked', None)
+
+    @staticmethod
+    def _version_check_due():
+        if has_request_context():
+            if g.get('settings_version_checked'):
+                return False
+            g.settings_version_checked = True
+            return True
+
+        now = time.monotonic()
+        if now - _settings_cache['checked_at'] < SETTINGS_VERSION_CHECK_INTERVAL:
+            return False
+        _settings_cache['checked_at'] = now
+        return True
+
+    @staticmethod
+    def _read_version():
+        return db.session.query(Settings.value).filter_by(key=SETTINGS_VERSION_KEY).scalar()
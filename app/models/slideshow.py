@@ -8,9 +8,13 @@ class SlideshowSettings(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class SlideshowActivity(db.Model):
+    # AUTOINCREMENT so ids are never reused after rows are deleted; clients follow the feed by id
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     activity_type = db.Column(db.String(50), nullable=False)  # 'photo', 'guestbook', 'message'
     content_id = db.Column(db.Integer, nullable=False)  # ID of the photo/guestbook entry/message
     content_summary = db.Column(db.Text)  # Brief description for display
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    is_active = db.Column(db.Boolean, default=True)  # Whether to show in slideshow 
\ No newline at end of file
+    payload = db.Column(db.Text)  # JSON slide content, written with the activity so the feed needs no joins
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    is_active = db.Column(db.Boolean, default=True)  # Whether to show in slideshow; cleared when the content is hidden or deleted 
\ No newline at end of file
@@ -0,0 +1,145 @@
+from flask import url_for
+from app import db
+from app.models.photo import Photo
+from app.models.guestbook import GuestbookEntry
+from app.models.messages import Message
+from app.utils.pagination import keyset_paginate
+from app.utils.image_utils import get_photo_thumbnail_url
+from app.utils.settings_utils import format_datetimes_in_timezone
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+def _page_size(args):
+    try:
+        limit = int(args.get('limit', ADMIN_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = ADMIN_PAGE_SIZE
+    return max(1, min(limit, ADMIN_MAX_PAGE_SIZE))
+
+def _paginate(query, sorts, args, id_column):
+    """Apply the requested sort ('newest' by default) and return one keyset page"""
+    sort_column, descending = sorts.get(args.get('sort'), sorts['newest'])
+    return keyset_paginate(query, sort_column, id_column, after=args.get('after'),
+                           limit=_page_size(args), descending=descending)
+
+def _with_dates(page, items, date_attr):
+    """Attach display dates, formatted in the admin's timezone in one pass"""
+    dates = format_datetimes_in_timezone([getattr(item, date_attr) for item in page['items']], '%b %d, %Y')
+    for data, date in zip(items, dates):
+        data['date'] = date
+    return {
+        'items': items,
+        'has_next': page['has_next'],
+        'next_cursor': page['next_cursor']
+    }
+
+def list_admin_photos(args):
+    """One page of gallery photos for the admin photos table.
+
+    Filters: media_type (photos/videos/photobooth), uploader (substring).
+    Sorts: newest, oldest, likes.
+    """
+    query = Photo.query
+
+    media_type = args.get('media_type', '')
+    if media_type == 'photos':
+        query = query.filter(Photo.media_type == 'image', Photo.is_photobooth == False)
+    elif media_type == 'videos':
+        query = query.filter(Photo.media_type == 'video')
+    elif media_type == 'photobooth':
+        query = query.filter(Photo.is_photobooth == True)
+
+    uploader = args.get('uploader', '').strip()
+    if uploader:
+        query = query.filter(Photo.uploader_name.ilike(f'%{uploader}%'))
+
+    page = _paginate(query, {
+        'newest': (Photo.upload_date, True),
+        'oldest': (Photo.upload_date, False),
+        'likes': (db.func.coalesce(Photo.likes, 0), True)
+    }, args, Photo.id)
+
+    items = [{
+        'id': photo.id,
+        'uploader_name': photo.uploader_name,
+        'media_type': photo.media_type,
+        'is_photobooth': photo.is_photobooth,
+        'likes': photo.likes or 0,
+        'comment_count': photo.comment_count or 0,
+        'thumbnail_url': get_photo_thumbnail_url(photo, 320),
+        'url': f'/photo/{photo.id}'
+    } for photo in page['items']]
+    return _with_dates(page, items, 'upload_date')
+
+def list_admin_guestbook(args):
+    """One page of guestbook entries for the admin guestbook table.
+
+    Filters: search (name or message substring), has_photo.
+    Sorts: newest, oldest.
+    """
+    query = GuestbookEntry.query
+
+    search = args.get('search', '').strip()
+    if search:
+        search_term = f'%{search}%'
+        query = query.filter(db.or_(
+            GuestbookEntry.name.ilike(search_term),
+            GuestbookEntry.message.ilike(search_term)
+        ))
+
+    if args.get('has_photo') == 'true':
+        query = query.filter(GuestbookEntry.photo_filename.isnot(None))
+
+    page = _paginate(query, {
+        'newest': (GuestbookEntry.created_at, True),
+        'oldest': (GuestbookEntry.created_at, False)
+    }, args, GuestbookEntry.id)
+
+    items = [{
+        'id': entry.id,
+        'name': entry.name,
+        'message': entry.message,
+        'location': entry.location,
+        'photo_filename': entry.photo_filename,
+        'photo_url': url_for('static', filename='uploads/guestbook/' + entry.photo_filename) if entry.photo_filename else None
+    } for entry in page['items']]
+    return _with_dates(page, items, 'created_at')
+
+def list_admin_messages(args):
+    """One page of message board posts for the admin messages table.
+
+    Filters: hidden (true/false), search (author or content substring).
+    Sorts: newest, oldest, likes.
+    """
+    query = Message.query
+
+    hidden = args.get('hidden')
+    if hidden in ('true', 'false'):
+        query = query.filter(Message.is_hidden == (hidden == 'true'))
+
+    search = args.get('search', '').strip()
+    if search:
+        search_term = f'%{search}%'
+        query = query.filter(db.or_(
+            Message.author_name.ilike(search_term),
+            Message.content.ilike(search_term)
+        ))
+
+    page = _paginate(query, {
+        'newest': (Message.created_at, True),
+        'oldest': (Message.created_at, False),
+        'likes': (db.func.coalesce(Message.likes, 0), True)
+    }, args, Message.id)
+
+    items = [{
+        'id': message.id,
+        'author_name': message.author_name,
+        'content': message.content,
+        'is_hidden': message.is_hidden,
+        'likes': message.likes or 0,
+        'comment_count': message.comment_count or 0,
+        'photo_filename': message.photo_filename,
+        'photo_url': url_for('static', filename='uploads/messages/' + message.photo_filename) if message.photo_filename else None
+    } for message in page['items']]
+    return _with_dates(page, items, 'created_at')
@@ -0,0 +1,73 @@
+import os
+import threading
+from app import db
+from app.utils.leader_election import start_leader_election, is_leader
+
+# Job workers run in every process; the job queue hands each job to exactly one of them.
+# The email monitor, retry scheduling and maintenance must run once across all processes
+# (gunicorn workers, the debug reloader), so they run only in the elected leader.
+
+MAINTENANCE_INTERVAL = 5 * 60  # seconds between maintenance runs on the leader
+
+_maintenance_thread = None
+
+def run_maintenance():
+    """Periodic cleanup that only the leader performs"""
+    from app.utils.email_utils import purge_processed_emails
+    from app.utils.job_queue import requeue_stale_jobs
+
+    requeued = requeue_stale_jobs()
+    if requeued:
+        print(f"Requeued {requeued} stale job(s)")
+    purge_processed_emails()
+
+def _on_elected(app):
+    from app.utils.email_utils import start_email_monitor
+    from app.utils.immich_utils import schedule_immich_retry
+    from app.utils.mail_queue import schedule_email_delivery
+
+    # Pick up Immich uploads and email replies that were waiting before a restart or failover
+    for schedule in (schedule_immich_retry, schedule_email_delivery):
+        try:
+            schedule()
+        except Exception as e:
+            print(f"Error in {schedule.__name__}: {e}")
+            db.session.rollback()
+
+    start_email_monitor(app)
+
+def _on_demoted():
+    from app.utils.email_utils import stop_email_monitor
+    stop_email_monitor()
+
+def _maintenance_loop(app, stopped):
+    with app.app_context():
+        while not stopped.wait(MAINTENANCE_INTERVAL):
+            if not is_leader():
+                continue
+            try:
+                run_maintenance()
+            except Exception as e:
+                print(f"Maintenance error: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+def start_background_services(app, num_workers=None):
+    """Start this process's job workers and join the election for the singleton services.
+
+    Safe to call from every process; call it once per process after the database exists.
+    """
+    global _maintenance_thread
+    from app.utils.job_queue import start_job_workers
+
+    if num_workers is None:
+        num_workers = int(os.environ.get('JOB_WORKERS', 2))
+    start_job_workers(app, num_workers=num_workers)
+
+    start_leader_election(app, on_elected=lambda: _on_elected(app), on_demoted=_on_demoted)
+
+    if _maintenance_thread is None:
+        _maintenance_thread = threading.Thread(target=_maintenance_loop, args=(app, threading.Event()),
+                                               name='maintenance', daemon=True)
+        _maintenance_thread.start()
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models.settings import Settings
+from app.utils.db_optimization import db_optimizer
+from app.utils.job_queue import job_handler
+from app.utils.zip_stream import StreamingZip
+
+# Backups are ZIP archives in BACKUP_FOLDER, each with a sidecar <backup_id>.json manifest.
+#
+# The manifest lists every media file under UPLOAD_FOLDER at backup time as
+# {relative path: {size, mtime_ns, sha256}}. A full backup packages all of them; an
+# incremental backup packages only files whose sha256 differs from its parent's manifest.
+# Every archive also holds a consistent snapshot of the SQLite database, so restoring
+# a backup replays its chain back to the last full backup for media and uses its own
+# database snapshot.
+
+BACKUP_MANIFEST_NAME = 'manifest.json'
+BACKUP_DATABASE_NAME = 'database.sqlite'
+BACKUP_MEDIA_PREFIX = 'media/'
+BACKUP_FORMAT_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+_BACKUP_ID_PATTERN = re.compile(r'^\d{8}_\d{6}_\d{6}_(full|incremental)$')
+
+def get_backup_folder():
+    folder = current_app.config['BACKUP_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def _media_root():
+    return os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+
+def _database_path():
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        raise RuntimeError("Backups are only supported for SQLite databases")
+    return url.database
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_valid_backup_id(backup_id):
+    return bool(backup_id and _BACKUP_ID_PATTERN.match(backup_id))
+
+def _archive_path(backup_id):
+    return os.path.join(get_backup_folder(), f"{backup_id}.zip")
+
+def _manifest_path(backup_id):
+    return os.path.join(get_backup_folder(), f"{backup_id}.json")
+
+def _safe_media_path(root, relative_path):
+    """Resolve a manifest path inside the media root, rejecting anything that escapes it"""
+    target = os.path.abspath(os.path.join(root, relative_path))
+    if os.path.commonpath([root, target]) != root:
+        raise ValueError(f"Refusing to restore outside the upload folder: {relative_path}")
+    return target
+
+def scan_media(previous_files=None):
+    """Describe every file under the upload folder as {relative path: {size, mtime_ns, sha256}}.
+
+    Files whose size and mtime match the previous manifest reuse its hash instead of being reread.
+    """
+    previous_files = previous_files or {}
+    root = _media_root()
+    files = {}
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if not os.path.isfile(path):
+                continue
+            relative_path = os.path.relpath(path, root).replace(os.sep, '/')
+            stat = os.stat(path)
+
+            previous = previous_files.get(relative_path)
+            if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+                sha256 = previous['sha256']
+            else:
+                sha256 = _sha256(path)
+
+            files[relative_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+    return files
+
+def snapshot_database(dest_path):
+    """Copy the live SQLite database to dest_path using the online backup API"""
+    source = sqlite3.connect(_database_path())
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest)
+    finally:
+        dest.close()
+        source.close()
+
+def list_backups():
+    """Get all backup manifests, oldest first, without their file lists"""
+    backups = []
+    for name in os.listdir(get_backup_folder()):
+        if not name.endswith('.json'):
+            continue
+        try:
+            manifest = load_manifest(name[:-len('.json')])
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable backup manifest {name}: {e}")
+            continue
+        summary = {key: value for key, value in manifest.items() if key not in ('files', 'included', 'deleted')}
+        summary['file_count'] = len(manifest['files'])
+        summary['included_count'] = len(manifest['included'])
+        summary['deleted_count'] = len(manifest['deleted'])
+        archive_path = _archive_path(manifest['backup_id'])
+        summary['archive_exists'] = os.path.exists(archive_path)
+        summary['archive_size'] = os.path.getsize(archive_path) if summary['archive_exists'] else 0
+        backups.append(summary)
+    backups.sort(key=lambda backup: backup['created_at'])
+    return backups
+
+def load_manifest(backup_id):
+    with open(_manifest_path(backup_id), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_latest_backup_id():
+    backups = [backup for backup in list_backups() if backup['archive_exists']]
+    return backups[-1]['backup_id'] if backups else None
+
+def create_backup(full=False):
+    """Create a backup archive and return its manifest.
+
+    Incremental by default: only media new or changed since the latest backup is
+    packaged. The first backup, or one requested with full=True, packages everything.
+    """
+    parent = None
+    if not full:
+        parent_id = get_latest_backup_id()
+        parent = load_manifest(parent_id) if parent_id else None
+
+    previous_files = parent['files'] if parent else {}
+    files = scan_media(previous_files)
+    included = sorted(path for path, info in files.items()
+                      if previous_files.get(path, {}).get('sha256') != info['sha256'])
+    deleted = sorted(path for path in previous_files if path not in files)
+
+    backup_type = 'incremental' if parent else 'full'
+    created_at = datetime.utcnow()
+    backup_id = f"{created_at.strftime('%Y%m%d_%H%M%S_%f')}_{backup_type}"
+
+    archive_path = _archive_path(backup_id)
+    partial_path = archive_path + '.partial'
+    work_dir = tempfile.mkdtemp(prefix='backup_', dir=get_backup_folder())
+    try:
+        database_snapshot = os.path.join(work_dir, BACKUP_DATABASE_NAME)
+        snapshot_database(database_snapshot)
+
+        root = _media_root()
+        archive = StreamingZip()
+        for relative_path in list(included):
+            if archive.add_file(BACKUP_MEDIA_PREFIX + relative_path, os.path.join(root, relative_path)) is None:
+                # Deleted since the scan
+                included.remove(relative_path)
+                files.pop(relative_path, None)
+        archive.add_file(BACKUP_DATABASE_NAME, database_snapshot)
+
+        manifest = {
+            'format_version': BACKUP_FORMAT_VERSION,
+            'backup_id': backup_id,
+            'type': backup_type,
+            'parent_id': parent['backup_id'] if parent else None,
+            'created_at': created_at.isoformat(),
+            'database_sha256': _sha256(database_snapshot),
+            'files': files,
+            'included': included,
+            'deleted': deleted
+        }
+        manifest_json = json.dumps(manifest, indent=2)
+        archive.add_bytes(BACKUP_MANIFEST_NAME, manifest_json)
+
+        with open(partial_path, 'wb') as f:
+            for chunk in archive.iter_bytes():
+                f.write(chunk)
+        os.replace(partial_path, archive_path)
+
+        # The sidecar manifest is written last; a backup only counts once it exists
+        with open(_manifest_path(backup_id), 'w', encoding='utf-8') as f:
+            f.write(manifest_json)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    print(f"Created {backup_type} backup {backup_id}: {len(included)} file(s) packaged, {len(deleted)} deleted")
+    return manifest
+
+def get_backup_archive_path(backup_id):
+    """Path of a backup's archive, or None if it does not exist"""
+    if not is_valid_backup_id(backup_id):
+        return None
+    path = _archive_path(backup_id)
+    return path if os.path.exists(path) and os.path.exists(_manifest_path(backup_id)) else None
+
+def get_backup_chain(backup_id):
+    """Get the manifests needed to restore a backup, from its full backup to itself"""
+    chain = []
+    current_id = backup_id
+    while current_id:
+        if not os.path.exists(_archive_path(current_id)):
+            raise ValueError(f"Backup archive {current_id} is missing; cannot restore {backup_id}")
+        manifest = load_manifest(current_id)
+        chain.append(manifest)
+        current_id = manifest.get('parent_id')
+    chain.reverse()
+    if chain[0]['type'] != 'full':
+        raise ValueError(f"Backup chain for {backup_id} does not start with a full backup")
+    return chain
+
+def _extract_verified(archive, member, dest_path, expected_sha256):
+    """Extract one archive member to dest_path atomically, checking its hash"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    temp_path = dest_path + '.restoring'
+    digest = hashlib.sha256()
+    with archive.open(member) as source, open(temp_path, 'wb') as dest:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            dest.write(chunk)
+    if digest.hexdigest() != expected_sha256:
+        os.remove(temp_path)
+        raise ValueError(f"Checksum mismatch for {member}")
+    os.replace(temp_path, dest_path)
+
+def restore_backup(backup_id=None, prune=False):
+    """Restore media and database to the state of a backup (the latest by default).
+
+    Media is replayed from the backup chain: each file comes from the newest archive in
+    the chain that packaged it, and files already on disk with the same size, mtime and
+    hash are left alone. With prune=True, media not present in the backup is deleted.
+    Returns counts of restored, unchanged and pruned files.
+    """
+    backup_id = backup_id or get_latest_backup_id()
+    if not backup_id:
+        raise ValueError("No backups found")
+
+    chain = get_backup_chain(backup_id)
+    target = chain[-1]
+    root = _media_root()
+
+    # Newest archive that packaged each file wins
+    sources = {}
+    for manifest in chain:
+        for relative_path in manifest['included']:
+            sources[relative_path] = manifest['backup_id']
+
+    restored = unchanged = pruned = 0
+    archives = {}
+    try:
+        for relative_path, info in sorted(target['files'].items()):
+            dest_path = _safe_media_path(root, relative_path)
+            if os.path.isfile(dest_path):
+                stat = os.stat(dest_path)
+                if stat.st_size == info['size'] and (stat.st_mtime_ns == info['mtime_ns'] or _sha256(dest_path) == info['sha256']):
+                    unchanged += 1
+                    continue
+
+            source_id = sources.get(relative_path)
+            if source_id is None:
+                raise ValueError(f"No backup in the chain contains {relative_path}")
+            if source_id not in archives:
+                archives[source_id] = zipfile.ZipFile(_archive_path(source_id))
+
+            _extract_verified(archives[source_id], BACKUP_MEDIA_PREFIX + relative_path, dest_path, info['sha256'])
+            os.utime(dest_path, ns=(info['mtime_ns'], info['mtime_ns']))
+            restored += 1
+
+        if prune:
+            for relative_path in scan_media(target['files']):
+                if relative_path not in target['files']:
+                    os.remove(_safe_media_path(root, relative_path))
+                    pruned += 1
+
+        restore_database(target)
+    finally:
+        for archive in archives.values():
+            archive.close()
+
+    print(f"Restored backup {backup_id}: {restored} file(s) restored, {unchanged} unchanged, {pruned} pruned")
+    return {'backup_id': backup_id, 'restored': restored, 'unchanged': unchanged, 'pruned': pruned}
+
+def restore_database(manifest):
+    """Replace the live database with a backup's snapshot"""
+    work_dir = tempfile.mkdtemp(prefix='restore_', dir=get_backup_folder())
+    try:
+        snapshot_path = os.path.join(work_dir, BACKUP_DATABASE_NAME)
+        with zipfile.ZipFile(_archive_path(manifest['backup_id'])) as archive:
+            _extract_verified(archive, BACKUP_DATABASE_NAME, snapshot_path, manifest['database_sha256'])
+
+        # Release pooled connections, then copy page by page into the live file
+        db.session.remove()
+        db.engine.dispose()
+        source = sqlite3.connect(snapshot_path)
+        dest = sqlite3.connect(_database_path())
+        try:
+            source.backup(dest)
+        finally:
+            dest.close()
+            source.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Everything cached from the old database is stale
+    Settings.invalidate_cache()
+    db_optimizer.clear_cache()
+
+@job_handler('create_backup')
+def create_backup_job(job, full=False):
+    """Create a backup in the background from the admin dashboard"""
+    create_backup(full=full)
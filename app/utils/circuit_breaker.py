@@ -0,0 +1,78 @@
+import threading
+import time
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+class CircuitBreaker:
+    """Stops calls to a failing service until it has had time to recover.
+
+    After failure_threshold consecutive failures the circuit opens and calls fail fast
+    with CircuitOpenError. Once reset_timeout has passed a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def retry_after(self):
+        """Seconds until the next trial call is allowed (0 if calls are allowed now)"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may be made now"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        raise CircuitOpenError(f"{self.name} is unavailable; retrying in {self.retry_after():.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    print(f"Circuit for {self.name} opened after {self._failures} failure(s)")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Free the half-open trial slot after a call that neither succeeded nor failed remotely"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def get_status(self):
+        with self._lock:
+            state = self._state()
+            failures = self._failures
+        return {'state': state, 'failures': failures, 'retry_after': round(self.retry_after())}
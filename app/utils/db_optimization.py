@@ -88,11 +88,16 @@ class DatabaseOptimizer:
                     "CREATE INDEX IF NOT EXISTS idx_message_created_at ON message(created_at DESC)",
                     "CREATE INDEX IF NOT EXISTS idx_message_is_hidden ON message(is_hidden)",
                     "CREATE INDEX IF NOT EXISTS idx_message_author ON message(author_name)",
+                    "CREATE INDEX IF NOT EXISTS idx_message_hidden_created ON message(is_hidden, created_at DESC)",
+                    "CREATE INDEX IF NOT EXISTS idx_message_likes ON message(likes DESC)",
                     
                     # Guestbook indexes
                     "CREATE INDEX IF NOT EXISTS idx_guestbook_created_at ON guestbook_entry(created_at DESC)",
                     "CREATE INDEX IF NOT EXISTS idx_guestbook_name ON guestbook_entry(name)",
                     
+                    # Slideshow feed indexes
+                    "CREATE INDEX IF NOT EXISTS idx_slideshow_activity_content ON slideshow_activity(activity_type, content_id)",
+                    
                     # Notification indexes
                     "CREATE INDEX IF NOT EXISTS idx_notification_user_created ON notification(user_identifier, created_at DESC)",
                     "CREATE INDEX IF NOT EXISTS idx_notification_is_read ON notification(is_read)",
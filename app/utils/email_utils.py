@@ -1,61 +1,46 @@
-import smtplib
 import imaplib
 import email
+import select
 import threading
 import time
 import json
 import hashlib
-from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import queue
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 from flask import current_app
+from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models.settings import Settings
 from app.models.photo import Photo
-from app.models.email import EmailLog
+from app.models.email import EmailLog, ProcessedEmail
+from app.utils.file_utils import is_image
+from app.utils.imap_utils import parse_fetch_response, iter_body_parts, download_part
+from app.utils.mail_queue import (send_email, build_confirmation_email, build_rejection_email,
+                                  queue_email_response, schedule_email_delivery)
+from app.utils.leader_election import is_leader
 from app.utils.settings_utils import get_email_settings
+from app.utils.slideshow_utils import record_activity, publish_activity
 import os
 
-# Global set to track processed emails in current session to prevent duplicates
-_processed_emails = set()
-_processed_emails_timestamps = {}  # Track when emails were processed
+IMAP_IDLE_TIMEOUT = 25 * 60  # seconds before IDLE is renewed; servers may drop it after 29 minutes
+IMAP_IDLE_CHECK_INTERVAL = 2  # seconds between checks for stop/settings changes while idling
+IMAP_POLL_INTERVAL = 300  # seconds between checks on servers without IDLE
+IMAP_RECONNECT_MIN_DELAY = 5  # seconds before reconnecting, doubled after each failure
+IMAP_RECONNECT_MAX_DELAY = 300
+EMAIL_SETTINGS_CHECK_INTERVAL = 60  # seconds between checks while email is disabled
+EMAIL_SETTINGS_RECHECK_INTERVAL = 30  # seconds between checks for settings saved by another process
+EMAIL_FETCH_BATCH_SIZE = 50  # emails whose structure and headers are fetched per request
+EMAIL_FETCH_WORKERS = 3  # emails whose photos are downloaded in parallel, each on its own IMAP connection
+EMAIL_HEADER_FIELDS = 'FROM SUBJECT DATE MESSAGE-ID'
+EMAIL_CLAIM_TIMEOUT = 15 * 60  # seconds before an unfinished claim on an email can be taken over
+EMAIL_DEDUP_RETENTION_DAYS = 30  # days processed emails are remembered
+
 
 def send_confirmation_email(recipient_email, photo_count, gallery_url):
     """Send confirmation email to user who uploaded photos via email"""
     try:
-        email_settings = get_email_settings()
-        if not email_settings['enabled'] or not email_settings['smtp_username']:
-            return False
-            
-        msg = MIMEMultipart()
-        msg['From'] = email_settings['smtp_username']
-        msg['To'] = recipient_email
-        msg['Subject'] = "Thank you for sharing your wedding photos!"
-        
-        body = f"""
-        Hi there!
-        
-        Thank you so much for sharing your wedding photos with us! We've successfully added {photo_count} photo(s) to our wedding gallery.
-        
-        You can view all the photos here: {gallery_url}
-        
-        We're so grateful to have these memories captured from your perspective. Thank you for being part of our special day!
-        
-        Best wishes,
-        The Happy Couple
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        server = smtplib.SMTP(email_settings['smtp_server'], int(email_settings['smtp_port']))
-        server.starttls()
-        server.login(email_settings['smtp_username'], email_settings['smtp_password'])
-        server.send_message(msg)
-        server.quit()
-        
-        return True
+        return send_email(recipient_email, *build_confirmation_email(photo_count, gallery_url))
     except Exception as e:
         print(f"Error sending confirmation email: {e}")
         return False
@@ -63,234 +48,57 @@ def send_confirmation_email(recipient_email, photo_count, gallery_url):
 def send_rejection_email(recipient_email, reason):
     """Send rejection email to user who sent non-photo content"""
     try:
-        email_settings = get_email_settings()
-        if not email_settings['enabled'] or not email_settings['smtp_username']:
-            return False
-            
-        msg = MIMEMultipart()
-        msg['From'] = email_settings['smtp_username']
-        msg['To'] = recipient_email
-        msg['Subject'] = "Photo upload - only photos accepted"
-        
-        body = f"""
-        Hi there!
-        
-        Thank you for trying to share content with our wedding gallery! However, we can only accept photo attachments at this time.
-        
-        {reason}
-        
-        Please send only photo files (JPG, PNG, GIF, WebP) as attachments to this email address.
-        
-        Thank you for understanding!
-        
-        Best wishes,
-        The Happy Couple
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email
-        server = smtplib.SMTP(email_settings['smtp_server'], int(email_settings['smtp_port']))
-        server.starttls()
-        server.login(email_settings['smtp_username'], email_settings['smtp_password'])
-        server.send_message(msg)
-        server.quit()
-        
-        return True
+        return send_email(recipient_email, *build_rejection_email(reason))
     except Exception as e:
         print(f"Error sending rejection email: {e}")
         return False
 
-def process_email_photos():
-    """Process incoming emails and extract photos"""
+def connect_imap(email_settings):
+    """Open an IMAP connection, log in and select the inbox"""
+    print(f"Connecting to IMAP server: {email_settings['imap_server']}:{email_settings['imap_port']}")
+    mail = imaplib.IMAP4_SSL(email_settings['imap_server'], int(email_settings['imap_port']))
+    try:
+        mail.login(email_settings['imap_username'], email_settings['imap_password'])
+        status, _ = mail.select('INBOX')
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"Could not select INBOX: {status}")
+    except Exception:
+        _logout_imap(mail)
+        raise
+    return mail
+
+def _logout_imap(mail):
+    try:
+        mail.logout()
+    except Exception:
+        pass
+
+def process_email_photos(mail=None, connect=None):
+    """Process incoming emails and extract photos
+
+    Uses the given IMAP connection and leaves it open, or opens and closes its own.
+    Connection errors on a given connection are raised so the caller can reconnect.
+    connect opens any extra connections used to download photos in parallel.
+    """
+    own_connection = mail is None
     try:
         email_settings = get_email_settings()
         if not email_settings['enabled'] or not email_settings['imap_username']:
             print("Email processing skipped - not enabled or IMAP username not configured")
             return
-            
-        # Connect to IMAP server
-        print(f"Connecting to IMAP server: {email_settings['imap_server']}:{email_settings['imap_port']}")
-        mail = imaplib.IMAP4_SSL(email_settings['imap_server'], int(email_settings['imap_port']))
-        mail.login(email_settings['imap_username'], email_settings['imap_password'])
-        mail.select('INBOX')
-        
-        # Search for unread emails
-        status, messages = mail.search(None, 'UNSEEN')
-        
-        if status != 'OK':
-            print(f"IMAP search failed with status: {status}")
-            return
-            
-        if not messages[0]:
-            print("No unread emails found")
-            return
-            
-        print(f"Found {len(messages[0].split())} unread email(s)")
-            
-        for num in messages[0].split():
-            try:
-                status, msg_data = mail.fetch(num, '(RFC822)')
-                if status != 'OK':
-                    continue
-                    
-                email_body = msg_data[0][1]
-                email_message = email.message_from_bytes(email_body)
-                
-                sender_email = email_message['from']
-                subject = email_message.get('subject', '')
-                # Extract email from "Name <email@domain.com>" format
-                if '<' in sender_email and '>' in sender_email:
-                    sender_email = sender_email.split('<')[1].split('>')[0]
-                
-                # Create a unique identifier for this email to prevent duplicates
-                email_id = f"{sender_email}_{subject}_{email_message.get('date', '')}"
-                email_hash = hashlib.md5(email_id.encode()).hexdigest()
-                
-                # Check if this email was already processed in current session
-                if email_hash in _processed_emails:
-                    print(f"DUPLICATE PREVENTION: Email from {sender_email} with subject '{subject}' was already processed in this session. Skipping.")
-                    # Mark as read to prevent future processing
-                    mail.store(num, '+FLAGS', '\\Seen')
-                    continue
-                
-                # Check if this email was already processed recently (within last 24 hours)
-                from datetime import timedelta
-                recent_log = EmailLog.query.filter(
-                    EmailLog.sender_email == sender_email,
-                    EmailLog.subject == subject,
-                    EmailLog.received_at >= datetime.utcnow() - timedelta(hours=24)
-                ).first()
-                
-                if recent_log:
-                    print(f"DUPLICATE PREVENTION: Email from {sender_email} with subject '{subject}' was already processed recently. Skipping.")
-                    # Mark as read to prevent future processing
-                    mail.store(num, '+FLAGS', '\\Seen')
-                    continue
-                
-                # Add to processed emails set with timestamp
-                _processed_emails.add(email_hash)
-                _processed_emails_timestamps[email_hash] = datetime.utcnow()
-                
-                # Clean up old entries (older than 1 hour) to prevent memory bloat
-                cutoff_time = datetime.utcnow() - timedelta(hours=1)
-                old_hashes = [h for h, ts in _processed_emails_timestamps.items() if ts < cutoff_time]
-                for old_hash in old_hashes:
-                    _processed_emails.discard(old_hash)
-                    del _processed_emails_timestamps[old_hash]
-                
-                photo_count = 0
-                has_photos = False
-                has_non_photos = False
-                error_message = None
-                
-                # Process attachments
-                for part in email_message.walk():
-                    if part.get_content_maintype() == 'multipart':
-                        continue
-                    if part.get('Content-Disposition') is None:
-                        continue
-                        
-                    filename = part.get_filename()
-                    if filename:
-                        # Check if it's a photo
-                        from app.utils.file_utils import is_image
-                        if is_image(filename):
-                            has_photos = True
-                            # Save the photo
-                            file_data = part.get_payload(decode=True)
-                            if file_data:
-                                # Generate unique filename
-                                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                                safe_filename = secure_filename(filename)
-                                unique_filename = f"{timestamp}_{safe_filename}"
-                                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-                                
-                                with open(file_path, 'wb') as f:
-                                    f.write(file_data)
-                                
-                                # Create database entry
-                                photo = Photo(
-                                    filename=unique_filename,
-                                    original_filename=filename,
-                                    uploader_name=sender_email,
-                                    upload_date=datetime.utcnow()
-                                )
-                                db.session.add(photo)
-                                photo_count += 1
-                        else:
-                            has_non_photos = True
-                
-                # Determine status and create log entry
-                if photo_count > 0:
-                    status = 'success'
-                    response_type = 'confirmation'
-                    response_sent = True
-                    
-                    # Commit database changes
-                    db.session.commit()
-                    
-                    # Send confirmation email
-                    # Get QR settings for public URL
-                    qr_settings = Settings.get('qr_settings', '{}')
-                    qr_settings = json.loads(qr_settings) if qr_settings else {}
-                    public_url = qr_settings.get('public_url', '').strip()
-                    if not public_url:
-                        # Fall back to main public URL setting
-                        public_url = Settings.get('public_url', '')
-                    if public_url:
-                        send_confirmation_email(sender_email, photo_count, public_url)
-                
-                elif has_non_photos and not has_photos:
-                    status = 'rejected'
-                    response_type = 'rejection'
-                    response_sent = True
-                    send_rejection_email(sender_email, "We received your email but it didn't contain any photo attachments.")
-                
-                else:
-                    status = 'rejected'
-                    response_type = 'rejection'
-                    response_sent = True
-                    send_rejection_email(sender_email, "We received your email but it didn't contain any photo attachments.")
-                
-                # Create email log entry
-                email_log = EmailLog(
-                    sender_email=sender_email,
-                    subject=subject,
-                    processed_at=datetime.utcnow(),
-                    status=status,
-                    photo_count=photo_count,
-                    response_sent=response_sent,
-                    response_type=response_type
-                )
-                db.session.add(email_log)
-                db.session.commit()
-                
-                # Mark email as read
-                mail.store(num, '+FLAGS', '\\Seen')
-                
-            except Exception as e:
-                print(f"Error processing email: {e}")
-                # Log the error
+
+        if own_connection:
+            mail = (connect or connect_imap)(email_settings)
+        try:
+            _process_unseen_emails(mail, email_settings, connect)
+        finally:
+            if own_connection:
                 try:
-                    email_log = EmailLog(
-                        sender_email=sender_email if 'sender_email' in locals() else 'Unknown',
-                        subject=subject if 'subject' in locals() else '',
-                        processed_at=datetime.utcnow(),
-                        status='error',
-                        error_message=str(e),
-                        response_sent=False
-                    )
-                    db.session.add(email_log)
-                    db.session.commit()
-                except Exception as log_error:
-                    print(f"Error logging email error: {log_error}")
-                continue
-        
-        mail.close()
-        mail.logout()
-        print("Email processing completed")
-        
+                    mail.close()
+                except Exception:
+                    pass
+                _logout_imap(mail)
+
     except Exception as e:
         print(f"Error in email processing: {e}")
         # Ensure we don't leave any uncommitted database changes
@@ -298,22 +106,565 @@ def process_email_photos():
             db.session.rollback()
         except Exception as rollback_error:
             print(f"Error during rollback: {rollback_error}")
+        if not own_connection:
+            raise
+
+def _process_unseen_emails(mail, email_settings, connect=None):
+    """Turn every unread email in the selected mailbox into photos or a rejection.
+
+    Only the structure and a few headers of each email are fetched up front. Photo
+    attachments are then downloaded part by part and decoded straight to disk, for
+    several emails at once on extra IMAP connections.
+    """
+    # Search for unread emails
+    status, messages = mail.uid('SEARCH', None, 'UNSEEN')
+
+    if status != 'OK':
+        print(f"IMAP search failed with status: {status}")
+        return
+
+    if not messages[0]:
+        print("No unread emails found")
+        return
+
+    uids = messages[0].split()
+    print(f"Found {len(uids)} unread email(s)")
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    for start in range(0, len(uids), EMAIL_FETCH_BATCH_SIZE):
+        batch = uids[start:start + EMAIL_FETCH_BATCH_SIZE]
+        status, response = mail.uid('FETCH', b','.join(batch), f'(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({EMAIL_HEADER_FIELDS})])')
+        if status != 'OK':
+            print(f"IMAP fetch failed with status: {status}")
+            continue
+
+        with_photos = []
+        for fetched in parse_fetch_response(response):
+            # Skip unsolicited updates such as flag changes
+            if 'UID' not in fetched or 'BODYSTRUCTURE' not in fetched:
+                continue
+            email_info = _prepare_email(mail, fetched)
+            if email_info is None:
+                continue
+            if email_info['photo_parts']:
+                with_photos.append(email_info)
+            else:
+                _record_email(mail, email_info, [])
+
+        for email_info, saved, error in _download_email_photos(mail, with_photos, upload_folder, email_settings, connect):
+            if error is not None:
+                _log_email_error(email_info['sender_email'], email_info['subject'], error)
+                release_email_claim(email_info['message_key'])
+            else:
+                _record_email(mail, email_info, saved)
+
+    print("Email processing completed")
+
+def _header_bytes(fetched):
+    # Servers may echo the requested header list differently, so match on the prefix
+    for key, value in fetched.items():
+        if key.startswith('BODY[HEADER.FIELDS'):
+            return value if isinstance(value, bytes) else (value or '').encode()
+    return b''
+
+def email_message_key(email_message, parts):
+    """Identify an email by its Message-ID, or by sender, subject, date and attachments without one"""
+    message_id = (email_message.get('message-id') or '').strip().strip('<>').strip()
+    if message_id:
+        source = f"id:{message_id}"
+    else:
+        source = 'content:' + '|'.join(
+            [str(email_message.get(header, '')) for header in ('from', 'subject', 'date')]
+            + [f"{part['section']}:{part['size']}:{part['filename']}" for part in parts]
+        )
+    return hashlib.sha256(source.encode('utf-8', errors='replace')).hexdigest()
+
+def claim_email(message_key, message_id, sender_email):
+    """Record that this worker is processing an email; False if it was processed or is being processed.
+
+    The unique message_key makes the insert the check, so two workers can never both claim
+    an email. A claim left unfinished for EMAIL_CLAIM_TIMEOUT (e.g. after a crash) is taken over.
+    """
+    db.session.add(ProcessedEmail(
+        message_key=message_key,
+        message_id=(message_id or '')[:255] or None,
+        sender_email=sender_email[:255],
+        status='processing',
+        claimed_at=datetime.utcnow()
+    ))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+
+    now = datetime.utcnow()
+    taken = ProcessedEmail.query.filter(
+        ProcessedEmail.message_key == message_key,
+        ProcessedEmail.status == 'processing',
+        ProcessedEmail.claimed_at < now - timedelta(seconds=EMAIL_CLAIM_TIMEOUT)
+    ).update({'claimed_at': now}, synchronize_session=False)
+    db.session.commit()
+    return taken == 1
+
+def finish_email_claim(message_key):
+    ProcessedEmail.query.filter_by(message_key=message_key).update(
+        {'status': 'done', 'processed_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+def release_email_claim(message_key):
+    """Forget an unfinished claim so the email is processed again next time"""
+    try:
+        ProcessedEmail.query.filter_by(message_key=message_key, status='processing').delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error releasing email claim: {e}")
+
+def purge_processed_emails():
+    """Drop de-duplication records older than EMAIL_DEDUP_RETENTION_DAYS; returns the number removed"""
+    cutoff = datetime.utcnow() - timedelta(days=EMAIL_DEDUP_RETENTION_DAYS)
+    removed = ProcessedEmail.query.filter(ProcessedEmail.claimed_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+def _prepare_email(mail, fetched):
+    """Read sender, subject and attachments of a fetched email and claim it; None if it is a duplicate"""
+    sender_email = 'Unknown'
+    subject = ''
+    try:
+        uid = str(fetched['UID'])
+        email_message = email.message_from_bytes(_header_bytes(fetched))
+
+        sender_email = email_message['from'] or 'Unknown'
+        subject = email_message.get('subject', '')
+        # Extract email from "Name <email@domain.com>" format
+        if '<' in sender_email and '>' in sender_email:
+            sender_email = sender_email.split('<')[1].split('>')[0]
+
+        # Only attachments count; photos are downloaded later, other files never
+        parts = [part for part in iter_body_parts(fetched['BODYSTRUCTURE'])
+                 if part['disposition'] is not None and part['filename']]
+        photo_parts = [part for part in parts if is_image(part['filename'])]
+
+        message_key = email_message_key(email_message, parts)
+        if not claim_email(message_key, email_message.get('message-id'), sender_email):
+            print(f"DUPLICATE PREVENTION: Email from {sender_email} with subject '{subject}' was already processed. Skipping.")
+            # Mark as read to prevent future processing
+            mail.uid('STORE', uid, '+FLAGS', '(\\Seen)')
+            return None
+
+        return {
+            'uid': uid,
+            'message_key': message_key,
+            'sender_email': sender_email,
+            'subject': subject,
+            'photo_parts': photo_parts
+        }
+
+    except imaplib.IMAP4.abort:
+        # The connection is gone; not a problem with this email
+        raise
+    except Exception as e:
+        db.session.rollback()
+        _log_email_error(sender_email, subject, e)
+        return None
+
+def _reserve_upload_path(upload_folder, filename):
+    """Create an empty file with a unique timestamped name for an emailed photo"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    safe_filename = secure_filename(filename)
+    unique_filename = f"{timestamp}_{safe_filename}"
+    counter = 1
+    while True:
+        file_path = os.path.join(upload_folder, unique_filename)
+        try:
+            with open(file_path, 'xb'):
+                return unique_filename, file_path
+        except FileExistsError:
+            unique_filename = f"{timestamp}_{counter}_{safe_filename}"
+            counter += 1
+
+def _save_email_photos(mail, email_info, upload_folder):
+    """Download an email's photo attachments to the upload folder.
+
+    Returns [(original filename, saved filename)]; runs without database access so it
+    can be used from download threads. Files are removed again if any download fails.
+    """
+    saved = []
+    file_path = None
+    try:
+        for part in email_info['photo_parts']:
+            unique_filename, file_path = _reserve_upload_path(upload_folder, part['filename'])
+            with open(file_path, 'wb') as f:
+                download_part(mail, email_info['uid'], part, f)
+            if os.path.getsize(file_path) == 0:
+                os.remove(file_path)
+            else:
+                saved.append((part['filename'], unique_filename))
+            file_path = None
+    except Exception:
+        for _, unique_filename in saved:
+            os.remove(os.path.join(upload_folder, unique_filename))
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return saved
+
+def _download_worker(connect, email_settings, upload_folder, tasks, results):
+    """Download photos of queued emails over one extra IMAP connection"""
+    mail = None
+    try:
+        while True:
+            try:
+                email_info = tasks.get_nowait()
+            except queue.Empty:
+                return
+            if mail is None:
+                try:
+                    mail = connect(email_settings)
+                except Exception as e:
+                    # Hand the email back to the main connection
+                    print(f"Extra IMAP connection failed: {e}")
+                    results.put((email_info, None, None))
+                    continue
+            try:
+                results.put((email_info, _save_email_photos(mail, email_info, upload_folder), None))
+            except Exception as e:
+                results.put((email_info, None, e))
+                if isinstance(e, imaplib.IMAP4.abort):
+                    _logout_imap(mail)
+                    mail = None
+    finally:
+        if mail is not None:
+            _logout_imap(mail)
+
+def _download_email_photos(mail, emails, upload_folder, email_settings, connect=None):
+    """Yield (email_info, saved photos, error) as each email's photos finish downloading.
+
+    A single email is downloaded over the main connection; more are spread over up to
+    EMAIL_FETCH_WORKERS extra connections.
+    """
+    if len(emails) <= 1 or EMAIL_FETCH_WORKERS <= 1:
+        for email_info in emails:
+            try:
+                yield email_info, _save_email_photos(mail, email_info, upload_folder), None
+            except imaplib.IMAP4.abort:
+                raise
+            except Exception as e:
+                yield email_info, [], e
+        return
+
+    tasks = queue.Queue()
+    results = queue.Queue()
+    for email_info in emails:
+        tasks.put(email_info)
+
+    workers = [
+        threading.Thread(target=_download_worker, name='email-download', daemon=True,
+                         args=(connect or connect_imap, email_settings, upload_folder, tasks, results))
+        for _ in range(min(EMAIL_FETCH_WORKERS, len(emails)))
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        for _ in range(len(emails)):
+            email_info, saved, error = results.get()
+            if saved is None and error is None:
+                # No extra connection available; use the main one
+                try:
+                    saved = _save_email_photos(mail, email_info, upload_folder)
+                except imaplib.IMAP4.abort:
+                    raise
+                except Exception as e:
+                    error = e
+            yield email_info, saved or [], error
+    finally:
+        # If processing stopped early, cancel queued downloads and remove photos that were
+        # never recorded; their emails stay unread and are fetched again
+        while True:
+            try:
+                tasks.get_nowait()
+            except queue.Empty:
+                break
+        for worker in workers:
+            worker.join()
+        while True:
+            try:
+                _, saved, _ = results.get_nowait()
+            except queue.Empty:
+                break
+            for _, unique_filename in saved or []:
+                os.remove(os.path.join(upload_folder, unique_filename))
+
+def _record_email(mail, email_info, saved):
+    """Add an email's saved photos to the gallery, reply to the sender, log it and mark it read"""
+    sender_email = email_info['sender_email']
+    subject = email_info['subject']
+    try:
+        saved_photos = []
+        for original_filename, unique_filename in saved:
+            # Create database entry
+            photo = Photo(
+                filename=unique_filename,
+                original_filename=original_filename,
+                uploader_name=sender_email,
+                upload_date=datetime.utcnow()
+            )
+            db.session.add(photo)
+            record_activity('photo', photo)
+            saved_photos.append(photo)
+        photo_count = len(saved_photos)
+
+        # Create email log entry
+        email_log = EmailLog(
+            sender_email=sender_email,
+            subject=subject,
+            processed_at=datetime.utcnow(),
+            status='success' if photo_count > 0 else 'rejected',
+            photo_count=photo_count
+        )
+        db.session.add(email_log)
+
+        # Replies are queued and sent in batches over one SMTP connection
+        if photo_count > 0:
+            email_log.response_type = 'confirmation'
+            # Get QR settings for public URL
+            qr_settings = Settings.get('qr_settings', '{}')
+            qr_settings = json.loads(qr_settings) if qr_settings else {}
+            public_url = qr_settings.get('public_url', '').strip()
+            if not public_url:
+                # Fall back to main public URL setting
+                public_url = Settings.get('public_url', '')
+            if public_url:
+                queue_email_response(email_log, 'confirmation', photo_count=photo_count, gallery_url=public_url)
+        else:
+            queue_email_response(email_log, 'rejection', reason="We received your email but it didn't contain any photo attachments.")
+
+        db.session.commit()
+
+        # Queue derivatives and Immich sync for the new photos
+        if saved_photos:
+            from app.utils.media_jobs import enqueue_photo_processing
+            for photo in saved_photos:
+                enqueue_photo_processing(photo)
+            publish_activity('photo', saved_photos[-1].id)
+        schedule_email_delivery()
+
+        finish_email_claim(email_info['message_key'])
+
+        # Mark email as read
+        mail.uid('STORE', email_info['uid'], '+FLAGS', '(\\Seen)')
+
+    except imaplib.IMAP4.abort:
+        # The connection is gone; not a problem with this email
+        raise
+    except Exception as e:
+        db.session.rollback()
+        _log_email_error(sender_email, subject, e)
+        release_email_claim(email_info['message_key'])
+
+def _log_email_error(sender_email, subject, error):
+    print(f"Error processing email: {error}")
+    # Log the error
+    try:
+        email_log = EmailLog(
+            sender_email=sender_email,
+            subject=subject,
+            processed_at=datetime.utcnow(),
+            status='error',
+            error_message=str(error),
+            response_sent=False
+        )
+        db.session.add(email_log)
+        db.session.commit()
+    except Exception as log_error:
+        print(f"Error logging email error: {log_error}")
+
+def imap_idle(mail, timeout, should_stop=None):
+    """Wait in IMAP IDLE (RFC 2177) until the server reports new mail, timeout passes or should_stop() is true.
+
+    Returns True if new mail may have arrived.
+    """
+    tag = mail._new_tag()
+    mail.send(tag + b' IDLE\r\n')
+    response = mail.readline()
+    if not response.startswith(b'+'):
+        raise imaplib.IMAP4.error(f"IDLE rejected: {response.decode(errors='replace').strip()}")
+
+    new_mail = False
+    deadline = time.monotonic() + timeout
+    while not new_mail and time.monotonic() < deadline:
+        if should_stop is not None and should_stop():
+            break
+        # TLS may already hold decrypted data that select() cannot see
+        pending = getattr(mail.sock, 'pending', None)
+        if not (pending and pending()):
+            readable, _, _ = select.select([mail.sock], [], [], min(IMAP_IDLE_CHECK_INTERVAL, max(0, deadline - time.monotonic())))
+            if not readable:
+                continue
+        line = mail.readline()
+        if not line or line.startswith(b'* BYE'):
+            raise imaplib.IMAP4.abort("Server closed the connection during IDLE")
+        if line.rstrip().endswith((b'EXISTS', b'RECENT')):
+            new_mail = True
 
-def start_email_monitor():
-    """Start the email monitoring thread"""
-    def monitor_emails():
-        from app import create_app
-        app = create_app()
-        with app.app_context():
+    mail.send(b'DONE\r\n')
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Server closed the connection while ending IDLE")
+        if line.startswith(tag):
+            if not line[len(tag):].strip().upper().startswith(b'OK'):
+                raise imaplib.IMAP4.error(f"IDLE failed: {line.decode(errors='replace').strip()}")
+            return new_mail
+        if line.rstrip().endswith((b'EXISTS', b'RECENT')):
+            new_mail = True
+
+def _imap_connection_settings(email_settings):
+    return tuple(email_settings[key] for key in ('enabled', 'imap_server', 'imap_port', 'imap_username', 'imap_password'))
+
+class EmailMonitor:
+    """Keep one IMAP connection open and process emails as soon as they arrive.
+
+    Uses IDLE when the server supports it and polls over the same connection otherwise.
+    Lost connections are reopened with exponential backoff. Changed IMAP settings are
+    picked up at once after notify(), or within EMAIL_SETTINGS_RECHECK_INTERVAL when
+    they were saved by another process.
+    """
+
+    def __init__(self, app, connect=None):
+        self.app = app
+        self.connect = connect or connect_imap
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.reconnect_delay = IMAP_RECONNECT_MIN_DELAY
+        self.connection_settings = None
+        self.last_settings_check = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='email-monitor', daemon=True)
+        self.thread.start()
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def notify(self):
+        """Check for mail now and reconnect if the settings changed"""
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def _wait(self, seconds):
+        self.wakeup.wait(seconds)
+        self.wakeup.clear()
+
+    def _should_wake(self):
+        if self.wakeup.is_set() or self.stopped.is_set():
+            return True
+        now = time.monotonic()
+        if now - self.last_settings_check < EMAIL_SETTINGS_RECHECK_INTERVAL:
+            return False
+        self.last_settings_check = now
+        return _imap_connection_settings(get_email_settings()) != self.connection_settings
+
+    def _poll_wait(self, seconds):
+        """Wait between polls, waking early like IDLE does"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not self._should_wake():
+            self.wakeup.wait(min(IMAP_IDLE_CHECK_INTERVAL, max(0, deadline - time.monotonic())))
+        self.wakeup.clear()
+
+    def run(self):
+        with self.app.app_context():
             print("Email monitoring thread started")
-            while True:
+            while not self.stopped.is_set():
                 try:
-                    process_email_photos()
-                    time.sleep(300)  # Check every 5 minutes
+                    email_settings = get_email_settings()
                 except Exception as e:
                     print(f"Email monitor error: {e}")
-                    time.sleep(600)  # Wait 10 minutes on error
-    
-    thread = threading.Thread(target=monitor_emails, daemon=True)
-    thread.start()
-    print("Email monitoring thread created") 
\ No newline at end of file
+                    db.session.rollback()
+                    self._wait(EMAIL_SETTINGS_CHECK_INTERVAL)
+                    continue
+
+                if not email_settings['enabled'] or not email_settings['imap_username']:
+                    self._wait(EMAIL_SETTINGS_CHECK_INTERVAL)
+                    continue
+
+                try:
+                    mail = self.connect(email_settings)
+                except Exception as e:
+                    print(f"Email monitor could not connect: {e}; retrying in {self.reconnect_delay}s")
+                    self._backoff()
+                    continue
+
+                try:
+                    self._watch(mail, email_settings)
+                except Exception as e:
+                    print(f"Email monitor connection lost: {e}; reconnecting in {self.reconnect_delay}s")
+                    self._backoff()
+                finally:
+                    _logout_imap(mail)
+            print("Email monitoring thread stopped")
+
+    def _backoff(self):
+        self._wait(self.reconnect_delay)
+        self.reconnect_delay = min(self.reconnect_delay * 2, IMAP_RECONNECT_MAX_DELAY)
+
+    def _watch(self, mail, email_settings):
+        """Process mail on an open connection until it fails, settings change or the monitor stops"""
+        supports_idle = 'IDLE' in mail.capabilities
+        print(f"Email monitor connected ({'IDLE' if supports_idle else f'polling every {IMAP_POLL_INTERVAL}s'})")
+        self.connection_settings = _imap_connection_settings(email_settings)
+        self.last_settings_check = time.monotonic()
+
+        while not self.stopped.is_set():
+            process_email_photos(mail, self.connect)
+            self.reconnect_delay = IMAP_RECONNECT_MIN_DELAY
+
+            if supports_idle:
+                imap_idle(mail, IMAP_IDLE_TIMEOUT, self._should_wake)
+                self.wakeup.clear()
+            else:
+                self._poll_wait(IMAP_POLL_INTERVAL)
+
+            if _imap_connection_settings(get_email_settings()) != self.connection_settings:
+                print("Email settings changed; reconnecting")
+                return
+
+_email_monitor = None
+_email_monitor_lock = threading.Lock()
+
+def start_email_monitor(app=None):
+    """Start the email monitoring thread, or make the running one check its settings and mail now.
+
+    Only the elected leader process runs the monitor; elsewhere this returns None.
+    """
+    global _email_monitor
+    if not is_leader():
+        return None
+    with _email_monitor_lock:
+        if _email_monitor is not None and _email_monitor.is_alive():
+            _email_monitor.notify()
+            return _email_monitor
+
+        _email_monitor = EmailMonitor(app or current_app._get_current_object())
+        _email_monitor.start()
+        return _email_monitor
+
+def stop_email_monitor():
+    """Stop the running email monitor, e.g. when this process is no longer the leader"""
+    global _email_monitor
+    with _email_monitor_lock:
+        if _email_monitor is not None:
+            _email_monitor.stop()
+            _email_monitor = None
+
+def notify_email_monitor():
+    """Tell a running email monitor that settings changed"""
+    if _email_monitor is not None and _email_monitor.is_alive():
+        _email_monitor.notify()
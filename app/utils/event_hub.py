@@ -0,0 +1,104 @@
+import json
+import queue
+import threading
+
+# In-process fan-out for Server-Sent Events. Publishers hand an event to every open
+# stream subscribed to a channel; each stream drains its own bounded queue, so a slow
+# client never blocks the request that published.
+
+SSE_HEARTBEAT_INTERVAL = 15  # seconds between keepalive comments on an idle stream
+SSE_RETRY_DELAY = 5000  # milliseconds browsers wait before reconnecting
+SSE_MAX_QUEUED_EVENTS = 100  # events buffered per stream before it must catch up from the database
+
+class Subscription:
+    """One open stream's queue of events for a channel"""
+
+    def __init__(self, hub, channel, max_queued):
+        self.hub = hub
+        self.channel = channel
+        self.events = queue.Queue(max_queued)
+        self.overflowed = False  # events were dropped; the stream should re-read from the database
+
+    def put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next (name, data, event_id) tuple, or None if nothing arrived within timeout"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def wait(self, timeout):
+        """Use the subscription as a wakeup: block until an event arrives, then drop any queued ones"""
+        if self.get(timeout) is None:
+            return False
+        while self.get(0) is not None:
+            pass
+        self.overflowed = False
+        return True
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+class EventHub:
+    """Channels of subscribers, e.g. one channel per user identifier"""
+
+    def __init__(self, max_queued=SSE_MAX_QUEUED_EVENTS):
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_queued)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, name, data, event_id=None):
+        """Queue an event for every stream on channel; returns how many received it"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put((name, data, event_id))
+        return len(subscribers)
+
+    def has_subscribers(self, channel):
+        with self._lock:
+            return channel in self._channels
+
+    def channels(self):
+        """Channels that currently have at least one subscriber"""
+        with self._lock:
+            return list(self._channels)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+def format_sse(name, data, event_id=None):
+    """Encode one event in the text/event-stream wire format"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+def parse_last_event_id(value):
+    """Integer Last-Event-ID sent by a reconnecting browser, or None"""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,183 @@
+import calendar
+import json
+import os
+import re
+import threading
+import time
+from flask import current_app
+from app import db
+from app.models.photo import Photo
+from app.models.guestbook import GuestbookEntry
+from app.models.messages import Message
+from app.models.settings import Settings
+from app.utils.zip_stream import StreamingZip
+
+EXPORT_JSON_NAME = 'wedding_gallery_data_export.json'
+
+# Progress of in-flight batch downloads, keyed by a client-chosen download id
+DOWNLOAD_PROGRESS_TTL = 3600  # seconds to keep finished or abandoned entries
+_download_progress = {}
+_progress_lock = threading.Lock()
+_DOWNLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def _photo_file_path(photo):
+    if photo.media_type == 'video':
+        return os.path.join(current_app.config['VIDEO_FOLDER'], photo.filename), f"videos/{photo.filename}"
+    if photo.is_photobooth:
+        return os.path.join(current_app.config['PHOTOBOOTH_FOLDER'], photo.filename), f"photobooth/{photo.filename}"
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename), f"photos/{photo.filename}"
+
+def _build_export_data(photos, guestbook_entries, messages):
+    """Serialize all database content for the export JSON.
+
+    Rows are emitted in id order and the timestamp is the newest content date rather
+    than the current time, so the same data always produces byte-identical JSON and a
+    stable ETag for resumed downloads.
+    """
+    timestamps = [photo.upload_date for photo in photos if photo.upload_date]
+    timestamps += [entry.created_at for entry in guestbook_entries if entry.created_at]
+    timestamps += [message.created_at for message in messages if message.created_at]
+    newest = max(timestamps) if timestamps else None
+
+    export_data = {
+        'export_timestamp': newest.isoformat() if newest else None,
+        'photos': [],
+        'guestbook_entries': [],
+        'messages': [],
+        'settings': {}
+    }
+
+    for photo in photos:
+        export_data['photos'].append({
+            'id': photo.id,
+            'filename': photo.filename,
+            'original_filename': photo.original_filename,
+            'uploader_name': photo.uploader_name,
+            'upload_date': photo.upload_date.isoformat(),
+            'description': photo.description,
+            'likes': photo.likes,
+            'media_type': photo.media_type,
+            'duration': photo.duration,
+            'is_photobooth': photo.is_photobooth,
+            'comments': [
+                {
+                    'commenter_name': comment.commenter_name,
+                    'content': comment.content,
+                    'created_at': comment.created_at.isoformat()
+                } for comment in sorted(photo.comments, key=lambda c: c.id)
+            ]
+        })
+
+    for entry in guestbook_entries:
+        export_data['guestbook_entries'].append({
+            'id': entry.id,
+            'name': entry.name,
+            'message': entry.message,
+            'location': entry.location,
+            'photo_filename': entry.photo_filename,
+            'created_at': entry.created_at.isoformat()
+        })
+
+    for message in messages:
+        export_data['messages'].append({
+            'id': message.id,
+            'author_name': message.author_name,
+            'content': message.content,
+            'photo_filename': message.photo_filename,
+            'created_at': message.created_at.isoformat(),
+            'likes': message.likes,
+            'is_hidden': message.is_hidden,
+            'comments': [
+                {
+                    'commenter_name': comment.commenter_name,
+                    'content': comment.content,
+                    'created_at': comment.created_at.isoformat(),
+                    'is_hidden': comment.is_hidden
+                } for comment in sorted(message.message_comments, key=lambda c: c.id)
+            ]
+        })
+
+    export_data['settings'] = dict(sorted(Settings.snapshot().items()))
+    return export_data, newest
+
+def build_gallery_archive():
+    """Describe the full gallery backup ZIP without reading any media.
+
+    Media is stored as-is (JPEG/MP4 do not compress further); only the JSON export is deflated.
+    """
+    archive = StreamingZip()
+
+    photos = Photo.query.options(db.selectinload(Photo.comments)).order_by(Photo.id).all()
+    for photo in photos:
+        file_path, arcname = _photo_file_path(photo)
+        archive.add_file(arcname, file_path)
+
+        if photo.media_type == 'video' and photo.thumbnail_filename:
+            thumb_path = os.path.join(current_app.config['THUMBNAIL_FOLDER'], photo.thumbnail_filename)
+            archive.add_file(f"video_thumbnails/{photo.thumbnail_filename}", thumb_path)
+
+    guestbook_entries = GuestbookEntry.query.order_by(GuestbookEntry.id).all()
+    for entry in guestbook_entries:
+        if entry.photo_filename:
+            file_path = os.path.join(current_app.config['GUESTBOOK_UPLOAD_FOLDER'], entry.photo_filename)
+            archive.add_file(f"guestbook_photos/{entry.photo_filename}", file_path)
+
+    messages = Message.query.options(db.selectinload(Message.message_comments)).order_by(Message.id).all()
+    for message in messages:
+        if message.photo_filename:
+            file_path = os.path.join(current_app.config['MESSAGE_UPLOAD_FOLDER'], message.photo_filename)
+            archive.add_file(f"message_photos/{message.photo_filename}", file_path)
+
+    border_settings = Settings.get('photobooth_border', '{}')
+    border_settings = json.loads(border_settings) if border_settings else {}
+    if border_settings.get('filename'):
+        border_path = os.path.join(current_app.config['BORDER_FOLDER'], border_settings['filename'])
+        archive.add_file(f"borders/{border_settings['filename']}", border_path)
+
+    export_data, newest = _build_export_data(photos, guestbook_entries, messages)
+    export_json = json.dumps(export_data, indent=2, ensure_ascii=False)
+    archive.add_bytes(EXPORT_JSON_NAME, export_json,
+                      mtime=calendar.timegm(newest.timetuple()) if newest else None)
+    return archive
+
+def is_valid_download_id(download_id):
+    return bool(download_id and _DOWNLOAD_ID_PATTERN.match(download_id))
+
+def start_download_progress(download_id, total_bytes, start=0):
+    """Register a download so its progress can be polled"""
+    now = time.time()
+    with _progress_lock:
+        for stale_id in [key for key, value in _download_progress.items()
+                         if now - value['updated_at'] > DOWNLOAD_PROGRESS_TTL]:
+            del _download_progress[stale_id]
+        _download_progress[download_id] = {
+            'total_bytes': total_bytes,
+            'bytes_sent': start,
+            'current_file': None,
+            'finished': False,
+            'started_at': now,
+            'updated_at': now
+        }
+
+def update_download_progress(download_id, bytes_sent, current_file=None, finished=False):
+    with _progress_lock:
+        progress = _download_progress.get(download_id)
+        if not progress:
+            return
+        progress['bytes_sent'] = bytes_sent
+        if current_file:
+            progress['current_file'] = current_file
+        progress['finished'] = finished
+        progress['updated_at'] = time.time()
+
+def get_download_progress(download_id):
+    """Get a copy of a download's progress with a percentage, or None if unknown"""
+    with _progress_lock:
+        progress = _download_progress.get(download_id)
+        if not progress:
+            return None
+        progress = dict(progress)
+
+    total = progress['total_bytes']
+    progress['percent'] = round(progress['bytes_sent'] * 100 / total, 1) if total else 100.0
+    return progress
@@ -0,0 +1,189 @@
+import os
+import json
+import threading
+from flask import current_app, url_for
+
+def get_photo_source_path(photo):
+    """Get the on-disk path of the original file for a gallery photo"""
+    if photo.media_type == 'video':
+        folder = current_app.config['VIDEO_FOLDER']
+    elif photo.is_photobooth:
+        folder = current_app.config['PHOTOBOOTH_FOLDER']
+    else:
+        folder = current_app.config['UPLOAD_FOLDER']
+    return os.path.join(folder, photo.filename)
+
+def get_photo_original_url(photo):
+    """Get the static URL of the original file for a gallery photo"""
+    if photo.is_photobooth:
+        return url_for('static', filename='uploads/photobooth/' + photo.filename)
+    return url_for('static', filename='uploads/' + photo.filename)
+
+def _prepare_for_jpeg(img):
+    """Upright, opaque copy of an opened image, ready for resizing and JPEG encoding"""
+    from PIL import Image, ImageOps
+
+    # Respect camera orientation so phone photos are not sideways
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode not in ('RGB', 'L'):
+        # Flatten transparency onto white before JPEG encoding
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        rgba = img.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        img = background
+    return img
+
+def create_image_rendition(source_path, width, output_path):
+    """Write a JPEG of an image no wider than width to output_path; False if it cannot be converted.
+
+    The file is written under a temporary name and moved into place, so a concurrent
+    reader never sees a partial rendition.
+    """
+    from PIL import Image
+
+    temp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with Image.open(source_path) as img:
+            if getattr(img, 'is_animated', False):
+                return False
+
+            img = _prepare_for_jpeg(img)
+            if img.size[0] > width:
+                height = max(1, round(img.size[1] * width / img.size[0]))
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+            img.save(temp_path, 'JPEG', quality=current_app.config['IMAGE_DERIVATIVE_QUALITY'],
+                     optimize=True, progressive=True)
+        os.replace(temp_path, output_path)
+        return True
+    except Exception as e:
+        print(f"Error creating {width}px rendition of {source_path}: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+def generate_image_derivatives(source_path, widths=None, raise_errors=False):
+    """Create downscaled JPEG copies of an image for responsive display.
+
+    Returns a tuple of ({width: derivative_filename}, (original_width, original_height)).
+    Only widths smaller than the original are generated; animated images are skipped.
+    Errors are logged and give ({}, None) unless raise_errors is set.
+    """
+    from PIL import Image
+
+    if widths is None:
+        widths = current_app.config['IMAGE_DERIVATIVE_WIDTHS']
+
+    derivative_folder = current_app.config['DERIVATIVE_FOLDER']
+    quality = current_app.config['IMAGE_DERIVATIVE_QUALITY']
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    derivatives = {}
+
+    try:
+        with Image.open(source_path) as img:
+            if getattr(img, 'is_animated', False):
+                return derivatives, img.size
+
+            img = _prepare_for_jpeg(img)
+            original_size = img.size
+
+            for width in sorted(widths, reverse=True):
+                if width >= original_size[0]:
+                    continue
+                height = max(1, round(original_size[1] * width / original_size[0]))
+                # Downscale from the previous (larger) rendition to keep resizing cheap
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+                derivative_filename = f"{stem}_{width}w.jpg"
+                img.save(os.path.join(derivative_folder, derivative_filename),
+                         'JPEG', quality=quality, optimize=True, progressive=True)
+                derivatives[width] = derivative_filename
+    except Exception as e:
+        print(f"Error creating image derivatives for {source_path}: {e}")
+        if raise_errors:
+            raise
+        return {}, None
+
+    return derivatives, original_size
+
+def apply_image_derivatives(photo, raise_errors=False):
+    """Generate derivatives for a Photo and record them on the model (caller commits)"""
+    if photo.media_type != 'image':
+        return False
+
+    derivatives, size = generate_image_derivatives(get_photo_source_path(photo), raise_errors=raise_errors)
+    photo.derivatives = json.dumps({str(width): name for width, name in derivatives.items()}) if derivatives else None
+    if size:
+        photo.width, photo.height = size
+    return bool(derivatives)
+
+def delete_image_derivatives(photo):
+    """Remove derivative files belonging to a Photo"""
+    for filename in get_derivative_map(photo).values():
+        try:
+            os.remove(os.path.join(current_app.config['DERIVATIVE_FOLDER'], filename))
+        except OSError:
+            pass
+
+def get_derivative_map(photo):
+    """Get {width: filename} for the derivatives recorded on a Photo"""
+    if not photo.derivatives:
+        return {}
+    try:
+        return {int(width): name for width, name in json.loads(photo.derivatives).items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+def get_photo_thumbnail_url(photo, min_width=None):
+    """Get the smallest image URL that is at least min_width pixels wide.
+
+    Videos use their ffmpeg thumbnail; images without derivatives fall back to the original.
+    """
+    if photo.media_type == 'video':
+        if photo.thumbnail_filename:
+            return url_for('static', filename='uploads/thumbnails/' + photo.thumbnail_filename)
+        return None
+
+    derivatives = get_derivative_map(photo)
+    if not derivatives:
+        return get_photo_original_url(photo)
+
+    if min_width is None:
+        min_width = current_app.config['IMAGE_THUMBNAIL_WIDTH']
+    candidates = [width for width in sorted(derivatives) if width >= min_width]
+    width = candidates[0] if candidates else max(derivatives)
+    return url_for('static', filename='uploads/derivatives/' + derivatives[width])
+
+def get_photo_srcset(photo):
+    """Build an HTML srcset attribute value from a Photo's derivatives"""
+    derivatives = get_derivative_map(photo)
+    if not derivatives:
+        return ''
+
+    entries = [f"{url_for('static', filename='uploads/derivatives/' + name)} {width}w"
+               for width, name in sorted(derivatives.items())]
+    # The original is only listed when its width is known so the browser can rank it
+    if photo.width:
+        entries.append(f"{get_photo_original_url(photo)} {photo.width}w")
+    return ', '.join(entries)
+
+def generate_missing_derivatives(limit=500):
+    """Backfill derivatives for images uploaded before derivatives existed"""
+    from app import db
+    from app.models.photo import Photo
+
+    photos = Photo.query.filter(
+        Photo.media_type == 'image',
+        Photo.derivatives.is_(None)
+    ).order_by(Photo.id).limit(limit).all()
+
+    from app.utils.slideshow_utils import refresh_photo_activity
+
+    generated = 0
+    for photo in photos:
+        if os.path.exists(get_photo_source_path(photo)) and apply_image_derivatives(photo):
+            refresh_photo_activity(photo)
+            generated += 1
+    db.session.commit()
+    return generated
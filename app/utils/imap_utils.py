@@ -0,0 +1,211 @@
+import base64
+import binascii
+import itertools
+import re
+from email.header import decode_header, make_header
+from urllib.parse import unquote
+
+IMAP_FETCH_CHUNK_SIZE = 1024 * 1024  # encoded bytes fetched per request when downloading a part
+
+# Tokens of an IMAP FETCH response: parentheses, quoted strings, literal markers and atoms.
+# Section specifiers such as BODY[HEADER.FIELDS (FROM)]<0> are kept as one atom.
+_TOKEN_PATTERN = re.compile(
+    rb'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"|\{(?P<literal>\d+)\}'
+    rb'|(?P<atom>[^\s()"{\[\]]+(?:\[[^\]]*\](?:<\d+>)?)?))'
+)
+
+_OPEN = object()
+_CLOSE = object()
+
+class _Literal:
+    def __init__(self, data):
+        self.data = data
+
+def _tokenize(response):
+    """Yield tokens from an imaplib response list; literal bodies are yielded as _Literal"""
+    for item in response:
+        if isinstance(item, tuple):
+            text, literal = item
+        else:
+            text, literal = item, None
+        if text is None:
+            continue
+        position = 0
+        while position < len(text):
+            match = _TOKEN_PATTERN.match(text, position)
+            if not match or match.end() == position:
+                break
+            position = match.end()
+            if match.group('open'):
+                yield _OPEN
+            elif match.group('close'):
+                yield _CLOSE
+            elif match.group('quoted') is not None:
+                yield re.sub(rb'\\(.)', rb'\1', match.group('quoted')).decode('utf-8', errors='replace')
+            elif match.group('literal') is not None:
+                continue  # its data follows in the tuple
+            else:
+                atom = match.group('atom').decode('utf-8', errors='replace')
+                yield None if atom.upper() == 'NIL' else atom
+        if literal is not None:
+            yield _Literal(literal)
+
+def _parse_tokens(tokens):
+    """Nest tokens into lists following the parentheses"""
+    stack = [[]]
+    for token in tokens:
+        if token is _OPEN:
+            stack.append([])
+        elif token is _CLOSE:
+            if len(stack) > 1:
+                finished = stack.pop()
+                stack[-1].append(finished)
+        else:
+            stack[-1].append(token.data if isinstance(token, _Literal) else token)
+    return stack[0]
+
+def parse_fetch_response(response):
+    """Parse an imaplib FETCH response into [{ITEM NAME: value}] per message"""
+    messages = []
+    parsed = _parse_tokens(_tokenize(response))
+    for position in range(1, len(parsed)):
+        items = parsed[position]
+        if not isinstance(items, list) or isinstance(parsed[position - 1], list):
+            continue
+        messages.append({str(items[i]).upper(): items[i + 1] for i in range(0, len(items) - 1, 2)})
+    return messages
+
+def _params(value):
+    """Turn a body parameter list ("NAME" "value" ...) into a dict with lowercase keys"""
+    if not isinstance(value, list):
+        return {}
+    return {str(value[i]).lower(): value[i + 1].decode('utf-8', errors='replace') if isinstance(value[i + 1], bytes) else value[i + 1]
+            for i in range(0, len(value) - 1, 2)}
+
+def _decode_filename(params):
+    """Get a filename from parameters, decoding RFC 2231 and RFC 2047 encodings"""
+    if 'filename*' in params or 'name*' in params:
+        encoded = params.get('filename*') or params.get('name*')
+        if encoded.count("'") < 2:
+            return unquote(encoded)
+        charset, _, value = encoded.split("'", 2)
+        try:
+            return unquote(value, encoding=charset or 'utf-8', errors='replace')
+        except LookupError:
+            return unquote(value)
+    filename = params.get('filename') or params.get('name')
+    if filename and '=?' in filename:
+        try:
+            return str(make_header(decode_header(filename)))
+        except Exception:
+            pass
+    return filename
+
+def iter_body_parts(structure, prefix=''):
+    """Yield a dict per leaf part of a BODYSTRUCTURE with its section number, type,
+    encoding, encoded size, disposition and filename"""
+    if not isinstance(structure, list) or not structure:
+        return
+
+    if isinstance(structure[0], list):
+        # Multipart: subparts, then the subtype and extension data
+        for index, child in enumerate(itertools.takewhile(lambda item: isinstance(item, list), structure)):
+            section = f"{prefix}.{index + 1}" if prefix else str(index + 1)
+            yield from iter_body_parts(child, section)
+        return
+
+    section = prefix or '1'
+    main_type = str(structure[0] or '').lower()
+    sub_type = str(structure[1] or '').lower() if len(structure) > 1 else ''
+
+    if main_type == 'message' and sub_type == 'rfc822' and len(structure) > 8 and isinstance(structure[8], list):
+        # Attached email: its parts are numbered below this one
+        inner = structure[8]
+        yield from iter_body_parts(inner, section if isinstance(inner[0], list) else f"{section}.1")
+        return
+
+    # Extension data starts after the basic fields, plus lines for text parts
+    disposition_index = 8 if main_type == 'text' else 7
+    disposition = structure[disposition_index + 1] if len(structure) > disposition_index + 1 else None
+    disposition_type = None
+    disposition_params = {}
+    if isinstance(disposition, list) and disposition:
+        disposition_type = str(disposition[0]).lower()
+        disposition_params = _params(disposition[1]) if len(disposition) > 1 else {}
+
+    content_params = _params(structure[2]) if len(structure) > 2 else {}
+    filename = _decode_filename(disposition_params) or _decode_filename(content_params)
+    try:
+        size = int(structure[6])
+    except (IndexError, TypeError, ValueError):
+        size = 0
+
+    yield {
+        'section': section,
+        'content_type': f"{main_type}/{sub_type}",
+        'encoding': str(structure[5] or '7bit').lower() if len(structure) > 5 else '7bit',
+        'size': size,
+        'disposition': disposition_type,
+        'filename': filename
+    }
+
+class PartDecoder:
+    """Decode a transfer-encoded body part written in arbitrary chunks"""
+
+    def __init__(self, encoding, output):
+        self.encoding = encoding
+        self.output = output
+        self.pending = b''
+
+    def write(self, data):
+        if self.encoding == 'base64':
+            self.pending += re.sub(rb'[^A-Za-z0-9+/=]', b'', data)
+            usable = len(self.pending) // 4 * 4
+            if usable:
+                self.output.write(base64.b64decode(self.pending[:usable]))
+                self.pending = self.pending[usable:]
+        elif self.encoding == 'quoted-printable':
+            self.pending += data
+            # Only decode complete lines so soft line breaks and escapes are not split
+            line_end = self.pending.rfind(b'\n')
+            if line_end >= 0:
+                self.output.write(binascii.a2b_qp(self.pending[:line_end + 1]))
+                self.pending = self.pending[line_end + 1:]
+        else:
+            self.output.write(data)
+
+    def close(self):
+        if self.pending:
+            if self.encoding == 'base64':
+                padded = self.pending.rstrip(b'=')
+                padded += b'=' * (-len(padded) % 4)
+                self.output.write(base64.b64decode(padded))
+            else:
+                self.output.write(binascii.a2b_qp(self.pending))
+            self.pending = b''
+
+def download_part(mail, uid, part, output, chunk_size=IMAP_FETCH_CHUNK_SIZE):
+    """Fetch one body part by UID in chunks and write it decoded to output.
+
+    Uses BODY.PEEK so the message is not marked as read, and partial fetches so
+    no more than chunk_size encoded bytes are held in memory at a time.
+    """
+    decoder = PartDecoder(part['encoding'], output)
+    offset = 0
+    while True:
+        status, response = mail.uid('FETCH', uid, f"(BODY.PEEK[{part['section']}]<{offset}.{chunk_size}>)")
+        if status != 'OK':
+            raise RuntimeError(f"Fetching part {part['section']} of message {uid} failed: {status}")
+
+        data = b''
+        for message in parse_fetch_response(response):
+            for key, value in message.items():
+                if key.startswith('BODY[') and value:
+                    data = value if isinstance(value, bytes) else value.encode()
+        if data:
+            decoder.write(data)
+            offset += len(data)
+        if len(data) < chunk_size:
+            break
+    decoder.close()
+    return offset
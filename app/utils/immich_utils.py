@@ -1,204 +1,734 @@
+import hashlib
+import json
 import os
+import random
+import threading
+import time
 import requests
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from pathlib import Path
 from flask import current_app
+from requests.adapters import HTTPAdapter
 from app import db
 from app.models.photo import Photo
 from app.models.guestbook import GuestbookEntry
 from app.models.messages import Message
-from app.models.email import ImmichSyncLog
+from app.models.email import ImmichSyncLog, ImmichAsset
+from app.models.jobs import MediaJob
+from app.models.settings import Settings
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.image_utils import get_photo_source_path
+from app.utils.job_queue import enqueue_job
 from app.utils.settings_utils import get_immich_settings
 
-def sync_file_to_immich(file_path, filename, description=""):
-    """Sync a file to Immich server"""
-    try:
-        immich_settings = get_immich_settings()
-        if not immich_settings['enabled'] or not immich_settings['server_url'] or not immich_settings['api_key']:
-            return False, "Immich sync not configured"
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return False, f"File not found: {file_path}"
-        
-        # Prepare headers for Immich API
-        headers = {
-            'x-api-key': immich_settings['api_key'],
-            'Content-Type': 'application/octet-stream'
-        }
-        
-        # Upload file to Immich
-        upload_url = f"{immich_settings['server_url'].rstrip('/')}/api/asset/upload"
-        
-        with open(file_path, 'rb') as f:
+IMMICH_SYNC_WORKERS = 4  # concurrent uploads during a bulk sync
+IMMICH_CHECKPOINT_SIZE = 25  # sync results committed together
+IMMICH_CHECK_BATCH_SIZE = 100  # files hashed and checked against Immich per round
+IMMICH_ALBUM_BATCH_SIZE = 100  # asset ids added to the album per request
+IMMICH_ALBUM_FLUSH_DELAY = 30  # seconds single uploads wait to share an album request
+IMMICH_SYNC_STATS_KEY = 'immich_last_sync_stats'
+IMMICH_RETRY_BASE_DELAY = 60  # seconds before the first retry of a failed upload, doubled each time
+IMMICH_RETRY_MAX_DELAY = 6 * 3600  # longest wait between retries
+IMMICH_MAX_RETRIES = 8  # retries before a failed upload is given up
+IMMICH_RETRY_CONCURRENCY = 2  # retries uploaded in parallel
+IMMICH_RETRY_BATCH_SIZE = 20  # retries handled per retry job
+IMMICH_MAX_CONCURRENT_UPLOADS = 4  # uploads in flight per process, across bulk sync, jobs and retries
+IMMICH_CIRCUIT_FAILURES = 5  # consecutive connection errors or 5xx responses before failing fast
+IMMICH_CIRCUIT_RESET = 60  # seconds before a trial request is let through again
+IMMICH_UPLOAD_TIMEOUT = 60  # seconds
+IMMICH_API_TIMEOUT = 10  # seconds
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class ImmichError(Exception):
+    """Raised when the Immich API rejects a request"""
+
+_upload_slots = threading.BoundedSemaphore(IMMICH_MAX_CONCURRENT_UPLOADS)
+
+class ImmichSyncStats:
+    """Throughput and latency counters for one sync run, safe to update from pool threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self._start = time.monotonic()
+        self._elapsed = None
+        self.counts = {'candidates': 0, 'uploaded': 0, 'duplicates': 0, 'unchanged': 0, 'errors': 0}
+        self.bytes_uploaded = 0
+        self.requests = {}  # {kind: {'count', 'errors', 'total_seconds', 'max_seconds'}}
+
+    def increment(self, key, amount=1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def record_request(self, kind, seconds, ok=True, bytes_sent=0):
+        with self._lock:
+            request_stats = self.requests.setdefault(kind, {'count': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            request_stats['count'] += 1
+            request_stats['total_seconds'] += seconds
+            request_stats['max_seconds'] = max(request_stats['max_seconds'], seconds)
+            if ok:
+                self.bytes_uploaded += bytes_sent
+            else:
+                request_stats['errors'] += 1
+
+    def finish(self):
+        self.finished_at = datetime.utcnow()
+        self._elapsed = time.monotonic() - self._start
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = self._elapsed if self._elapsed is not None else time.monotonic() - self._start
+            processed = self.counts['uploaded'] + self.counts['duplicates'] + self.counts['unchanged'] + self.counts['errors']
+            return {
+                'started_at': self.started_at.isoformat(),
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+                'elapsed_seconds': round(elapsed, 2),
+                'counts': dict(self.counts),
+                'processed': processed,
+                'bytes_uploaded': self.bytes_uploaded,
+                'files_per_second': round(processed / elapsed, 2) if elapsed else 0,
+                'megabytes_per_second': round(self.bytes_uploaded / 1048576 / elapsed, 2) if elapsed else 0,
+                'requests': {
+                    kind: {
+                        'count': stats['count'],
+                        'errors': stats['errors'],
+                        'avg_ms': round(stats['total_seconds'] * 1000 / stats['count'], 1) if stats['count'] else 0,
+                        'max_ms': round(stats['max_seconds'] * 1000, 1)
+                    } for kind, stats in self.requests.items()
+                }
+            }
+
+class ImmichClient:
+    """Immich API client sharing one pooled HTTP session (keep-alive) across threads"""
+
+    def __init__(self, server_url, api_key, pool_size=IMMICH_SYNC_WORKERS):
+        self.base_url = server_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.headers['x-api-key'] = api_key
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.supports_bulk_check = True  # cleared if the server predates bulk-upload-check
+        self.breaker = CircuitBreaker('Immich server', IMMICH_CIRCUIT_FAILURES, IMMICH_CIRCUIT_RESET)
+
+    def _request(self, method, path, kind, stats=None, bytes_sent=0, **kwargs):
+        """Send a request, recording its latency in stats if given.
+
+        Fails fast with CircuitOpenError while the server is considered down.
+        """
+        self.breaker.before_call()
+        started = time.monotonic()
+        ok = False
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            self.breaker.release_trial()
+            raise
+        else:
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            ok = response.status_code < 400
+            return response
+        finally:
+            if stats is not None:
+                stats.record_request(kind, time.monotonic() - started, ok, bytes_sent)
+
+    def upload_asset(self, file_path, filename, description='', checksum=None, stats=None):
+        """Upload a file and return (asset_id, duplicate).
+
+        The SHA-1 checksum header lets Immich recognise content it already has and
+        return the existing asset instead of storing a second copy.
+        """
+        stat = os.stat(file_path)
+        modified_at = datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+        headers = {'x-immich-checksum': checksum} if checksum else {}
+
+        with _upload_slots, open(file_path, 'rb') as f:
             files = {'assetData': (filename, f, 'application/octet-stream')}
             data = {
                 'deviceAssetId': filename,
                 'deviceId': 'wedding-gallery',
-                'fileCreatedAt': datetime.now().isoformat(),
-                'fileModifiedAt': datetime.now().isoformat(),
-                'isFavorite': False,
+                'fileCreatedAt': modified_at,
+                'fileModifiedAt': modified_at,
+                'isFavorite': 'false',
                 'fileExtension': Path(filename).suffix.lower().lstrip('.'),
                 'description': description
             }
-            
-            response = requests.post(upload_url, headers=headers, files=files, data=data, timeout=30)
-            
-            if response.status_code == 201:
-                asset_data = response.json()
-                asset_id = asset_data.get('id')
-                
-                # Add to album if specified
-                if immich_settings['album_name']:
-                    album_url = f"{immich_settings['server_url'].rstrip('/')}/api/album/{immich_settings['album_name']}/assets"
-                    album_data = {'ids': [asset_id]}
-                    album_response = requests.put(album_url, headers=headers, json=album_data, timeout=10)
-                
-                return True, asset_id
-            else:
-                return False, f"Immich API error: {response.status_code} - {response.text}"
-                
+            response = self._request('post', '/api/asset/upload', 'upload', stats, bytes_sent=stat.st_size,
+                                     headers=headers, files=files, data=data, timeout=IMMICH_UPLOAD_TIMEOUT)
+
+        if response.status_code not in (200, 201):
+            raise ImmichError(f"Immich API error: {response.status_code} - {response.text}")
+
+        asset_data = response.json()
+        duplicate = response.status_code == 200 or bool(asset_data.get('duplicate'))
+        return asset_data.get('id'), duplicate
+
+    def bulk_upload_check(self, assets, stats=None):
+        """Ask Immich which of [(id, sha1)] it already stores.
+
+        Returns {id: existing asset id or None}, or None if the server does not support the check.
+        """
+        if not self.supports_bulk_check or not assets:
+            return None
+
+        response = self._request('post', '/api/asset/bulk-upload-check', 'bulk_check', stats,
+                                 json={'assets': [{'id': asset_id, 'checksum': checksum} for asset_id, checksum in assets]},
+                                 timeout=IMMICH_API_TIMEOUT)
+        if response.status_code in (404, 405):
+            self.supports_bulk_check = False
+            return None
+        if response.status_code not in (200, 201):
+            raise ImmichError(f"Immich bulk check error: {response.status_code} - {response.text}")
+
+        existing = {}
+        for result in response.json().get('results', []):
+            is_duplicate = result.get('action') == 'reject' and result.get('reason') == 'duplicate'
+            existing[result.get('id')] = result.get('assetId') if is_duplicate else None
+        return existing
+
+    def add_assets_to_album(self, album_name, asset_ids, stats=None):
+        """Add several assets to an album in one request"""
+        response = self._request('put', f"/api/album/{album_name}/assets", 'album', stats,
+                                 json={'ids': list(asset_ids)}, timeout=IMMICH_API_TIMEOUT)
+        if response.status_code not in (200, 201):
+            raise ImmichError(f"Immich album error: {response.status_code} - {response.text}")
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_immich_client(immich_settings):
+    """Get the shared client for the configured server, reusing its connection pool"""
+    key = (immich_settings['server_url'], immich_settings['api_key'])
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            _clients.clear()  # settings changed; drop clients for the old server
+            client = _clients[key] = ImmichClient(*key)
+        return client
+
+def file_sha1(file_path):
+    """SHA-1 of a file, the checksum Immich uses to detect duplicates"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _is_configured(immich_settings):
+    return immich_settings['enabled'] and immich_settings['server_url'] and immich_settings['api_key']
+
+def record_asset_sync(file_path, filename, checksum, asset_id, album_added=False):
+    """Mark a file as synced in the per-asset state table (caller commits)"""
+    state = ImmichAsset.query.filter_by(file_path=file_path).first()
+    if state is None:
+        state = ImmichAsset(file_path=file_path, filename=filename)
+        db.session.add(state)
+
+    stat = os.stat(file_path)
+    now = datetime.utcnow()
+    state.checksum = checksum
+    state.file_size = stat.st_size
+    state.file_mtime = stat.st_mtime
+    state.status = 'synced'
+    state.immich_asset_id = asset_id
+    state.album_added = album_added
+    state.attempts = (state.attempts or 0) + 1
+    state.error_message = None
+    state.last_attempt_at = now
+    state.synced_at = now
+    return state
+
+def sync_file_to_immich(file_path, filename, description=""):
+    """Sync a file to Immich server.
+
+    The album assignment is deferred: the asset is marked for the album and a delayed
+    flush job adds everything uploaded in the meantime with one request (caller commits).
+    """
+    try:
+        immich_settings = get_immich_settings()
+        if not _is_configured(immich_settings):
+            return False, "Immich sync not configured"
+
+        # Check if file exists
+        if not os.path.exists(file_path):
+            return False, f"File not found: {file_path}"
+
+        client = get_immich_client(immich_settings)
+        checksum = file_sha1(file_path)
+        asset_id, duplicate = client.upload_asset(file_path, filename, description, checksum)
+
+        record_asset_sync(file_path, filename, checksum, asset_id, album_added=not immich_settings['album_name'])
+        return True, asset_id
+
     except Exception as e:
         return False, f"Error syncing to Immich: {str(e)}"
 
-def sync_all_to_immich():
-    """Sync all eligible files to Immich"""
+def schedule_album_flush():
+    """Queue a delayed album flush unless one is already waiting"""
+    if not get_immich_settings()['album_name']:
+        return None
+    pending = MediaJob.query.filter_by(job_type='immich_album_flush', status='pending').first()
+    if pending:
+        return pending
+    return enqueue_job('immich_album_flush', run_after=datetime.utcnow() + timedelta(seconds=IMMICH_ALBUM_FLUSH_DELAY))
+
+def flush_album_additions():
+    """Add every synced asset not yet in the album, in batches; returns the number added"""
+    immich_settings = get_immich_settings()
+    album_name = immich_settings['album_name']
+    if not album_name or not _is_configured(immich_settings):
+        return 0
+
+    client = get_immich_client(immich_settings)
+    added = 0
+    while True:
+        batch = ImmichAsset.query.filter(
+            ImmichAsset.status == 'synced',
+            ImmichAsset.album_added == False,
+            ImmichAsset.immich_asset_id.isnot(None)
+        ).order_by(ImmichAsset.id).limit(IMMICH_ALBUM_BATCH_SIZE).all()
+        if not batch:
+            return added
+
+        client.add_assets_to_album(album_name, [state.immich_asset_id for state in batch])
+        for state in batch:
+            state.album_added = True
+        db.session.commit()
+        added += len(batch)
+
+def next_retry_time(retry_count):
+    """When to retry after retry_count failed retries: exponential backoff with jitter.
+
+    Half the (capped) delay is fixed and the other half random, so uploads that failed
+    together during an outage do not all retry at the same moment.
+    """
+    delay = min(IMMICH_RETRY_BASE_DELAY * 2 ** retry_count, IMMICH_RETRY_MAX_DELAY)
+    return datetime.utcnow() + timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+def record_sync_failure(file_path, filename, description, error_message):
+    """Log a failed upload and schedule its first retry (caller commits)"""
+    sync_log = ImmichSyncLog(
+        filename=filename,
+        file_path=file_path,
+        status='error',
+        error_message=error_message,
+        description=description,
+        retry_count=0,
+        next_retry_at=next_retry_time(0)
+    )
+    db.session.add(sync_log)
+    return sync_log
+
+def _retryable_logs():
+    return ImmichSyncLog.query.filter(
+        ImmichSyncLog.status == 'error',
+        ImmichSyncLog.next_retry_at.isnot(None),
+        ImmichSyncLog.retry_count < IMMICH_MAX_RETRIES
+    )
+
+def schedule_immich_retry():
+    """Queue an immich_retry job for when the next failed upload is due; returns it or None"""
+    next_due = _retryable_logs().with_entities(db.func.min(ImmichSyncLog.next_retry_at)).scalar()
+    if next_due is None:
+        return None
+
+    pending = MediaJob.query.filter_by(job_type='immich_retry', status='pending').first()
+    if pending:
+        if pending.run_after > next_due:
+            pending.run_after = next_due
+            db.session.commit()
+        return pending
+    return enqueue_job('immich_retry', run_after=next_due, max_attempts=1)
+
+def _retry_upload(client, file_path, filename, description):
+    """Hash and upload one file; runs on a pool thread, so it must not touch the database"""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    checksum = file_sha1(file_path)
+    asset_id, duplicate = client.upload_asset(file_path, filename, description, checksum)
+    return asset_id, checksum
+
+def retry_failed_syncs():
+    """Retry failed uploads whose backoff has elapsed, a few at a time; returns how many succeeded"""
+    immich_settings = get_immich_settings()
+    if not _is_configured(immich_settings):
+        return 0
+
+    client = get_immich_client(immich_settings)
+    now = datetime.utcnow()
+    if client.breaker.state == 'open':
+        # Nothing can succeed yet; move everything due to the end of the open period
+        _retryable_logs().filter(ImmichSyncLog.next_retry_at <= now).update(
+            {'next_retry_at': now + timedelta(seconds=client.breaker.retry_after())}, synchronize_session=False)
+        db.session.commit()
+        return 0
+
+    due = _retryable_logs().filter(ImmichSyncLog.next_retry_at <= now).order_by(
+        ImmichSyncLog.next_retry_at).limit(IMMICH_RETRY_BATCH_SIZE).all()
+
+    # One retry per file, even if it failed several times
+    retries = {}
+    for sync_log in due:
+        if sync_log.file_path in retries:
+            sync_log.next_retry_at = None
+        else:
+            retries[sync_log.file_path] = sync_log
+
+    succeeded = 0
+    with ThreadPoolExecutor(max_workers=IMMICH_RETRY_CONCURRENCY, thread_name_prefix='immich-retry') as executor:
+        futures = {
+            executor.submit(_retry_upload, client, sync_log.file_path, sync_log.filename, sync_log.description or ''): sync_log
+            for sync_log in retries.values()
+        }
+        for future in as_completed(futures):
+            sync_log = futures[future]
+            try:
+                asset_id, checksum = future.result()
+            except CircuitOpenError:
+                # Not an attempt; wait for the circuit to half-open
+                sync_log.next_retry_at = datetime.utcnow() + timedelta(seconds=client.breaker.retry_after())
+                continue
+            except FileNotFoundError as e:
+                sync_log.retry_count = (sync_log.retry_count or 0) + 1
+                sync_log.last_retry = datetime.utcnow()
+                sync_log.error_message = str(e)
+                sync_log.next_retry_at = None  # nothing left to upload
+                continue
+            except Exception as e:
+                sync_log.retry_count = (sync_log.retry_count or 0) + 1
+                sync_log.last_retry = datetime.utcnow()
+                sync_log.error_message = f"Error syncing to Immich: {str(e)}"
+                sync_log.next_retry_at = (next_retry_time(sync_log.retry_count)
+                                          if sync_log.retry_count < IMMICH_MAX_RETRIES else None)
+                continue
+
+            sync_log.retry_count = (sync_log.retry_count or 0) + 1
+            sync_log.last_retry = datetime.utcnow()
+            sync_log.status = 'success'
+            sync_log.immich_asset_id = asset_id
+            sync_log.error_message = None
+            sync_log.next_retry_at = None
+            # Older failures of the same file are resolved too
+            ImmichSyncLog.query.filter(
+                ImmichSyncLog.file_path == sync_log.file_path,
+                ImmichSyncLog.status == 'error',
+                ImmichSyncLog.id != sync_log.id
+            ).update({'next_retry_at': None}, synchronize_session=False)
+            record_asset_sync(sync_log.file_path, sync_log.filename, checksum, asset_id,
+                              album_added=not immich_settings['album_name'])
+            succeeded += 1
+
+    db.session.commit()
+    if succeeded:
+        schedule_album_flush()
+    return succeeded
+
+def collect_sync_candidates(immich_settings):
+    """List every file the enabled sync options cover as dicts of path, name, description and source"""
+    candidates = []
+
+    def add(source_type, source_id, file_path, filename, description):
+        candidates.append({
+            'source_type': source_type,
+            'source_id': source_id,
+            'file_path': file_path,
+            'filename': filename,
+            'description': description
+        })
+
+    if immich_settings['sync_photos']:
+        for photo in Photo.query.filter_by(media_type='image', is_photobooth=False).order_by(Photo.id):
+            description = f"Wedding photo by {photo.uploader_name}"
+            if photo.description:
+                description += f" - {photo.description}"
+            add('photo', photo.id, get_photo_source_path(photo), photo.filename, description)
+
+    if immich_settings['sync_videos']:
+        for video in Photo.query.filter_by(media_type='video').order_by(Photo.id):
+            description = f"Wedding video by {video.uploader_name}"
+            if video.description:
+                description += f" - {video.description}"
+            add('video', video.id, get_photo_source_path(video), video.filename, description)
+
+    if immich_settings['sync_guestbook']:
+        entries = GuestbookEntry.query.filter(GuestbookEntry.photo_filename.isnot(None)).order_by(GuestbookEntry.id)
+        for entry in entries:
+            description = f"Guestbook photo by {entry.name} from {entry.location}"
+            if entry.message:
+                description += f" - {entry.message[:100]}"
+            file_path = os.path.join(current_app.config['GUESTBOOK_UPLOAD_FOLDER'], entry.photo_filename)
+            add('guestbook', entry.id, file_path, entry.photo_filename, description)
+
+    if immich_settings['sync_messages']:
+        messages = Message.query.filter(Message.photo_filename.isnot(None)).order_by(Message.id)
+        for message in messages:
+            description = f"Message photo by {message.author_name}"
+            if message.content:
+                description += f" - {message.content[:100]}"
+            file_path = os.path.join(current_app.config['MESSAGE_UPLOAD_FOLDER'], message.photo_filename)
+            add('message', message.id, file_path, message.photo_filename, description)
+
+    if immich_settings['sync_photobooth']:
+        for photo in Photo.query.filter_by(is_photobooth=True).order_by(Photo.id):
+            description = f"Photobooth photo by {photo.uploader_name}"
+            if photo.description:
+                description += f" - {photo.description}"
+            add('photobooth', photo.id, get_photo_source_path(photo), photo.filename, description)
+
+    return candidates
+
+def _hash_candidate(candidate):
+    """Stat and hash one file; runs on a pool thread, so it must not touch the database"""
+    stat = os.stat(candidate['file_path'])
+    return {
+        'checksum': file_sha1(candidate['file_path']),
+        'file_size': stat.st_size,
+        'file_mtime': stat.st_mtime
+    }
+
+# In-process counters of the sync currently running, for the admin status endpoint
+_current_sync_stats = None
+
+class ImmichSyncRun:
+    """One bulk sync, processed in rounds of IMMICH_CHECK_BATCH_SIZE files.
+
+    Each round hashes its files on a bounded thread pool, asks Immich in a single
+    bulk-upload-check which checksums it already stores, and uploads only the rest on
+    the same pool. All database work stays on the calling thread and is committed in
+    checkpoints, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, immich_settings, max_workers=IMMICH_SYNC_WORKERS):
+        self.settings = immich_settings
+        self.album_name = immich_settings['album_name']
+        self.client = get_immich_client(immich_settings)
+        self.max_workers = max_workers
+        self.stats = ImmichSyncStats()
+        self.aborted = None
+        self.states = {}
+        self.album_pending = []
+        self.uncommitted = 0
+
+    def run(self):
+        global _current_sync_stats
+        _current_sync_stats = self.stats
+        try:
+            self.states = {state.file_path: state for state in ImmichAsset.query.all()}
+
+            # Assets uploaded by an interrupted run or single uploads but not added to the album yet
+            if self.album_name:
+                self.album_pending = [state for state in self.states.values()
+                                      if state.status == 'synced' and state.immich_asset_id and not state.album_added]
+
+            try:
+                with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='immich-sync') as executor:
+                    batch = []
+                    for candidate in collect_sync_candidates(self.settings):
+                        self.stats.increment('candidates')
+                        state = self._get_state(candidate)
+                        try:
+                            stat = os.stat(candidate['file_path'])
+                        except OSError:
+                            self._record_error(state, candidate, f"File not found: {candidate['file_path']}")
+                            continue
+
+                        if state.status == 'synced' and state.file_size == stat.st_size and state.file_mtime == stat.st_mtime:
+                            self.stats.increment('unchanged')
+                            continue
+
+                        batch.append((candidate, state))
+                        if len(batch) >= IMMICH_CHECK_BATCH_SIZE:
+                            self._process_batch(executor, batch)
+                            batch = []
+
+                    if batch:
+                        self._process_batch(executor, batch)
+            except CircuitOpenError as e:
+                # Keep what was synced so far; the next run resumes from here
+                self.aborted = str(e)
+
+            self._flush_album(force=True)
+            db.session.commit()
+        finally:
+            self.stats.finish()
+            _current_sync_stats = None
+
+        self._save_stats()
+        return self.stats
+
+    def _process_batch(self, executor, batch):
+        # Stop instead of failing every remaining file while the server is down
+        if self.client.breaker.state == 'open':
+            raise CircuitOpenError(f"Immich server unavailable; sync stopped after {self.stats.counts['candidates']} file(s)")
+
+        # Hash in parallel
+        hashed = []
+        for (candidate, state), future in [(item, executor.submit(_hash_candidate, item[0])) for item in batch]:
+            try:
+                hashed.append((candidate, state, future.result()))
+            except Exception as e:
+                self._record_error(state, candidate, f"Error reading file: {str(e)}")
+
+        # Touched but unchanged since the last sync
+        changed = []
+        for candidate, state, file_info in hashed:
+            if state.status == 'synced' and state.checksum == file_info['checksum']:
+                state.file_size = file_info['file_size']
+                state.file_mtime = file_info['file_mtime']
+                self.stats.increment('unchanged')
+                self._checkpoint()
+            else:
+                changed.append((candidate, state, file_info))
+
+        # One request tells which of the rest Immich already has
+        existing = None
+        try:
+            existing = self.client.bulk_upload_check(
+                [(state.file_path, file_info['checksum']) for _, state, file_info in changed], self.stats)
+        except Exception as e:
+            print(f"Immich bulk upload check failed, uploading without it: {e}")
+
+        uploads = {}
+        for candidate, state, file_info in changed:
+            existing_asset_id = existing.get(state.file_path) if existing else None
+            if existing_asset_id:
+                self._record_synced(state, file_info, existing_asset_id, duplicate=True)
+            else:
+                future = executor.submit(self.client.upload_asset, candidate['file_path'], candidate['filename'],
+                                         candidate['description'], file_info['checksum'], self.stats)
+                uploads[future] = (candidate, state, file_info)
+
+        for future in as_completed(uploads):
+            candidate, state, file_info = uploads[future]
+            try:
+                asset_id, duplicate = future.result()
+            except Exception as e:
+                self._record_error(state, candidate, f"Error syncing to Immich: {str(e)}")
+            else:
+                self._record_synced(state, file_info, asset_id, duplicate)
+
+    def _get_state(self, candidate):
+        state = self.states.get(candidate['file_path'])
+        if state is None:
+            state = ImmichAsset(file_path=candidate['file_path'], status='pending', attempts=0, album_added=False)
+            db.session.add(state)
+            self.states[candidate['file_path']] = state
+        state.filename = candidate['filename']
+        state.source_type = candidate['source_type']
+        state.source_id = candidate['source_id']
+        return state
+
+    def _record_synced(self, state, file_info, asset_id, duplicate=False):
+        now = datetime.utcnow()
+        state.checksum = file_info['checksum']
+        state.file_size = file_info['file_size']
+        state.file_mtime = file_info['file_mtime']
+        if state.immich_asset_id != asset_id:
+            state.album_added = False
+        state.immich_asset_id = asset_id
+        state.status = 'synced'
+        state.attempts = (state.attempts or 0) + 1
+        state.error_message = None
+        state.last_attempt_at = now
+        state.synced_at = now
+        db.session.add(ImmichSyncLog(
+            filename=state.filename,
+            file_path=state.file_path,
+            status='success',
+            immich_asset_id=asset_id
+        ))
+        if self.album_name and not state.album_added:
+            self.album_pending.append(state)
+        self.stats.increment('duplicates' if duplicate else 'uploaded')
+        self._checkpoint()
+
+    def _record_error(self, state, candidate, message):
+        state.status = 'error'
+        state.attempts = (state.attempts or 0) + 1
+        state.error_message = message
+        state.last_attempt_at = datetime.utcnow()
+        record_sync_failure(state.file_path, state.filename, candidate['description'], message)
+        self.stats.increment('errors')
+        self._checkpoint()
+
+    def _checkpoint(self):
+        """Commit every few results so a crash loses at most one checkpoint of progress"""
+        self.uncommitted += 1
+        if self.uncommitted < IMMICH_CHECKPOINT_SIZE:
+            return
+        self._flush_album()
+        db.session.commit()
+        self.uncommitted = 0
+
+    def _flush_album(self, force=False):
+        """Add accumulated assets to the album in batches"""
+        if not self.album_name:
+            return
+        while self.album_pending and (force or len(self.album_pending) >= IMMICH_ALBUM_BATCH_SIZE):
+            batch = self.album_pending[:IMMICH_ALBUM_BATCH_SIZE]
+            try:
+                self.client.add_assets_to_album(self.album_name, [state.immich_asset_id for state in batch], self.stats)
+            except Exception as e:
+                # Left pending; the next run retries them
+                print(f"Error adding {len(batch)} asset(s) to Immich album: {e}")
+                return
+            for state in batch:
+                state.album_added = True
+            del self.album_pending[:len(batch)]
+
+    def _save_stats(self):
+        try:
+            Settings.set(IMMICH_SYNC_STATS_KEY, json.dumps(self.stats.to_dict()))
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error saving Immich sync stats: {e}")
+
+def get_immich_sync_stats():
+    """Get counters of the sync running in this process (if any) and of the last finished run,
+    plus the retry backlog and the state of the server's circuit breaker"""
+    current = _current_sync_stats
+    last = Settings.get(IMMICH_SYNC_STATS_KEY)
+    immich_settings = get_immich_settings()
+    return {
+        'running': current is not None,
+        'current': current.to_dict() if current is not None else None,
+        'last': json.loads(last) if last else None,
+        'retry_pending': _retryable_logs().count(),
+        'circuit': get_immich_client(immich_settings).breaker.get_status() if _is_configured(immich_settings) else None
+    }
+
+def sync_all_to_immich(max_workers=IMMICH_SYNC_WORKERS):
+    """Sync all eligible files to Immich.
+
+    Files synced before are skipped when their size and mtime are unchanged (or, failing
+    that, their checksum), and progress is committed in checkpoints so a sync that was
+    interrupted picks up where it stopped.
+    """
     try:
         immich_settings = get_immich_settings()
         if not immich_settings['enabled']:
             return False, "Immich sync not enabled"
-        
-        synced_count = 0
-        error_count = 0
-        
-        # Sync photos
-        if immich_settings['sync_photos']:
-            photos = Photo.query.filter_by(media_type='image').all()
-            for photo in photos:
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename)
-                description = f"Wedding photo by {photo.uploader_name}"
-                if photo.description:
-                    description += f" - {photo.description}"
-                
-                success, result = sync_file_to_immich(file_path, photo.filename, description)
-                
-                # Log sync attempt
-                sync_log = ImmichSyncLog(
-                    filename=photo.filename,
-                    file_path=file_path,
-                    status='success' if success else 'error',
-                    immich_asset_id=result if success else None,
-                    error_message=str(result) if not success else None
-                )
-                db.session.add(sync_log)
-                
-                if success:
-                    synced_count += 1
-                else:
-                    error_count += 1
-        
-        # Sync videos
-        if immich_settings['sync_videos']:
-            videos = Photo.query.filter_by(media_type='video').all()
-            for video in videos:
-                file_path = os.path.join(current_app.config['VIDEO_FOLDER'], video.filename)
-                description = f"Wedding video by {video.uploader_name}"
-                if video.description:
-                    description += f" - {video.description}"
-                
-                success, result = sync_file_to_immich(file_path, video.filename, description)
-                
-                sync_log = ImmichSyncLog(
-                    filename=video.filename,
-                    file_path=file_path,
-                    status='success' if success else 'error',
-                    immich_asset_id=result if success else None,
-                    error_message=str(result) if not success else None
-                )
-                db.session.add(sync_log)
-                
-                if success:
-                    synced_count += 1
-                else:
-                    error_count += 1
-        
-        # Sync guestbook photos
-        if immich_settings['sync_guestbook']:
-            guestbook_entries = GuestbookEntry.query.filter(GuestbookEntry.photo_filename.isnot(None)).all()
-            for entry in guestbook_entries:
-                file_path = os.path.join(current_app.config['GUESTBOOK_UPLOAD_FOLDER'], entry.photo_filename)
-                description = f"Guestbook photo by {entry.name} from {entry.location}"
-                if entry.message:
-                    description += f" - {entry.message[:100]}"
-                
-                success, result = sync_file_to_immich(file_path, entry.photo_filename, description)
-                
-                sync_log = ImmichSyncLog(
-                    filename=entry.photo_filename,
-                    file_path=file_path,
-                    status='success' if success else 'error',
-                    immich_asset_id=result if success else None,
-                    error_message=str(result) if not success else None
-                )
-                db.session.add(sync_log)
-                
-                if success:
-                    synced_count += 1
-                else:
-                    error_count += 1
-        
-        # Sync message photos
-        if immich_settings['sync_messages']:
-            messages = Message.query.filter(Message.photo_filename.isnot(None)).all()
-            for message in messages:
-                file_path = os.path.join(current_app.config['MESSAGE_UPLOAD_FOLDER'], message.photo_filename)
-                description = f"Message photo by {message.author_name}"
-                if message.content:
-                    description += f" - {message.content[:100]}"
-                
-                success, result = sync_file_to_immich(file_path, message.photo_filename, description)
-                
-                sync_log = ImmichSyncLog(
-                    filename=message.photo_filename,
-                    file_path=file_path,
-                    status='success' if success else 'error',
-                    immich_asset_id=result if success else None,
-                    error_message=str(result) if not success else None
-                )
-                db.session.add(sync_log)
-                
-                if success:
-                    synced_count += 1
-                else:
-                    error_count += 1
-        
-        # Sync photobooth photos
-        if immich_settings['sync_photobooth']:
-            photobooth_photos = Photo.query.filter_by(is_photobooth=True).all()
-            for photo in photobooth_photos:
-                file_path = os.path.join(current_app.config['PHOTOBOOTH_FOLDER'], photo.filename)
-                description = f"Photobooth photo by {photo.uploader_name}"
-                if photo.description:
-                    description += f" - {photo.description}"
-                
-                success, result = sync_file_to_immich(file_path, photo.filename, description)
-                
-                sync_log = ImmichSyncLog(
-                    filename=photo.filename,
-                    file_path=file_path,
-                    status='success' if success else 'error',
-                    immich_asset_id=result if success else None,
-                    error_message=str(result) if not success else None
-                )
-                db.session.add(sync_log)
-                
-                if success:
-                    synced_count += 1
-                else:
-                    error_count += 1
-        
-        db.session.commit()
-        return True, f"Synced {synced_count} files, {error_count} errors"
-        
+        if not _is_configured(immich_settings):
+            return False, "Immich sync not configured"
+
+        sync_run = ImmichSyncRun(immich_settings, max_workers)
+        stats = sync_run.run().to_dict()
+        schedule_immich_retry()
+        counts = stats['counts']
+        if sync_run.aborted:
+            return False, f"{sync_run.aborted} ({counts['uploaded']} uploaded before stopping)"
+        return True, (f"Synced {counts['uploaded']} files, {counts['duplicates']} already in Immich, "
+                      f"{counts['unchanged']} unchanged, {counts['errors']} errors "
+                      f"({stats['files_per_second']} files/s, {stats['megabytes_per_second']} MB/s)")
+
     except Exception as e:
-        return False, f"Error during sync: {str(e)}" 
\ No newline at end of file
+        db.session.rollback()
+        return False, f"Error during sync: {str(e)}"
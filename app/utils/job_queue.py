@@ -0,0 +1,195 @@
+import json
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+from app import db
+from app.models.jobs import MediaJob
+
+# Registered job handlers keyed by job type
+_job_handlers = {}
+
+# Set whenever a job is enqueued so idle workers in this process wake up immediately
+_job_wakeup = threading.Event()
+
+_worker_threads = []
+_worker_lock = threading.Lock()
+
+JOB_POLL_INTERVAL = 5  # seconds between queue checks when idle
+JOB_RETRY_BASE_DELAY = 15  # seconds, doubled on each failed attempt
+JOB_STALE_TIMEOUT = 15 * 60  # seconds before a 'running' job is considered abandoned
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying the job cannot succeed"""
+
+def job_handler(job_type):
+    """Decorator registering a function as the handler for a job type"""
+    def decorator(func):
+        _job_handlers[job_type] = func
+        return func
+    return decorator
+
+def enqueue_job(job_type, payload=None, user_identifier=None, run_after=None, max_attempts=3, commit=True):
+    """Add a job to the persistent queue"""
+    job = MediaJob(
+        job_type=job_type,
+        payload=json.dumps(payload or {}),
+        status='pending',
+        user_identifier=user_identifier,
+        max_attempts=max_attempts,
+        run_after=run_after or datetime.utcnow()
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+        _job_wakeup.set()
+    return job
+
+def claim_next_job(worker_id):
+    """Atomically move the oldest runnable job to 'running' for this worker"""
+    now = datetime.utcnow()
+    job = MediaJob.query.filter(
+        MediaJob.status == 'pending',
+        MediaJob.run_after <= now
+    ).order_by(MediaJob.run_after, MediaJob.id).first()
+
+    if not job:
+        return None
+
+    # Conditional update so two workers (or processes) can never claim the same job
+    claimed = MediaJob.query.filter_by(id=job.id, status='pending').update({
+        'status': 'running',
+        'worker_id': worker_id,
+        'started_at': now,
+        'attempts': MediaJob.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+
+    if not claimed:
+        return None
+    return db.session.get(MediaJob, job.id)
+
+def run_job(job):
+    """Execute a claimed job and record the outcome"""
+    handler = _job_handlers.get(job.job_type)
+    try:
+        if handler is None:
+            raise PermanentJobError(f"No handler registered for job type '{job.job_type}'")
+
+        payload = json.loads(job.payload) if job.payload else {}
+        handler(job, **payload)
+
+        job.status = 'success'
+        job.error_message = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error running job {job.id} ({job.job_type}): {e}")
+
+        job = db.session.get(MediaJob, job.id)
+        if job is None:
+            return False
+        job.error_message = str(e) or traceback.format_exc(limit=1)
+        if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = 'error'
+            job.finished_at = datetime.utcnow()
+        else:
+            # Exponential backoff before the next attempt
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=JOB_RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+        db.session.commit()
+        return False
+
+def requeue_stale_jobs():
+    """Return jobs left 'running' by a crashed worker to the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_TIMEOUT)
+    count = MediaJob.query.filter(
+        MediaJob.status == 'running',
+        MediaJob.started_at < cutoff
+    ).update({'status': 'pending', 'worker_id': None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def start_job_workers(app, num_workers=2):
+    """Start background worker threads that process the media job queue"""
+    # Importing registers the media and backup handlers
+    import app.utils.media_jobs  # noqa: F401
+    import app.utils.backup_utils  # noqa: F401
+    import app.utils.mail_queue  # noqa: F401
+    import app.utils.notification_utils  # noqa: F401
+
+    def worker_loop(worker_id):
+        with app.app_context():
+            print(f"Job worker {worker_id} started")
+            while True:
+                try:
+                    job = claim_next_job(worker_id)
+                    if job:
+                        run_job(job)
+                        continue
+                except Exception as e:
+                    print(f"Job worker {worker_id} error: {e}")
+                    db.session.rollback()
+                finally:
+                    # Drop the identity map so the next job sees fresh rows
+                    db.session.remove()
+
+                _job_wakeup.wait(JOB_POLL_INTERVAL)
+                _job_wakeup.clear()
+
+    with _worker_lock:
+        if _worker_threads:
+            return _worker_threads
+
+        with app.app_context():
+            try:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    print(f"Requeued {requeued} stale job(s)")
+            except Exception as e:
+                print(f"Error requeueing stale jobs: {e}")
+                db.session.rollback()
+
+        host = f"{socket.gethostname()}:{os.getpid()}"
+        for index in range(num_workers):
+            thread = threading.Thread(target=worker_loop, args=(f"{host}:{index}",), daemon=True)
+            thread.start()
+            _worker_threads.append(thread)
+
+    print(f"Started {num_workers} job worker thread(s)")
+    return _worker_threads
+
+def serialize_job(job):
+    """Convert a job to a JSON-serializable dict for status endpoints"""
+    return {
+        'id': job.id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'attempts': job.attempts,
+        'error_message': job.error_message,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def get_user_jobs(user_identifier, limit=20):
+    """Get the most recent jobs triggered by a user"""
+    return MediaJob.query.filter_by(user_identifier=user_identifier).order_by(
+        MediaJob.created_at.desc()
+    ).limit(limit).all()
+
+def get_job_stats():
+    """Get job counts by status plus the most recent failures"""
+    counts = dict(db.session.query(MediaJob.status, db.func.count(MediaJob.id)).group_by(MediaJob.status).all())
+    recent_failures = MediaJob.query.filter_by(status='error').order_by(
+        MediaJob.finished_at.desc()
+    ).limit(10).all()
+    return {
+        'pending': counts.get('pending', 0),
+        'running': counts.get('running', 0),
+        'success': counts.get('success', 0),
+        'error': counts.get('error', 0),
+        'recent_failures': recent_failures
+    }
@@ -0,0 +1,139 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.jobs import LeaderLease
+
+LEADER_LEASE_NAME = 'background_services'
+LEADER_LEASE_DURATION = 30  # seconds a lease lasts unrenewed; a dead leader is replaced after this
+LEADER_RENEW_INTERVAL = 10  # seconds between renewals by the leader and attempts by the others
+
+_elector = None
+
+def make_owner_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def try_acquire_lease(name, owner, duration=LEADER_LEASE_DURATION):
+    """Renew owner's lease or take it over if it is free; True if owner holds it afterwards"""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=duration)
+
+    # Both are conditional updates, so only one process can win an expired lease
+    renewed = LeaderLease.query.filter(
+        LeaderLease.name == name,
+        LeaderLease.owner == owner
+    ).update({'expires_at': expires_at}, synchronize_session=False)
+    if not renewed:
+        renewed = LeaderLease.query.filter(
+            LeaderLease.name == name,
+            LeaderLease.expires_at < now
+        ).update({'owner': owner, 'expires_at': expires_at, 'acquired_at': now}, synchronize_session=False)
+    if renewed:
+        db.session.commit()
+        return True
+
+    exists = db.session.get(LeaderLease, name) is not None
+    db.session.commit()
+    if exists:
+        return False
+
+    db.session.add(LeaderLease(name=name, owner=owner, expires_at=expires_at, acquired_at=now))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def release_lease(name, owner):
+    """Give up a lease so another process can take it straight away"""
+    LeaderLease.query.filter_by(name=name, owner=owner).update(
+        {'expires_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+class LeaderElector:
+    """Keeps trying to hold a lease and runs callbacks when this process gains or loses it.
+
+    The leader renews every LEADER_RENEW_INTERVAL seconds. If it dies, the lease expires
+    after LEADER_LEASE_DURATION and another process takes over. A leader that cannot
+    renew (e.g. the database is unavailable) steps down at once.
+    """
+
+    def __init__(self, app, name=LEADER_LEASE_NAME, on_elected=None, on_demoted=None):
+        self.app = app
+        self.name = name
+        self.owner = make_owner_id()
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='leader-election', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stopped.is_set():
+                try:
+                    holds_lease = try_acquire_lease(self.name, self.owner)
+                except Exception as e:
+                    print(f"Leader election error: {e}")
+                    db.session.rollback()
+                    holds_lease = False
+                finally:
+                    db.session.remove()
+
+                if holds_lease and not self.is_leader:
+                    print(f"Elected leader for {self.name} ({self.owner})")
+                    self.is_leader = True
+                    self._call(self.on_elected)
+                elif not holds_lease and self.is_leader:
+                    print(f"Lost leadership for {self.name} ({self.owner})")
+                    self.is_leader = False
+                    self._call(self.on_demoted)
+
+                self._stopped.wait(LEADER_RENEW_INTERVAL)
+
+            if self.is_leader:
+                self.is_leader = False
+                self._call(self.on_demoted)
+                try:
+                    release_lease(self.name, self.owner)
+                except Exception as e:
+                    print(f"Error releasing leader lease: {e}")
+                    db.session.rollback()
+
+    def _call(self, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            print(f"Leader election callback error: {e}")
+            db.session.rollback()
+
+def start_leader_election(app, on_elected=None, on_demoted=None):
+    """Join the election for the background services lease (once per process)"""
+    global _elector
+    if _elector is None:
+        _elector = LeaderElector(app, on_elected=on_elected, on_demoted=on_demoted)
+        _elector.start()
+    return _elector
+
+def is_leader():
+    """Whether this process runs the singleton background services.
+
+    True when no election was started, e.g. a single process that never called
+    start_background_services.
+    """
+    return _elector is None or _elector.is_leader
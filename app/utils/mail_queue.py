@@ -0,0 +1,288 @@
+import json
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from app import db
+from app.models.email import EmailLog
+from app.models.jobs import MediaJob
+from app.utils.job_queue import enqueue_job, job_handler
+from app.utils.settings_utils import get_email_settings
+
+# Replies to emailed photos are queued on their EmailLog row and sent by the
+# send_email_responses job over one reused SMTP connection, so a burst of submissions
+# costs a single TLS handshake and login instead of one per reply.
+
+SMTP_TIMEOUT = 30  # seconds
+SMTP_IDLE_CHECK = 60  # seconds unused before a kept connection is checked with NOOP
+EMAIL_DELIVERY_BATCH_SIZE = 50  # replies sent per job run
+EMAIL_DELIVERY_MAX_ATTEMPTS = 5
+EMAIL_DELIVERY_BASE_DELAY = 60  # seconds before retrying a failed reply, doubled each time
+EMAIL_DELIVERY_CLAIM_TIMEOUT = 10 * 60  # seconds before a reply claimed by a crashed job is due again
+
+def build_confirmation_email(photo_count, gallery_url):
+    """Subject and body thanking a guest for emailed photos"""
+    subject = "Thank you for sharing your wedding photos!"
+    body = f"""
+        Hi there!
+
+        Thank you so much for sharing your wedding photos with us! We've successfully added {photo_count} photo(s) to our wedding gallery.
+
+        You can view all the photos here: {gallery_url}
+
+        We're so grateful to have these memories captured from your perspective. Thank you for being part of our special day!
+
+        Best wishes,
+        The Happy Couple
+        """
+    return subject, body
+
+def build_rejection_email(reason):
+    """Subject and body explaining that only photos are accepted"""
+    subject = "Photo upload - only photos accepted"
+    body = f"""
+        Hi there!
+
+        Thank you for trying to share content with our wedding gallery! However, we can only accept photo attachments at this time.
+
+        {reason}
+
+        Please send only photo files (JPG, PNG, GIF, WebP) as attachments to this email address.
+
+        Thank you for understanding!
+
+        Best wishes,
+        The Happy Couple
+        """
+    return subject, body
+
+def is_smtp_configured(email_settings):
+    return bool(email_settings['enabled'] and email_settings['smtp_username'])
+
+class SMTPSender:
+    """One authenticated SMTP connection shared by all outgoing mail and reopened when it drops"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._server = None
+        self._connection_key = None
+        self._last_used = 0
+
+    def _open(self, email_settings):
+        server = smtplib.SMTP(email_settings['smtp_server'], int(email_settings['smtp_port']), timeout=SMTP_TIMEOUT)
+        try:
+            server.starttls()
+            server.login(email_settings['smtp_username'], email_settings['smtp_password'])
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _is_usable(self):
+        if time.monotonic() - self._last_used < SMTP_IDLE_CHECK:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _get_connection(self, email_settings):
+        key = tuple(email_settings[name] for name in ('smtp_server', 'smtp_port', 'smtp_username', 'smtp_password'))
+        if self._server is not None and (key != self._connection_key or not self._is_usable()):
+            self._close()
+        if self._server is None:
+            self._server = self._open(email_settings)
+            self._connection_key = key
+            reused = False
+        else:
+            reused = True
+        return self._server, reused
+
+    def send(self, email_settings, recipient, subject, body):
+        """Send one plain-text email; raises on failure"""
+        msg = MIMEMultipart()
+        msg['From'] = email_settings['smtp_username']
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        with self._lock:
+            server, reused = self._get_connection(email_settings)
+            try:
+                server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._close()
+                if not reused:
+                    raise
+                # The server dropped a kept connection; one fresh attempt
+                try:
+                    server, _ = self._get_connection(email_settings)
+                    server.send_message(msg)
+                except Exception:
+                    self._close()
+                    raise
+            except smtplib.SMTPRecipientsRefused:
+                # The connection is still fine; only this recipient failed
+                self._last_used = time.monotonic()
+                raise
+            except Exception:
+                self._close()
+                raise
+            self._last_used = time.monotonic()
+
+    def _close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+        self._server = None
+        self._connection_key = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+_smtp_sender = SMTPSender()
+
+def send_email(recipient, subject, body):
+    """Send an email right away over the shared SMTP connection; False if sending is not configured"""
+    email_settings = get_email_settings()
+    if not is_smtp_configured(email_settings):
+        return False
+    _smtp_sender.send(email_settings, recipient, subject, body)
+    return True
+
+def queue_email_response(email_log, response_type, **details):
+    """Mark an EmailLog entry's reply for delivery by the send_email_responses job.
+
+    The caller commits and then calls schedule_email_delivery(). Returns False (and
+    queues nothing) if sending email is not configured.
+    """
+    email_log.response_type = response_type
+    email_log.response_sent = False
+    if not is_smtp_configured(get_email_settings()):
+        return False
+    email_log.response_details = json.dumps(details)
+    email_log.delivery_status = 'pending'
+    email_log.delivery_attempts = 0
+    email_log.next_delivery_at = datetime.utcnow()
+    return True
+
+def schedule_email_delivery():
+    """Queue a send_email_responses job for when the next pending reply is due; returns it or None"""
+    next_due = db.session.query(db.func.min(EmailLog.next_delivery_at)).filter(
+        EmailLog.delivery_status.in_(('pending', 'sending'))
+    ).scalar()
+    if next_due is None:
+        return None
+
+    pending = MediaJob.query.filter_by(job_type='send_email_responses', status='pending').first()
+    if pending:
+        if pending.run_after > next_due:
+            pending.run_after = next_due
+            db.session.commit()
+        return pending
+    return enqueue_job('send_email_responses', run_after=next_due, max_attempts=1)
+
+def _build_response(email_log):
+    details = json.loads(email_log.response_details or '{}')
+    if email_log.response_type == 'confirmation':
+        return build_confirmation_email(details.get('photo_count', email_log.photo_count), details.get('gallery_url', ''))
+    return build_rejection_email(details.get('reason', ''))
+
+def _is_permanent_failure(error):
+    """Whether retrying cannot help: the server rejected the message itself, not the connection or login"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+def _claim_due_responses(now):
+    """Move due replies to 'sending' so overlapping jobs never send the same one twice.
+
+    A claim expires after EMAIL_DELIVERY_CLAIM_TIMEOUT, so replies held by a job that
+    died mid-send become due again.
+    """
+    due = EmailLog.query.filter(
+        EmailLog.delivery_status.in_(('pending', 'sending')),
+        EmailLog.next_delivery_at <= now
+    ).order_by(EmailLog.next_delivery_at, EmailLog.id).limit(EMAIL_DELIVERY_BATCH_SIZE).all()
+
+    claimed = []
+    claim_expires = now + timedelta(seconds=EMAIL_DELIVERY_CLAIM_TIMEOUT)
+    for email_log in due:
+        # Conditional update: only one job can move a due row to a future claim expiry
+        if EmailLog.query.filter(
+            EmailLog.id == email_log.id,
+            EmailLog.delivery_status.in_(('pending', 'sending')),
+            EmailLog.next_delivery_at <= now
+        ).update({'delivery_status': 'sending', 'next_delivery_at': claim_expires}, synchronize_session=False):
+            claimed.append(email_log.id)
+    db.session.commit()
+    if not claimed:
+        return []
+    rows = {email_log.id: email_log for email_log in EmailLog.query.filter(EmailLog.id.in_(claimed))}
+    return [rows[email_log_id] for email_log_id in claimed if email_log_id in rows]
+
+def deliver_pending_responses():
+    """Send replies that are due over one SMTP connection; returns (sent, failed)"""
+    due = _claim_due_responses(datetime.utcnow())
+    if not due:
+        return 0, 0
+
+    email_settings = get_email_settings()
+    if not is_smtp_configured(email_settings):
+        for email_log in due:
+            email_log.delivery_status = 'failed'
+            email_log.delivery_error = 'Email sending is not configured'
+            email_log.next_delivery_at = None
+        db.session.commit()
+        return 0, len(due)
+
+    sent = failed = 0
+    for position, email_log in enumerate(due):
+        subject, body = _build_response(email_log)
+        email_log.delivery_attempts = (email_log.delivery_attempts or 0) + 1
+        try:
+            _smtp_sender.send(email_settings, email_log.sender_email, subject, body)
+        except Exception as e:
+            print(f"Error sending {email_log.response_type} email to {email_log.sender_email}: {e}")
+            email_log.delivery_error = str(e)
+            if _is_permanent_failure(e) or email_log.delivery_attempts >= EMAIL_DELIVERY_MAX_ATTEMPTS:
+                email_log.delivery_status = 'failed'
+                email_log.next_delivery_at = None
+                failed += 1
+                db.session.commit()
+                continue
+
+            # The server or connection is failing; hold the rest of the batch back as well
+            retry_at = datetime.utcnow() + timedelta(seconds=EMAIL_DELIVERY_BASE_DELAY * 2 ** (email_log.delivery_attempts - 1))
+            for waiting in due[position:]:
+                waiting.delivery_status = 'pending'
+                waiting.next_delivery_at = retry_at
+            db.session.commit()
+            break
+        else:
+            email_log.delivery_status = 'sent'
+            email_log.response_sent = True
+            email_log.delivered_at = datetime.utcnow()
+            email_log.delivery_error = None
+            email_log.next_delivery_at = None
+            sent += 1
+            db.session.commit()
+
+    return sent, failed
+
+@job_handler('send_email_responses')
+def send_email_responses_job(job):
+    """Send queued confirmation and rejection emails, then schedule the next batch or retry"""
+    sent, failed = deliver_pending_responses()
+    if sent or failed:
+        print(f"Email responses: {sent} sent, {failed} failed")
+    schedule_email_delivery()
@@ -0,0 +1,167 @@
+import os
+from flask import current_app
+from app import db
+from app.models.photo import Photo
+from app.models.email import ImmichSyncLog
+from app.utils.job_queue import job_handler, enqueue_job, PermanentJobError
+from app.utils.file_utils import get_video_duration, create_video_thumbnail
+from app.utils.image_utils import apply_image_derivatives, get_photo_source_path
+from app.utils.settings_utils import get_immich_settings
+from app.utils.tag_utils import clear_photo_tags
+from app.utils.slideshow_utils import set_activity_active, refresh_photo_activity, get_rendition_path
+
+def enqueue_photo_processing(photo, user_identifier=None):
+    """Queue the post-upload work for a newly committed gallery photo or video"""
+    if photo.media_type == 'video':
+        # Immich sync for videos is queued once the duration check has passed
+        enqueue_job('process_video', {'photo_id': photo.id}, user_identifier=user_identifier)
+    else:
+        enqueue_job('image_derivatives', {'photo_id': photo.id}, user_identifier=user_identifier)
+        enqueue_photo_immich_sync(photo, user_identifier)
+
+def enqueue_photo_immich_sync(photo, user_identifier=None):
+    """Queue an Immich upload for a gallery photo if the relevant sync option is enabled"""
+    immich_settings = get_immich_settings()
+    if not immich_settings['enabled']:
+        return None
+
+    if photo.media_type == 'video':
+        if not immich_settings['sync_videos']:
+            return None
+        description = f"Wedding video by {photo.uploader_name}"
+    elif photo.is_photobooth:
+        if not immich_settings['sync_photobooth']:
+            return None
+        description = f"Photobooth photo by {photo.uploader_name}"
+    else:
+        if not immich_settings['sync_photos']:
+            return None
+        description = f"Wedding photo by {photo.uploader_name}"
+
+    if photo.description:
+        description += f" - {photo.description}"
+
+    return enqueue_job('immich_sync', {
+        'file_path': get_photo_source_path(photo),
+        'filename': photo.filename,
+        'description': description
+    }, user_identifier=user_identifier)
+
+def enqueue_immich_sync(file_path, filename, description, sync_option, user_identifier=None):
+    """Queue an Immich upload for a guestbook or message photo if its sync option is enabled"""
+    immich_settings = get_immich_settings()
+    if not immich_settings['enabled'] or not immich_settings.get(sync_option):
+        return None
+
+    return enqueue_job('immich_sync', {
+        'file_path': file_path,
+        'filename': filename,
+        'description': description
+    }, user_identifier=user_identifier)
+
+@job_handler('process_video')
+def process_video_job(job, photo_id):
+    """Probe duration, enforce the length limit and create a thumbnail for a video"""
+    photo = db.session.get(Photo, photo_id)
+    if photo is None:
+        raise PermanentJobError(f"Photo {photo_id} no longer exists")
+
+    filepath = os.path.join(current_app.config['VIDEO_FOLDER'], photo.filename)
+    max_duration = current_app.config['MAX_VIDEO_DURATION']
+
+    duration = get_video_duration(filepath)
+    if duration and duration > max_duration:
+        # Reject the upload the same way the synchronous path used to
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        clear_photo_tags(photo)
+        set_activity_active('photo', photo.id, False)
+        db.session.delete(photo)
+        db.session.commit()
+        raise PermanentJobError(f"Video must be {max_duration} seconds or less")
+
+    thumbnail_filename = f"thumb_{os.path.splitext(photo.filename)[0]}.jpg"
+    thumbnail_path = os.path.join(current_app.config['THUMBNAIL_FOLDER'], thumbnail_filename)
+    if not create_video_thumbnail(filepath, thumbnail_path):
+        thumbnail_filename = None
+
+    photo.duration = duration
+    photo.thumbnail_filename = thumbnail_filename
+    # The video passed its checks; show it in the gallery and slideshow
+    photo.is_pending = False
+    set_activity_active('photo', photo.id, True)
+    db.session.commit()
+
+    enqueue_photo_immich_sync(photo, job.user_identifier)
+
+@job_handler('image_derivatives')
+def image_derivatives_job(job, photo_id):
+    """Generate responsive image sizes for a photo"""
+    photo = db.session.get(Photo, photo_id)
+    if photo is None:
+        raise PermanentJobError(f"Photo {photo_id} no longer exists")
+
+    # Let generation errors fail the job so they are retried and show up in /api/jobs
+    if apply_image_derivatives(photo, raise_errors=True):
+        refresh_photo_activity(photo)
+    db.session.commit()
+
+    # Have the full-screen slideshow rendition ready before the slide comes up
+    get_rendition_path('photobooth' if photo.is_photobooth else 'photo', 'screen', photo.filename)
+
+@job_handler('immich_sync')
+def immich_sync_job(job, file_path, filename, description=''):
+    """Upload a file to Immich and record the result in the sync log"""
+    from app.utils.immich_utils import (sync_file_to_immich, schedule_album_flush,
+                                        record_sync_failure, schedule_immich_retry)
+
+    success, result = sync_file_to_immich(file_path, filename, description)
+
+    if not success:
+        # Retried with backoff by the immich_retry job rather than the job queue
+        record_sync_failure(file_path, filename, description, str(result))
+        db.session.commit()
+        schedule_immich_retry()
+        return
+
+    db.session.add(ImmichSyncLog(
+        filename=filename,
+        file_path=file_path,
+        status='success',
+        immich_asset_id=result
+    ))
+    db.session.commit()
+
+    # Album assignment is batched with other uploads from the next few seconds
+    schedule_album_flush()
+
+@job_handler('immich_retry')
+def immich_retry_job(job):
+    """Retry failed Immich uploads whose backoff has elapsed, then schedule the next round"""
+    from app.utils.immich_utils import retry_failed_syncs, schedule_immich_retry
+
+    succeeded = retry_failed_syncs()
+    if succeeded:
+        print(f"Immich retry: {succeeded} upload(s) succeeded")
+    schedule_immich_retry()
+
+@job_handler('immich_album_flush')
+def immich_album_flush_job(job):
+    """Add recently uploaded assets to the Immich album in as few requests as possible"""
+    from app.utils.immich_utils import flush_album_additions
+
+    added = flush_album_additions()
+    if added:
+        print(f"Added {added} asset(s) to the Immich album")
+
+@job_handler('immich_bulk_sync')
+def immich_bulk_sync_job(job):
+    """Sync every eligible file to Immich; a rerun after a crash resumes from the last checkpoint"""
+    from app.utils.immich_utils import sync_all_to_immich
+
+    success, message = sync_all_to_immich()
+    print(f"Immich bulk sync: {message}")
+    if not success:
+        raise PermanentJobError(message)
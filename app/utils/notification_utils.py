@@ -1,8 +1,20 @@
 from datetime import datetime
 import json
+import time
 import requests
 from app import db
-from app.models.notifications import Notification, NotificationUser
+from app.models.notifications import Notification, NotificationUser, NotificationBroadcast
+from app.utils.event_hub import EventHub, SSE_HEARTBEAT_INTERVAL, SSE_MAX_QUEUED_EVENTS, SSE_RETRY_DELAY, format_sse
+from app.utils.job_queue import enqueue_job, job_handler, PermanentJobError
+from app.utils.settings_utils import format_datetimes_in_timezone
+
+NOTIFICATION_STREAM_MAX_AGE = 10 * 60  # seconds before a stream ends and the browser reconnects with Last-Event-ID
+NOTIFICATION_STREAM_RESYNC_INTERVAL = 60  # seconds between database checks for notifications created in other processes
+BROADCAST_PUSH_BATCH_SIZE = 200  # push subscriptions sent between progress commits
+BROADCAST_PUBLISH_BATCH_SIZE = 500  # streamed users looked up per query, under sqlite's bound-parameter limit
+
+# Open notification streams in this process, keyed by user identifier
+notification_hub = EventHub()
 
 def trigger_push_notification(user_identifier, title, message, notification_type='admin'):
     """Trigger a push notification for a user"""
@@ -78,6 +90,9 @@ def create_notification_with_push(user_identifier, title, message, notification_
         db.session.add(notification)
         db.session.commit()
         
+        # Deliver to the user's open pages right away
+        publish_notification(notification)
+        
         # Trigger push notification (without creating another database notification)
         trigger_push_notification(user_identifier, title, message, notification_type)
         
@@ -86,4 +101,190 @@ def create_notification_with_push(user_identifier, title, message, notification_
     except Exception as e:
         print(f"Error creating notification: {e}")
         db.session.rollback()
-        return False 
\ No newline at end of file
+        return False
+
+def serialize_notifications(notifications):
+    """Convert notifications to JSON-serializable dicts for the API and the event stream"""
+    created_at_display = format_datetimes_in_timezone([n.created_at for n in notifications])
+    return [{
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'created_at': created_at,
+        'content_type': notification.content_type,
+        'content_id': notification.content_id
+    } for notification, created_at in zip(notifications, created_at_display)]
+
+def get_unread_notifications(user_identifier, limit=10):
+    """Most recent unread notifications for a user"""
+    return Notification.query.filter_by(
+        user_identifier=user_identifier,
+        is_read=False
+    ).order_by(Notification.created_at.desc()).limit(limit).all()
+
+def publish_notification(notification):
+    """Push a committed notification to the recipient's open streams in this process"""
+    if not notification_hub.has_subscribers(notification.user_identifier):
+        return
+    try:
+        notification_hub.publish(notification.user_identifier, 'notification',
+                                 serialize_notifications([notification])[0], event_id=notification.id)
+    except Exception as e:
+        print(f"Error publishing notification: {e}")
+
+def send_broadcast_notification(title, message, notification_type='admin'):
+    """Send a notification to every user with notifications enabled; returns the broadcast.
+
+    A single INSERT ... SELECT from notification_user gives each user their own copy,
+    which carries their read state, without loading any users into the session. Push
+    is delivered afterwards in batches by a send_broadcast_push job.
+    """
+    broadcast = NotificationBroadcast(
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        created_at=datetime.utcnow()
+    )
+    db.session.add(broadcast)
+    db.session.flush()
+
+    recipients = db.select(
+        NotificationUser.user_identifier,
+        db.literal(title),
+        db.literal(message),
+        db.literal(notification_type),
+        db.literal(broadcast.created_at),
+        db.literal(False),
+        db.literal(broadcast.id)
+    ).where(NotificationUser.notifications_enabled == True)
+    result = db.session.execute(db.insert(Notification).from_select(
+        ['user_identifier', 'title', 'message', 'notification_type', 'created_at', 'is_read', 'broadcast_id'],
+        recipients
+    ))
+    broadcast.recipient_count = result.rowcount
+
+    # Commits the broadcast, its copies and the push job together
+    enqueue_job('send_broadcast_push', {'broadcast_id': broadcast.id}, max_attempts=5)
+
+    publish_broadcast(broadcast)
+    return broadcast
+
+def publish_broadcast(broadcast):
+    """Push a committed broadcast to the open streams in this process"""
+    channels = notification_hub.channels()
+    try:
+        for start in range(0, len(channels), BROADCAST_PUBLISH_BATCH_SIZE):
+            notifications = Notification.query.filter(
+                Notification.broadcast_id == broadcast.id,
+                Notification.user_identifier.in_(channels[start:start + BROADCAST_PUBLISH_BATCH_SIZE])
+            ).all()
+            for notification, data in zip(notifications, serialize_notifications(notifications)):
+                notification_hub.publish(notification.user_identifier, 'notification', data, event_id=notification.id)
+    except Exception as e:
+        print(f"Error publishing broadcast notification: {e}")
+
+@job_handler('send_broadcast_push')
+def send_broadcast_push_job(job, broadcast_id):
+    """Send a broadcast's push notifications, saving progress after each batch so a retry resumes"""
+    broadcast = db.session.get(NotificationBroadcast, broadcast_id)
+    if broadcast is None:
+        raise PermanentJobError(f"Notification broadcast {broadcast_id} not found")
+    if broadcast.push_status == 'done':
+        return
+
+    broadcast.push_status = 'sending'
+    db.session.commit()
+
+    while True:
+        # Only users who received the broadcast, so later sign-ups are not pushed to
+        users = db.session.query(NotificationUser.id, NotificationUser.push_subscription).filter(
+            NotificationUser.id > (broadcast.push_cursor or 0),
+            NotificationUser.push_enabled == True,
+            NotificationUser.push_permission_granted == True,
+            NotificationUser.push_subscription.isnot(None),
+            db.exists().where(db.and_(
+                Notification.broadcast_id == broadcast.id,
+                Notification.user_identifier == NotificationUser.user_identifier
+            ))
+        ).order_by(NotificationUser.id).limit(BROADCAST_PUSH_BATCH_SIZE).all()
+        if not users:
+            break
+
+        sent = 0
+        for user_id, subscription in users:
+            if send_push_notification(subscription, broadcast.title, broadcast.message, broadcast.notification_type):
+                sent += 1
+        broadcast.push_sent = (broadcast.push_sent or 0) + sent
+        broadcast.push_failed = (broadcast.push_failed or 0) + len(users) - sent
+        broadcast.push_cursor = users[-1].id
+        db.session.commit()
+
+    broadcast.push_status = 'done'
+    broadcast.push_finished_at = datetime.utcnow()
+    db.session.commit()
+    print(f"Broadcast {broadcast.id} push: {broadcast.push_sent} sent, {broadcast.push_failed} failed")
+
+def publish_notifications_read(user_identifier, notification_ids=None):
+    """Tell a user's open streams which notifications were read; all of them when no ids are given"""
+    data = {'ids': notification_ids} if notification_ids is not None else {'all': True}
+    notification_hub.publish(user_identifier, 'read', data)
+
+def _unread_notifications_after(user_identifier, last_id):
+    return Notification.query.filter(
+        Notification.user_identifier == user_identifier,
+        Notification.is_read == False,
+        Notification.id > last_id
+    ).order_by(Notification.id).limit(SSE_MAX_QUEUED_EVENTS).all()
+
+def notification_event_stream(user_identifier, last_event_id=None):
+    """Generate a user's notifications as Server-Sent Events.
+
+    A fresh connection starts with a 'sync' event holding the unread notifications; a
+    reconnect with Last-Event-ID receives only the ones it missed. New notifications
+    then arrive as 'notification' events from the hub, with a database check every
+    NOTIFICATION_STREAM_RESYNC_INTERVAL seconds for ones created in other processes.
+    """
+    # Subscribe before reading so nothing created in between is missed
+    subscription = notification_hub.subscribe(user_identifier)
+    try:
+        yield f"retry: {SSE_RETRY_DELAY}\n\n"
+
+        if last_event_id is None:
+            notifications = serialize_notifications(get_unread_notifications(user_identifier))
+            last_id = db.session.query(db.func.max(Notification.id)).filter(
+                Notification.user_identifier == user_identifier
+            ).scalar() or 0
+            yield format_sse('sync', {'notifications': notifications, 'count': len(notifications)}, event_id=last_id)
+        else:
+            last_id = last_event_id
+            for notification in serialize_notifications(_unread_notifications_after(user_identifier, last_id)):
+                last_id = notification['id']
+                yield format_sse('notification', notification, event_id=last_id)
+        # Do not hold a database connection while the stream waits
+        db.session.remove()
+
+        started = last_resync = time.monotonic()
+        while time.monotonic() - started < NOTIFICATION_STREAM_MAX_AGE:
+            event = subscription.get(timeout=SSE_HEARTBEAT_INTERVAL)
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                name, data, event_id = event
+                if event_id is None or event_id > last_id:
+                    if event_id is not None:
+                        last_id = event_id
+                    yield format_sse(name, data, event_id)
+
+            if subscription.overflowed or time.monotonic() - last_resync >= NOTIFICATION_STREAM_RESYNC_INTERVAL:
+                subscription.overflowed = False
+                last_resync = time.monotonic()
+                try:
+                    missed = serialize_notifications(_unread_notifications_after(user_identifier, last_id))
+                finally:
+                    db.session.remove()
+                for notification in missed:
+                    last_id = notification['id']
+                    yield format_sse('notification', notification, event_id=last_id)
+    finally:
+        subscription.close()
@@ -0,0 +1,64 @@
+from datetime import datetime
+from app import db
+
+def encode_cursor(sort_value, item_id):
+    """Encode the sort key of the last item on a page as an `after` cursor"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    return f"{'' if sort_value is None else sort_value},{item_id}"
+
+def decode_cursor(cursor, sort_column=None):
+    """Decode an `after` cursor into (sort value, id); returns None if it is malformed.
+
+    The sort value is parsed according to the sort column's type (timestamps by default).
+    """
+    if not cursor:
+        return None
+    try:
+        sort_value, item_id = cursor.rsplit(',', 1)
+        python_type = sort_column.type.python_type if sort_column is not None else datetime
+        if python_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        elif python_type is int:
+            sort_value = int(sort_value)
+        return sort_value, int(item_id)
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+def keyset_paginate(query, sort_column, id_column, after=None, limit=20, include_total=False, descending=True):
+    """Paginate a query by (sort_column, id_column) without OFFSET, newest first by default.
+
+    The tie-breaking id keeps the order stable when several rows share a sort value.
+    A nullable sort column must be wrapped in func.coalesce(), since a NULL cannot be
+    carried in a cursor or compared against one.
+    One extra row is fetched to tell whether another page exists, and the total is
+    only counted when include_total is set since COUNT(*) scans the whole filter.
+    """
+    total = query.order_by(None).count() if include_total else None
+
+    position = decode_cursor(after, sort_column)
+    if position:
+        key = db.tuple_(sort_column, id_column)
+        query = query.filter(key < position if descending else key > position)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # The sort value is selected alongside each row so expressions can be sorted on too
+    rows = query.add_columns(sort_column).limit(limit + 1).all()
+    has_next = len(rows) > limit
+    items = [row[0] for row in rows[:limit]]
+
+    next_cursor = None
+    if has_next and items:
+        last, sort_value = rows[limit - 1]
+        next_cursor = encode_cursor(sort_value, getattr(last, id_column.key))
+
+    return {
+        'items': items,
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+        'total': total
+    }
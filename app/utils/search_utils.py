@@ -0,0 +1,288 @@
+import re
+from datetime import datetime
+from markupsafe import escape
+from sqlalchemy import text, select, table, literal_column, false
+from app import db
+
+# FTS5 table covering photos, guestbook entries and messages.
+# Each source row maps to rowid = id * SEARCH_TYPE_STRIDE + type code so triggers
+# can update and delete index rows by rowid instead of scanning the index.
+SEARCH_TABLE = 'search_index'
+SEARCH_TYPE_STRIDE = 4
+SEARCH_TYPES = {
+    'photo': 1,
+    'guestbook': 2,
+    'message': 3
+}
+
+# Placeholder highlight markers; snippets are HTML-escaped before these become <mark> tags
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+# Cached result of the "is the FTS index usable" check
+_fts_ready = None
+
+# Per-source SELECT used for both the initial build and the triggers.
+# {row} is 'new' inside triggers and the table name during a rebuild.
+_SEARCH_SOURCES = {
+    'photo': {
+        'table': 'photo',
+        'author': "{row}.uploader_name",
+        'body': "{row}.description",
+        'tags': "{row}.tags",
+        'watch': 'uploader_name, description, tags'
+    },
+    'guestbook': {
+        'table': 'guestbook_entry',
+        'author': "{row}.name",
+        'body': "COALESCE({row}.message, '') || ' ' || COALESCE({row}.location, '')",
+        'tags': "NULL",
+        'watch': 'name, message, location'
+    },
+    'message': {
+        'table': 'message',
+        'author': "{row}.author_name",
+        'body': "{row}.content",
+        'tags': "NULL",
+        'watch': 'author_name, content'
+    }
+}
+
+def _is_sqlite():
+    return db.engine.dialect.name == 'sqlite'
+
+def _values_sql(content_type, row):
+    source = _SEARCH_SOURCES[content_type]
+    rowid = f"{row}.id * {SEARCH_TYPE_STRIDE} + {SEARCH_TYPES[content_type]}"
+    columns = ', '.join(source[column].format(row=row) for column in ('author', 'body', 'tags'))
+    return rowid, columns
+
+def _trigger_statements(content_type):
+    """Build the insert/update/delete triggers that keep the index in sync with a table"""
+    source = _SEARCH_SOURCES[content_type]
+    table_name = source['table']
+    new_rowid, new_columns = _values_sql(content_type, 'new')
+    old_rowid = f"old.id * {SEARCH_TYPE_STRIDE} + {SEARCH_TYPES[content_type]}"
+    insert_sql = f"INSERT INTO {SEARCH_TABLE}(rowid, author, body, tags) VALUES ({new_rowid}, {new_columns});"
+    delete_sql = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {old_rowid};"
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table_name}_search_ai AFTER INSERT ON {table_name} BEGIN {insert_sql} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table_name}_search_ad AFTER DELETE ON {table_name} BEGIN {delete_sql} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table_name}_search_au AFTER UPDATE OF {source['watch']} ON {table_name} "
+        f"BEGIN {delete_sql} {insert_sql} END",
+    ]
+
+def init_search_index():
+    """Create the FTS5 index and its sync triggers; builds the index on first run.
+
+    Returns False when the database is not SQLite or SQLite lacks FTS5, in which
+    case searches fall back to LIKE matching.
+    """
+    global _fts_ready
+
+    if not _is_sqlite():
+        _fts_ready = False
+        return False
+
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {'name': SEARCH_TABLE}).first() is not None
+
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                "author, body, tags, tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+            for content_type in SEARCH_TYPES:
+                for statement in _trigger_statements(content_type):
+                    conn.execute(text(statement))
+
+            if not exists:
+                _rebuild(conn)
+    except Exception as e:
+        print(f"Full-text search unavailable, using LIKE search instead: {e}")
+        _fts_ready = False
+        return False
+
+    _fts_ready = True
+    return True
+
+def _rebuild(conn):
+    conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    for content_type, source in _SEARCH_SOURCES.items():
+        rowid, columns = _values_sql(content_type, source['table'])
+        conn.execute(text(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, author, body, tags) "
+            f"SELECT {rowid}, {columns} FROM {source['table']}"
+        ))
+
+def rebuild_search_index():
+    """Repopulate the full-text index from the source tables"""
+    if not is_fts_enabled():
+        return False
+    with db.engine.begin() as conn:
+        _rebuild(conn)
+    return True
+
+def is_fts_enabled():
+    """Check whether the FTS5 index exists and can be queried"""
+    global _fts_ready
+
+    if _fts_ready is None:
+        try:
+            _fts_ready = _is_sqlite() and db.session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {'name': SEARCH_TABLE}).first() is not None
+        except Exception:
+            _fts_ready = False
+    return _fts_ready
+
+def build_fts_query(search_query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted so characters like '-', ':' or '*' in user input cannot
+    be interpreted as FTS5 operators.
+    """
+    terms = re.findall(r'\w+', search_query or '', re.UNICODE)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def _matching_ids_subquery(content_type, fts_query):
+    """SELECT of source ids of one content type matching an FTS5 query"""
+    return select(
+        literal_column(f"rowid / {SEARCH_TYPE_STRIDE}")
+    ).select_from(table(SEARCH_TABLE)).where(
+        text(f"{SEARCH_TABLE} MATCH :fts_query").bindparams(fts_query=fts_query),
+        text(f"rowid % {SEARCH_TYPE_STRIDE} = {SEARCH_TYPES[content_type]}")
+    )
+
+def apply_photo_search(photos_query, search_query):
+    """Filter a Photo query to rows matching a free-text search"""
+    from app.models.photo import Photo
+
+    if not search_query:
+        return photos_query
+
+    if is_fts_enabled():
+        fts_query = build_fts_query(search_query)
+        if not fts_query:
+            return photos_query.filter(false())
+        return photos_query.filter(Photo.id.in_(_matching_ids_subquery('photo', fts_query)))
+
+    # Fallback for databases without FTS5
+    search_term = f'%{search_query}%'
+    return photos_query.filter(
+        db.or_(
+            Photo.uploader_name.ilike(search_term),
+            Photo.description.ilike(search_term),
+            Photo.tags.ilike(search_term)
+        )
+    )
+
+def search_all(search_query, content_types=None, limit=20):
+    """Search photos, guestbook entries and messages, best matches first.
+
+    Returns a list of dicts with type, id, author, snippet and url.
+    """
+    content_types = [t for t in (content_types or SEARCH_TYPES) if t in SEARCH_TYPES]
+    if not search_query or not content_types:
+        return []
+
+    if is_fts_enabled():
+        return _search_all_fts(search_query, content_types, limit)
+    return _search_all_like(search_query, content_types, limit)
+
+def _search_all_fts(search_query, content_types, limit):
+    fts_query = build_fts_query(search_query)
+    if not fts_query:
+        return []
+
+    type_codes = ', '.join(str(SEARCH_TYPES[t]) for t in content_types)
+    # Hidden messages and pending photos stay in the index but are excluded here
+    rows = db.session.execute(text(f"""
+        SELECT s.rowid AS rowid, s.author AS author,
+               snippet({SEARCH_TABLE}, 1, :mark_start, :mark_end, '…', 12) AS snippet,
+               bm25({SEARCH_TABLE}, 5.0, 1.0, 3.0) AS rank
+        FROM {SEARCH_TABLE} AS s
+        LEFT JOIN message AS m
+               ON s.rowid % {SEARCH_TYPE_STRIDE} = {SEARCH_TYPES['message']}
+              AND m.id = s.rowid / {SEARCH_TYPE_STRIDE}
+        LEFT JOIN photo AS p
+               ON s.rowid % {SEARCH_TYPE_STRIDE} = {SEARCH_TYPES['photo']}
+              AND p.id = s.rowid / {SEARCH_TYPE_STRIDE}
+        WHERE {SEARCH_TABLE} MATCH :fts_query
+          AND s.rowid % {SEARCH_TYPE_STRIDE} IN ({type_codes})
+          AND (m.id IS NULL OR m.is_hidden = 0)
+          AND (p.id IS NULL OR p.is_pending = 0)
+        ORDER BY rank
+        LIMIT :limit
+    """), {
+        'fts_query': fts_query,
+        'limit': limit,
+        'mark_start': _MARK_START,
+        'mark_end': _MARK_END
+    }).fetchall()
+
+    type_names = {code: name for name, code in SEARCH_TYPES.items()}
+    results = []
+    for row in rows:
+        content_type = type_names[row.rowid % SEARCH_TYPE_STRIDE]
+        content_id = row.rowid // SEARCH_TYPE_STRIDE
+        results.append({
+            'type': content_type,
+            'id': content_id,
+            'author': row.author,
+            'snippet': _highlight(row.snippet),
+            'url': _result_url(content_type, content_id)
+        })
+    return results
+
+def _search_all_like(search_query, content_types, limit):
+    from app.models.photo import Photo
+    from app.models.guestbook import GuestbookEntry
+    from app.models.messages import Message
+
+    search_term = f'%{search_query}%'
+    results = []
+
+    if 'photo' in content_types:
+        photos = apply_photo_search(Photo.query.filter(Photo.is_pending == False), search_query).order_by(Photo.upload_date.desc()).limit(limit).all()
+        results.extend(('photo', p.id, p.uploader_name, p.description or p.tags or '', p.upload_date) for p in photos)
+
+    if 'guestbook' in content_types:
+        entries = GuestbookEntry.query.filter(db.or_(
+            GuestbookEntry.name.ilike(search_term),
+            GuestbookEntry.message.ilike(search_term),
+            GuestbookEntry.location.ilike(search_term)
+        )).order_by(GuestbookEntry.created_at.desc()).limit(limit).all()
+        results.extend(('guestbook', e.id, e.name, e.message, e.created_at) for e in entries)
+
+    if 'message' in content_types:
+        messages = Message.query.filter(
+            Message.is_hidden == False,
+            db.or_(Message.author_name.ilike(search_term), Message.content.ilike(search_term))
+        ).order_by(Message.created_at.desc()).limit(limit).all()
+        results.extend(('message', m.id, m.author_name, m.content, m.created_at) for m in messages)
+
+    # Without a relevance score, newest first is the most useful order
+    results.sort(key=lambda r: r[4] or datetime.min, reverse=True)
+    return [{
+        'type': content_type,
+        'id': content_id,
+        'author': author,
+        'snippet': str(escape((body or '')[:120])),
+        'url': _result_url(content_type, content_id)
+    } for content_type, content_id, author, body, _ in results[:limit]]
+
+def _highlight(snippet):
+    """HTML-escape an FTS snippet and turn its match markers into <mark> tags"""
+    escaped = str(escape(snippet or ''))
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+def _result_url(content_type, content_id):
+    if content_type == 'photo':
+        return f'/photo/{content_id}'
+    if content_type == 'guestbook':
+        return f'/guestbook/#entry-{content_id}'
+    return f'/messages/#message-{content_id}'
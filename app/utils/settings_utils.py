@@ -1,6 +1,6 @@
 from app.models.settings import Settings
 import json
-from datetime import datetime
+from datetime import datetime, date
 
 def verify_admin_access(admin_key=None, user_email=None, user_domain=None):
     """Verify admin access using either admin key or SSO credentials"""
@@ -59,6 +59,8 @@ def get_immich_settings():
 
 def get_sso_settings():
     """Get SSO settings from database"""
+    allowed_domains = Settings.get('sso_allowed_domains', '')
+    allowed_emails = Settings.get('sso_allowed_emails', '')
     return {
         'enabled': Settings.get('sso_enabled', 'false').lower() == 'true',
         'provider': Settings.get('sso_provider', 'google'),
@@ -69,40 +71,78 @@ def get_sso_settings():
         'userinfo_url': Settings.get('sso_userinfo_url', ''),
         'redirect_uri': Settings.get('sso_redirect_uri', ''),
         'scope': Settings.get('sso_scope', 'openid email profile'),
-        'allowed_domains': Settings.get('sso_allowed_domains', '').split(',') if Settings.get('sso_allowed_domains') else [],
-        'allowed_emails': Settings.get('sso_allowed_emails', '').split(',') if Settings.get('sso_allowed_emails') else [],
+        'allowed_domains': allowed_domains.split(',') if allowed_domains else [],
+        'allowed_emails': allowed_emails.split(',') if allowed_emails else [],
         'admin_key_fallback': Settings.get('sso_admin_key_fallback', 'true').lower() == 'true'
     }
 
+# (raw timezone_settings value, resolved tzinfo); swapped as one tuple so readers never see a mismatched pair
+_timezone_cache = (None, None)
+
 def get_timezone_settings():
     """Get timezone settings from database"""
     timezone_settings = Settings.get('timezone_settings', '{}')
     return json.loads(timezone_settings) if timezone_settings else {}
 
+def get_selected_timezone():
+    """Get the admin's selected timezone as a pytz tzinfo, parsed once per settings change"""
+    import pytz
+    global _timezone_cache
+    
+    raw = Settings.get('timezone_settings', '{}')
+    cached_raw, cached_tz = _timezone_cache
+    if cached_tz is not None and cached_raw == raw:
+        return cached_tz
+    
+    try:
+        timezone_name = (json.loads(raw) if raw else {}).get('timezone', 'UTC')
+        tz = pytz.timezone(timezone_name)
+    except Exception:
+        tz = pytz.UTC
+    
+    _timezone_cache = (raw, tz)
+    return tz
+
+def clear_timezone_cache():
+    """Forget the resolved timezone, e.g. after the admin saves timezone settings"""
+    global _timezone_cache
+    _timezone_cache = (None, None)
+
+def _to_timezone(dt, target_tz):
+    import pytz
+    
+    # Handle date objects (convert to datetime at midnight)
+    if isinstance(dt, date) and not isinstance(dt, datetime):
+        dt = datetime.combine(dt, datetime.min.time())
+    
+    # If no timezone info, assume UTC
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    
+    return dt.astimezone(target_tz)
+
 def format_datetime_in_timezone(dt, format_str='%B %d, %Y at %I:%M %p'):
     """Format a datetime object in the admin's selected timezone"""
     try:
-        import pytz
-        from datetime import datetime, date
-        
-        # Get timezone settings
-        timezone_settings = get_timezone_settings()
-        selected_timezone = timezone_settings.get('timezone', 'UTC')
-        
-        # Handle date objects (convert to datetime at midnight)
-        if isinstance(dt, date) and not isinstance(dt, datetime):
-            dt = datetime.combine(dt, datetime.min.time())
-        
-        # If no timezone info, assume UTC
-        if hasattr(dt, 'tzinfo') and dt.tzinfo is None:
-            utc = pytz.UTC
-            dt = utc.localize(dt)
-        
-        # Convert to selected timezone
-        target_tz = pytz.timezone(selected_timezone)
-        converted_dt = dt.astimezone(target_tz)
-        
-        return converted_dt.strftime(format_str)
+        return _to_timezone(dt, get_selected_timezone()).strftime(format_str)
     except Exception as e:
         # Fallback to UTC formatting if timezone conversion fails
-        return dt.strftime(format_str) 
\ No newline at end of file
+        return dt.strftime(format_str)
+
+def format_datetimes_in_timezone(dts, format_str='%B %d, %Y at %I:%M %p'):
+    """Format a list of datetimes in the admin's selected timezone, resolving it only once"""
+    try:
+        target_tz = get_selected_timezone()
+    except Exception:
+        target_tz = None
+    
+    formatted = []
+    for dt in dts:
+        if dt is None:
+            formatted.append(None)
+            continue
+        try:
+            formatted.append(_to_timezone(dt, target_tz).strftime(format_str) if target_tz else dt.strftime(format_str))
+        except Exception:
+            formatted.append(dt.strftime(format_str))
+    return formatted
@@ -0,0 +1,277 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from flask import current_app, url_for
+from werkzeug.utils import secure_filename
+from app import db
+from app.models.photo import Photo
+from app.models.guestbook import GuestbookEntry
+from app.models.messages import Message
+from app.models.slideshow import SlideshowActivity
+from app.utils.event_hub import EventHub, SSE_HEARTBEAT_INTERVAL, SSE_RETRY_DELAY, format_sse
+from app.utils.image_utils import get_photo_srcset, create_image_rendition
+
+# The slideshow reads one append-only feed table. Each upload, photobooth shot, message
+# and guestbook entry writes its SlideshowActivity row, with the slide content in
+# payload, in the same commit as the content itself. The first load is a range scan
+# on created_at; after that clients follow by cursor, the id of the newest activity
+# they have. Ids grow in commit order, so a row can never appear behind a cursor.
+
+SLIDESHOW_CHANNEL = 'slideshow'
+SLIDESHOW_RESYNC_INTERVAL = 5  # seconds between database checks for activity added by other processes
+SLIDESHOW_MAX_WAIT = 30  # longest a long-poll request waits for new activity, in seconds
+SLIDESHOW_STREAM_MAX_AGE = 30 * 60  # seconds before a stream ends and the browser reconnects with Last-Event-ID
+SLIDESHOW_BACKFILL_BATCH_SIZE = 500
+SLIDESHOW_RENDITIONS = {'screen': 1920, 'small': 400}  # widths for full-screen slides and inset guest photos
+SLIDESHOW_PREFETCH_COUNT = 5  # upcoming slides listed in the prefetch manifest
+
+# Rendition kind: config key of the folder holding the originals
+_RENDITION_SOURCES = {
+    'photo': 'UPLOAD_FOLDER',
+    'photobooth': 'PHOTOBOOTH_FOLDER',
+    'guestbook': 'GUESTBOOK_UPLOAD_FOLDER',
+    'message': 'MESSAGE_UPLOAD_FOLDER'
+}
+
+# Wakes slideshow streams and long-polls in this process when activity is added
+slideshow_hub = EventHub()
+
+def _photo_content(photo):
+    return {
+        'filename': photo.filename,
+        'uploader_name': photo.uploader_name,
+        'description': photo.description,
+        'upload_date': photo.upload_date.isoformat(),
+        'media_type': photo.media_type,
+        'is_photobooth': photo.is_photobooth,
+        # srcset needs url_for, so it is built when the activity is read
+        'derivatives': photo.derivatives,
+        'width': photo.width
+    }
+
+def _guestbook_content(entry):
+    return {
+        'name': entry.name,
+        'message': entry.message,
+        'location': entry.location,
+        'photo_filename': entry.photo_filename,
+        'created_at': entry.created_at.isoformat()
+    }
+
+def _message_content(message):
+    return {
+        'author_name': message.author_name,
+        'content': message.content,
+        'photo_filename': message.photo_filename,
+        'created_at': message.created_at.isoformat()
+    }
+
+# activity_type: (model, created-at column, content builder, summary builder)
+_ACTIVITY_TYPES = {
+    'photo': (Photo, Photo.upload_date, _photo_content, lambda photo: f"New photo uploaded by {photo.uploader_name}"),
+    'guestbook': (GuestbookEntry, GuestbookEntry.created_at, _guestbook_content, lambda entry: f"Guestbook entry from {entry.name}"),
+    'message': (Message, Message.created_at, _message_content, lambda message: f"Message from {message.author_name}")
+}
+
+def record_activity(activity_type, item):
+    """Add the feed row for new content; the caller commits, so both land together"""
+    model, created, build_content, build_summary = _ACTIVITY_TYPES[activity_type]
+    if item.id is None:
+        # Assigns the id and the created-at default
+        db.session.flush()
+    activity = SlideshowActivity(
+        activity_type=activity_type,
+        content_id=item.id,
+        content_summary=build_summary(item),
+        payload=json.dumps(build_content(item)),
+        created_at=getattr(item, created.key) or datetime.utcnow(),
+        is_active=not (getattr(item, 'is_hidden', False) or getattr(item, 'is_pending', False))
+    )
+    db.session.add(activity)
+    return activity
+
+def set_activity_active(activity_type, content_id, active):
+    """Show or hide content's activity, e.g. when a message is hidden or content deleted (caller commits)"""
+    SlideshowActivity.query.filter_by(activity_type=activity_type, content_id=content_id).update(
+        {'is_active': active}, synchronize_session=False)
+
+def refresh_photo_activity(photo):
+    """Rewrite a photo's activity payload after its derivatives change (caller commits)"""
+    SlideshowActivity.query.filter_by(activity_type='photo', content_id=photo.id).update(
+        {'payload': json.dumps(_photo_content(photo))}, synchronize_session=False)
+
+def backfill_slideshow_activities():
+    """One-time creation of feed rows for content added before the feed table was written"""
+    created = 0
+    for activity_type, (model, _, _, _) in _ACTIVITY_TYPES.items():
+        while True:
+            missing = model.query.filter(~db.exists().where(db.and_(
+                SlideshowActivity.activity_type == activity_type,
+                SlideshowActivity.content_id == model.id
+            ))).order_by(model.id).limit(SLIDESHOW_BACKFILL_BATCH_SIZE).all()
+            if not missing:
+                break
+            for item in missing:
+                record_activity(activity_type, item)
+            db.session.commit()
+            created += len(missing)
+    return created
+
+def get_rendition_path(kind, size, filename):
+    """Path of a cached slideshow rendition, creating it on first use.
+
+    Falls back to the original when it cannot be converted (e.g. an animated GIF).
+    Returns None if the request does not name an existing original.
+    """
+    folder_key = _RENDITION_SOURCES.get(kind)
+    width = SLIDESHOW_RENDITIONS.get(size)
+    if folder_key is None or width is None or not filename or filename != secure_filename(filename):
+        return None
+
+    source_path = os.path.join(current_app.config[folder_key], filename)
+    if not os.path.isfile(source_path):
+        return None
+
+    stem = os.path.splitext(filename)[0]
+    rendition_path = os.path.join(current_app.config['RENDITION_FOLDER'], f"{kind}_{stem}_{size}.jpg")
+    if os.path.exists(rendition_path) or create_image_rendition(source_path, width, rendition_path):
+        return rendition_path
+    return source_path
+
+def delete_renditions(kind, filename):
+    """Remove the cached renditions of an original that is being deleted"""
+    stem = os.path.splitext(filename)[0]
+    for size in SLIDESHOW_RENDITIONS:
+        try:
+            os.remove(os.path.join(current_app.config['RENDITION_FOLDER'], f"{kind}_{stem}_{size}.jpg"))
+        except OSError:
+            pass
+
+def _slide_images(activity_type, content):
+    """Rendition URLs a slide displays, keyed by size"""
+    if activity_type == 'photo':
+        if content.get('media_type') == 'video':
+            return {}
+        kind = 'photobooth' if content.get('is_photobooth') else 'photo'
+        return {'screen': url_for('slideshow.slideshow_rendition', kind=kind, size='screen', filename=content['filename'])}
+    if content.get('photo_filename'):
+        return {'small': url_for('slideshow.slideshow_rendition', kind=activity_type, size='small',
+                                 filename=content['photo_filename'])}
+    return {}
+
+def build_prefetch_manifest(activities, count=SLIDESHOW_PREFETCH_COUNT):
+    """Images of the first count slides, in display order, for the client to load ahead of time"""
+    return [{'activity_id': activity['activity_id'], 'urls': list(activity['images'].values())}
+            for activity in activities[:count] if activity['images']]
+
+def activity_from_row(row):
+    """API form of a feed row"""
+    content = json.loads(row.payload or '{}')
+    if row.activity_type == 'photo':
+        photo = SimpleNamespace(filename=content.get('filename'), is_photobooth=content.get('is_photobooth'),
+                                derivatives=content.pop('derivatives', None), width=content.pop('width', None))
+        content['srcset'] = get_photo_srcset(photo)
+    return {
+        'type': row.activity_type,
+        'id': row.content_id,
+        'activity_id': row.id,
+        'content': content,
+        'images': _slide_images(row.activity_type, content),
+        'timestamp': row.created_at.isoformat(),
+        'summary': row.content_summary
+    }
+
+def parse_activity_cursor(value):
+    """Activity id from a cursor returned by the activities API, or None"""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def latest_activity_id():
+    return db.session.query(db.func.max(SlideshowActivity.id)).scalar() or 0
+
+def _feed_query(show_photos, show_guestbook, show_messages):
+    query = SlideshowActivity.query.filter(SlideshowActivity.is_active == True)
+    types = [activity_type for activity_type, shown in
+             (('photo', show_photos), ('guestbook', show_guestbook), ('message', show_messages)) if shown]
+    if len(types) < len(_ACTIVITY_TYPES):
+        query = query.filter(SlideshowActivity.activity_type.in_(types))
+    return query
+
+def get_recent_activities(since_time, max_activities, show_photos=True, show_guestbook=True, show_messages=True):
+    """The newest max_activities activities since since_time and the cursor to follow them with"""
+    cursor = latest_activity_id()
+    rows = _feed_query(show_photos, show_guestbook, show_messages).filter(
+        SlideshowActivity.created_at >= since_time,
+        SlideshowActivity.id <= cursor
+    ).order_by(SlideshowActivity.created_at.desc()).limit(max_activities).all()
+    return [activity_from_row(row) for row in rows], cursor
+
+def get_activities_after(cursor, since_time, max_activities, show_photos=True, show_guestbook=True, show_messages=True):
+    """Activities after cursor that are still inside the window, oldest first; returns (activities, has_more)"""
+    rows = _feed_query(show_photos, show_guestbook, show_messages).filter(
+        SlideshowActivity.id > cursor,
+        SlideshowActivity.created_at >= since_time
+    ).order_by(SlideshowActivity.id).limit(max_activities + 1).all()
+    return [activity_from_row(row) for row in rows[:max_activities]], len(rows) > max_activities
+
+def activity_cursor(activities, default):
+    """Cursor to send back after activities"""
+    return max([activity['activity_id'] for activity in activities] + [default])
+
+def publish_activity(activity_type, content_id):
+    """Wake the slideshows following new activity in this process"""
+    slideshow_hub.publish(SLIDESHOW_CHANNEL, 'activity', {'type': activity_type, 'id': content_id})
+
+def wait_for_activity(cursor, since_time, timeout, max_activities, **filters):
+    """Long-poll: activities after cursor, waiting up to timeout seconds for some to arrive"""
+    subscription = slideshow_hub.subscribe(SLIDESHOW_CHANNEL)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            activities, has_more = get_activities_after(cursor, since_time, max_activities, **filters)
+            remaining = deadline - time.monotonic()
+            if activities or remaining <= 0:
+                return activities, has_more
+            db.session.remove()
+            subscription.wait(min(remaining, SLIDESHOW_RESYNC_INTERVAL))
+    finally:
+        subscription.close()
+
+def slideshow_event_stream(cursor, hours_back, max_activities, **filters):
+    """Generate new slideshow activity as Server-Sent Events, starting after cursor.
+
+    Each event's id is the cursor after it, so a reconnecting browser resumes with
+    Last-Event-ID. Activity added in this process is sent at once; activity added by
+    other processes is found by a database check every SLIDESHOW_RESYNC_INTERVAL seconds.
+    """
+    subscription = slideshow_hub.subscribe(SLIDESHOW_CHANNEL)
+    try:
+        yield f"retry: {SSE_RETRY_DELAY}\n\n"
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < SLIDESHOW_STREAM_MAX_AGE:
+            # Activities older than the window are not shown, however old the cursor is
+            window_start = datetime.utcnow() - timedelta(hours=hours_back)
+            try:
+                activities, has_more = get_activities_after(cursor, window_start, max_activities, **filters)
+            finally:
+                # Do not hold a database connection while the stream waits
+                db.session.remove()
+
+            for activity in activities:
+                yield format_sse('activity', activity, event_id=activity['activity_id'])
+            if activities:
+                cursor = activities[-1]['activity_id']
+                last_sent = time.monotonic()
+            if has_more:
+                continue
+
+            if time.monotonic() - last_sent >= SSE_HEARTBEAT_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            subscription.wait(SLIDESHOW_RESYNC_INTERVAL)
+    finally:
+        subscription.close()
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, case
+from app import db
+from app.models.photo import Photo, Comment
+from app.models.guestbook import GuestbookEntry
+from app.models.messages import Message, MessageComment
+from app.utils.db_optimization import db_optimizer
+from app.utils.pagination import keyset_paginate
+
+DASHBOARD_STATS_CACHE_KEY = 'admin_dashboard_stats'
+DASHBOARD_STATS_TTL = 30  # seconds
+
+def _compute_dashboard_stats():
+    """Run every dashboard count and sum as scalar subqueries of a single SELECT"""
+    def scalar(column, *criteria):
+        query = select(column)
+        if criteria:
+            query = query.where(*criteria)
+        return query.scalar_subquery()
+
+    row = db.session.execute(select(
+        scalar(func.count(Photo.id)).label('total_photos'),
+        scalar(func.count(Photo.id), Photo.media_type == 'video').label('total_videos'),
+        scalar(func.count(Photo.id), Photo.is_photobooth == True).label('photobooth_count'),
+        scalar(func.coalesce(func.sum(Photo.likes), 0)).label('total_likes'),
+        scalar(func.count(Comment.id)).label('total_comments'),
+        scalar(func.count(GuestbookEntry.id)).label('total_guestbook'),
+        scalar(func.count(Message.id)).label('total_messages'),
+        scalar(func.count(Message.id), Message.is_hidden == True).label('hidden_messages'),
+        scalar(func.count(MessageComment.id)).label('total_message_comments')
+    )).one()
+
+    stats = dict(row._mapping)
+    stats['visible_messages'] = stats['total_messages'] - stats['hidden_messages']
+    return stats
+
+def get_dashboard_stats(use_cache=True):
+    """Get admin dashboard counts, cached briefly since they change on every upload"""
+    if not use_cache:
+        return _compute_dashboard_stats()
+    return db_optimizer.cache_query(DASHBOARD_STATS_CACHE_KEY, _compute_dashboard_stats, ttl=DASHBOARD_STATS_TTL)
+
+def get_guestbook_stats():
+    """Get guestbook entry counts for the admin guestbook page in one query"""
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    row = db.session.query(
+        func.count(GuestbookEntry.id).label('total_entries'),
+        func.count(GuestbookEntry.photo_filename).label('entries_with_photos'),
+        func.count(func.nullif(GuestbookEntry.location, '')).label('entries_with_location'),
+        func.coalesce(func.sum(case((GuestbookEntry.created_at >= week_ago, 1), else_=0)), 0).label('recent_entries')
+    ).one()
+    return dict(row._mapping)
+
+def get_message_stats():
+    """Get message board counts for the admin messages page in one query"""
+    row = db.session.execute(select(
+        select(func.count(Message.id)).scalar_subquery().label('total_messages'),
+        select(func.count(Message.id)).where(Message.is_hidden == True).scalar_subquery().label('hidden_messages'),
+        select(func.count(Message.photo_filename)).scalar_subquery().label('messages_with_photos'),
+        select(func.count(MessageComment.id)).scalar_subquery().label('total_comments')
+    )).one()
+
+    stats = dict(row._mapping)
+    stats['visible_messages'] = stats['total_messages'] - stats['hidden_messages']
+    return stats
+
+def clear_dashboard_stats_cache():
+    """Drop cached dashboard counts, e.g. after deleting content"""
+    db_optimizer.clear_cache(DASHBOARD_STATS_CACHE_KEY)
+
+# Recent-item widgets: model, timestamp column and row serializer per content type
+_RECENT_SOURCES = {
+    'photos': (Photo, Photo.upload_date, lambda p: {
+        'id': p.id,
+        'title': p.original_filename,
+        'author': p.uploader_name,
+        'media_type': p.media_type,
+        'is_photobooth': p.is_photobooth,
+        'likes': p.likes,
+        'comments': p.comment_count or 0,
+        'url': f'/photo/{p.id}'
+    }),
+    'guestbook': (GuestbookEntry, GuestbookEntry.created_at, lambda e: {
+        'id': e.id,
+        'title': (e.message or '')[:80],
+        'author': e.name,
+        'location': e.location,
+        'url': f'/guestbook/#entry-{e.id}'
+    }),
+    'messages': (Message, Message.created_at, lambda m: {
+        'id': m.id,
+        'title': (m.content or '')[:80],
+        'author': m.author_name,
+        'is_hidden': m.is_hidden,
+        'likes': m.likes,
+        'comments': m.comment_count or 0,
+        'url': f'/messages/#message-{m.id}'
+    })
+}
+
+def get_recent_items(content_type, after=None, limit=10):
+    """Get one page of the newest photos, guestbook entries or messages for a dashboard widget"""
+    if content_type not in _RECENT_SOURCES:
+        raise ValueError(f"Unknown content type '{content_type}'")
+
+    model, date_column, serialize = _RECENT_SOURCES[content_type]
+    page = keyset_paginate(model.query, date_column, model.id, after=after, limit=limit)
+
+    items = []
+    for item in page['items']:
+        data = serialize(item)
+        timestamp = getattr(item, date_column.key)
+        data['created_at'] = timestamp.isoformat() if timestamp else None
+        items.append(data)
+
+    return {
+        'items': items,
+        'has_next': page['has_next'],
+        'next_cursor': page['next_cursor']
+    }
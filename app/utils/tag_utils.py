@@ -0,0 +1,74 @@
+from app import db
+from app.models.photo import Photo, Tag, PhotoTag
+
+MAX_TAG_LENGTH = 50
+
+def parse_tags(tags_text):
+    """Split a comma-separated tag string into unique, trimmed tag names (first spelling wins)"""
+    tags = []
+    seen = set()
+    for tag in (tags_text or '').split(','):
+        tag = ' '.join(tag.split())[:MAX_TAG_LENGTH]
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            tags.append(tag)
+    return tags
+
+def _get_or_create_tag(name):
+    slug = name.lower()
+    tag = Tag.query.filter_by(slug=slug).first()
+    if tag is None:
+        tag = Tag(name=name, slug=slug, photo_count=0)
+        db.session.add(tag)
+        db.session.flush()
+    return tag
+
+def set_photo_tags(photo, tags_text):
+    """Replace a photo's tags, keeping the tag links and per-tag counts in sync (caller commits)"""
+    names = parse_tags(tags_text)
+    photo.tags = ', '.join(names) if names else None
+
+    if photo.id is None:
+        db.session.flush()
+
+    current = {link.tag.slug: link for link in photo.tag_links}
+    wanted = {name.lower(): name for name in names}
+
+    for slug, link in current.items():
+        if slug not in wanted:
+            link.tag.photo_count = Tag.photo_count - 1
+            photo.tag_links.remove(link)
+
+    for slug, name in wanted.items():
+        if slug not in current:
+            tag = _get_or_create_tag(name)
+            tag.photo_count = Tag.photo_count + 1
+            photo.tag_links.append(PhotoTag(tag_id=tag.id))
+
+def clear_photo_tags(photo):
+    """Drop a photo's tags before it is deleted so the per-tag counts stay correct"""
+    set_photo_tags(photo, '')
+
+def get_tag_counts():
+    """Get tags in use with their photo counts for the gallery filter"""
+    return Tag.query.filter(Tag.photo_count > 0).order_by(Tag.slug).all()
+
+def filter_photos_by_tag(photos_query, tag_name):
+    """Restrict a Photo query to photos carrying an exact tag (case-insensitive)"""
+    tagged_photo_ids = db.session.query(PhotoTag.photo_id).join(Tag).filter(
+        Tag.slug == tag_name.strip().lower()
+    )
+    return photos_query.filter(Photo.id.in_(tagged_photo_ids))
+
+def migrate_photo_tags():
+    """One-time backfill of tag links from the legacy comma-separated Photo.tags column"""
+    untagged = Photo.query.filter(
+        Photo.tags.isnot(None),
+        Photo.tags != '',
+        ~Photo.tag_links.any()
+    ).all()
+
+    for photo in untagged:
+        set_photo_tags(photo, photo.tags)
+    db.session.commit()
+    return len(untagged)
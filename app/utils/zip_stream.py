@@ -0,0 +1,293 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+
+# Streaming ZIP writer.
+#
+# The whole archive layout (every header, file offset and the central directory size)
+# is computed up front from file sizes, so the exact Content-Length is known before
+# the first byte is sent and any byte range can be produced without building the file.
+# Media files are STORED (they are already compressed) with their CRC written in a
+# trailing data descriptor, so nothing has to be read twice on a normal download.
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_CHUNK_SIZE = 1024 * 1024  # bytes read from disk per chunk
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_METHOD_STORED = 0
+_METHOD_DEFLATED = 8
+_EXTERNAL_ATTR = 0o100644 << 16  # regular file, rw-r--r--
+_VERSION_MADE_BY = (3 << 8) | 45  # Unix, ZIP spec 4.5
+
+# CRC32 of files already read, keyed by (path, size, mtime_ns), so a resumed download
+# can write data descriptors and the central directory without rereading every file
+_crc_cache = {}
+_crc_lock = threading.Lock()
+
+def _dos_datetime(timestamp):
+    t = time.gmtime(timestamp)
+    year = max(t.tm_year, 1980)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dos_time, dos_date
+
+def _file_crc(path, size, mtime_ns):
+    key = (path, size, mtime_ns)
+    with _crc_lock:
+        if key in _crc_cache:
+            return _crc_cache[key]
+
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(ZIP_CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    _remember_crc(key, crc)
+    return crc
+
+def _remember_crc(key, crc):
+    with _crc_lock:
+        _crc_cache[key] = crc
+
+class ZipEntry:
+    """A file on disk or an in-memory blob to be written into a StreamingZip"""
+
+    def __init__(self, arcname, path=None, data=None, mtime=None, compress=False):
+        self.arcname = arcname
+        self.name_bytes = arcname.encode('utf-8')
+        self.path = path
+
+        if path is not None:
+            stat = os.stat(path)
+            self.size = stat.st_size
+            self.mtime_ns = stat.st_mtime_ns
+            self.mtime = stat.st_mtime
+            self.method = _METHOD_STORED
+            self.crc = None  # filled in from the CRC cache or while streaming
+            self.payload = None
+            self.compressed_size = self.size
+        else:
+            self.size = len(data)
+            self.mtime_ns = None
+            self.mtime = mtime if mtime is not None else 315532800  # 1980-01-01
+            self.crc = zlib.crc32(data)
+            if compress:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                self.payload = compressor.compress(data) + compressor.flush()
+                self.method = _METHOD_DEFLATED
+            else:
+                self.payload = data
+                self.method = _METHOD_STORED
+            self.compressed_size = len(self.payload)
+
+        self.dos_time, self.dos_date = _dos_datetime(self.mtime)
+        self.offset = None
+
+    @property
+    def streamed(self):
+        """Files are streamed with a trailing data descriptor; blobs carry their CRC up front"""
+        return self.path is not None
+
+    @property
+    def zip64(self):
+        return self.size >= ZIP64_LIMIT or self.compressed_size >= ZIP64_LIMIT
+
+    def get_crc(self):
+        if self.crc is None:
+            self.crc = _file_crc(self.path, self.size, self.mtime_ns)
+        return self.crc
+
+    def local_header(self):
+        flags = _FLAG_UTF8 | (_FLAG_DATA_DESCRIPTOR if self.streamed else 0)
+        version = 45 if self.zip64 else 20
+        extra = b''
+        if self.zip64:
+            sizes = ZIP64_LIMIT, ZIP64_LIMIT
+            extra = struct.pack('<HHQQ', 0x0001, 16,
+                                0 if self.streamed else self.size,
+                                0 if self.streamed else self.compressed_size)
+        elif self.streamed:
+            sizes = 0, 0
+        else:
+            sizes = self.compressed_size, self.size
+        crc = 0 if self.streamed else self.crc
+
+        return struct.pack('<IHHHHHIIIHH', 0x04034b50, version, flags, self.method,
+                           self.dos_time, self.dos_date, crc, sizes[0], sizes[1],
+                           len(self.name_bytes), len(extra)) + self.name_bytes + extra
+
+    def data_descriptor_length(self):
+        if not self.streamed:
+            return 0
+        return 24 if self.zip64 else 16
+
+    def data_descriptor(self):
+        if self.zip64:
+            return struct.pack('<IIQQ', 0x08074b50, self.get_crc(), self.compressed_size, self.size)
+        return struct.pack('<IIII', 0x08074b50, self.get_crc(), self.compressed_size, self.size)
+
+    def _central_extra(self):
+        fields = []
+        if self.size >= ZIP64_LIMIT:
+            fields.append(self.size)
+        if self.compressed_size >= ZIP64_LIMIT:
+            fields.append(self.compressed_size)
+        if self.offset >= ZIP64_LIMIT:
+            fields.append(self.offset)
+        if not fields:
+            return b''
+        return struct.pack('<HH', 0x0001, 8 * len(fields)) + struct.pack(f'<{len(fields)}Q', *fields)
+
+    def central_header_length(self):
+        return 46 + len(self.name_bytes) + len(self._central_extra())
+
+    def central_header(self):
+        extra = self._central_extra()
+        flags = _FLAG_UTF8 | (_FLAG_DATA_DESCRIPTOR if self.streamed else 0)
+        version = 45 if extra or self.zip64 else 20
+        return struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, _VERSION_MADE_BY, version, flags,
+                           self.method, self.dos_time, self.dos_date, self.get_crc(),
+                           min(self.compressed_size, ZIP64_LIMIT), min(self.size, ZIP64_LIMIT),
+                           len(self.name_bytes), len(extra), 0, 0, 0, _EXTERNAL_ATTR,
+                           min(self.offset, ZIP64_LIMIT)) + self.name_bytes + extra
+
+class StreamingZip:
+    """ZIP archive produced on the fly with a precomputed, deterministic layout"""
+
+    def __init__(self):
+        self.entries = []
+        self._segments = None
+        self.total_size = None
+
+    def add_file(self, arcname, path):
+        """Add a file from disk, stored without recompression; missing files are skipped"""
+        if not os.path.isfile(path):
+            return None
+        entry = ZipEntry(arcname, path=path)
+        self.entries.append(entry)
+        self._segments = None
+        return entry
+
+    def add_bytes(self, arcname, data, mtime=None, compress=True):
+        """Add an in-memory blob, deflated by default"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        entry = ZipEntry(arcname, data=data, mtime=mtime, compress=compress)
+        self.entries.append(entry)
+        self._segments = None
+        return entry
+
+    def _layout(self):
+        if self._segments is not None:
+            return self._segments
+
+        segments = []
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            header = entry.local_header()
+            segments.append((offset, len(header), 'bytes', header))
+            offset += len(header)
+
+            if entry.streamed:
+                segments.append((offset, entry.size, 'file', entry))
+            else:
+                segments.append((offset, entry.compressed_size, 'bytes', entry.payload))
+            offset += entry.compressed_size
+
+            if entry.streamed:
+                segments.append((offset, entry.data_descriptor_length(), 'descriptor', entry))
+                offset += entry.data_descriptor_length()
+
+        central_offset = offset
+        central_size = sum(entry.central_header_length() for entry in self.entries)
+        end_records = self._end_records(central_offset, central_size)
+        segments.append((offset, central_size, 'central', None))
+        offset += central_size
+        segments.append((offset, len(end_records), 'bytes', end_records))
+        offset += len(end_records)
+
+        self._segments = segments
+        self.total_size = offset
+        return segments
+
+    def _end_records(self, central_offset, central_size):
+        count = len(self.entries)
+        records = b''
+        if count >= 0xFFFF or central_offset >= ZIP64_LIMIT or central_size >= ZIP64_LIMIT:
+            zip64_end_offset = central_offset + central_size
+            records += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, _VERSION_MADE_BY, 45, 0, 0,
+                                   count, count, central_size, central_offset)
+            records += struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1)
+        records += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                               min(central_size, ZIP64_LIMIT), min(central_offset, ZIP64_LIMIT), 0)
+        return records
+
+    def get_size(self):
+        """Exact size of the archive in bytes"""
+        self._layout()
+        return self.total_size
+
+    def get_etag(self):
+        """Validator that changes whenever any entry's name, size, mtime or content changes"""
+        digest = hashlib.sha1()
+        for entry in self.entries:
+            digest.update(entry.name_bytes)
+            digest.update(f"|{entry.size}|{entry.mtime_ns}|{entry.crc if not entry.streamed else ''}\n".encode())
+        return digest.hexdigest()
+
+    def iter_bytes(self, start=0, end=None, progress=None):
+        """Yield the archive bytes in [start, end] (inclusive), reading files lazily.
+
+        progress, if given, is called as progress(bytes_sent, current_arcname).
+        """
+        segments = self._layout()
+        if end is None or end >= self.total_size:
+            end = self.total_size - 1
+        stop = end + 1
+        sent = 0
+
+        for seg_offset, seg_length, kind, payload in segments:
+            seg_end = seg_offset + seg_length
+            if seg_end <= start or seg_offset >= stop or seg_length == 0:
+                continue
+            lo = max(start, seg_offset) - seg_offset
+            hi = min(stop, seg_end) - seg_offset
+
+            if kind == 'file':
+                chunks = self._read_file(payload, lo, hi)
+            elif kind == 'descriptor':
+                chunks = [payload.data_descriptor()[lo:hi]]
+            elif kind == 'central':
+                chunks = [b''.join(entry.central_header() for entry in self.entries)[lo:hi]]
+            else:
+                chunks = [payload[lo:hi]]
+
+            for chunk in chunks:
+                sent += len(chunk)
+                yield chunk
+                if progress:
+                    progress(sent, payload.arcname if kind == 'file' else None)
+
+    def _read_file(self, entry, lo, hi):
+        """Read bytes [lo, hi) of an entry's file, recording its CRC when read in full"""
+        track_crc = lo == 0 and hi == entry.size and entry.crc is None
+        crc = 0
+        remaining = hi - lo
+        with open(entry.path, 'rb') as f:
+            f.seek(lo)
+            while remaining > 0:
+                chunk = f.read(min(ZIP_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"{entry.path} shrank while being archived")
+                remaining -= len(chunk)
+                if track_crc:
+                    crc = zlib.crc32(chunk, crc)
+                yield chunk
+
+        if track_crc:
+            entry.crc = crc
+            _remember_crc((entry.path, entry.size, entry.mtime_ns), crc)
@@ -1,10 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify, send_file, session, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, send_file, session, current_app, Response
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import json
 import os
-import tempfile
-import zipfile
 import qrcode
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
@@ -13,18 +11,29 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
-from app.models.photo import Photo, Comment, Like
+from app.models.photo import Photo, Comment, Like, Tag, PhotoTag
 from app.models.guestbook import GuestbookEntry
 from app.models.messages import Message, MessageComment, MessageLike
-from app.models.settings import Settings
+from app.models.settings import Settings, SETTINGS_VERSION_KEY
 from app.models.email import EmailLog, ImmichSyncLog
 from app.models.notifications import NotificationUser, Notification
+from app.models.jobs import MediaJob
+from app.models.slideshow import SlideshowActivity
 from app import db
-from app.utils.settings_utils import verify_admin_access, get_email_settings, get_immich_settings, get_sso_settings
-from app.utils.email_utils import start_email_monitor
-from app.utils.immich_utils import sync_all_to_immich
-from app.utils.notification_utils import create_notification_with_push
+from app.utils.settings_utils import verify_admin_access, get_email_settings, get_immich_settings, get_sso_settings, clear_timezone_cache
+from app.utils.email_utils import start_email_monitor, notify_email_monitor
+from app.utils.immich_utils import get_immich_sync_stats
+from app.utils.notification_utils import create_notification_with_push, publish_notification, send_broadcast_notification
 from app.utils.db_optimization import db_optimizer, get_photo_stats, maintenance_task
+from app.utils.image_utils import delete_image_derivatives, generate_missing_derivatives
+from app.utils.job_queue import get_job_stats, enqueue_job
+from app.utils.stats_utils import get_dashboard_stats, get_recent_items, clear_dashboard_stats_cache, get_guestbook_stats, get_message_stats
+from app.utils.export_utils import build_gallery_archive, is_valid_download_id, start_download_progress, update_download_progress, get_download_progress
+from app.utils.backup_utils import list_backups, restore_backup, get_backup_archive_path
+from app.utils.admin_lists import list_admin_photos, list_admin_guestbook, list_admin_messages
+from app.utils.search_utils import rebuild_search_index
+from app.utils.tag_utils import clear_photo_tags
+from app.utils.slideshow_utils import set_activity_active, delete_renditions
 from app.utils.system_logger import log_info, log_error, log_exception
 
 admin_bp = Blueprint('admin', __name__)
@@ -45,51 +54,32 @@ def admin():
         else:
             return "Unauthorized", 401
     
-    photos = Photo.query.order_by(Photo.upload_date.desc()).all()
-    total_likes = sum(photo.likes for photo in photos)
-    total_comments = Comment.query.count()
-    guestbook_entries = GuestbookEntry.query.order_by(GuestbookEntry.created_at.desc()).all()
-    
-    # Get messages for admin
-    all_messages = Message.query.order_by(Message.created_at.desc()).all()
-    visible_messages = [m for m in all_messages if not m.is_hidden]
-    hidden_messages = [m for m in all_messages if m.is_hidden]
-    total_message_comments = MessageComment.query.count()
-    
-    # Count photobooth photos
-    photobooth_count = Photo.query.filter_by(is_photobooth=True).count()
+    # All counts come from one aggregate query; recent items are fetched lazily
+    stats = get_dashboard_stats()
     
     # Get email settings
-    email_settings = {
-        'enabled': Settings.get('email_enabled', 'false').lower() == 'true',
-        'smtp_server': Settings.get('email_smtp_server', 'smtp.gmail.com'),
-        'smtp_port': Settings.get('email_smtp_port', '587'),
-        'smtp_username': Settings.get('email_smtp_username', ''),
-        'smtp_password': Settings.get('email_smtp_password', ''),
-        'imap_server': Settings.get('email_imap_server', 'imap.gmail.com'),
-        'imap_port': Settings.get('email_imap_port', '993'),
-        'imap_username': Settings.get('email_imap_username', ''),
-        'imap_password': Settings.get('email_imap_password', ''),
-        'monitor_email': Settings.get('email_monitor_email', '')
-    }
+    email_settings = get_email_settings()
     
     # Get Immich settings
     immich_settings = get_immich_settings()
     
+    # Get media processing queue status
+    job_stats = get_job_stats()
+    
     return render_template('admin_dashboard.html',
-                         photos=photos,
-                         total_photos=len(photos),
-                         total_likes=total_likes,
-                         total_comments=total_comments,
-                         guestbook_entries=guestbook_entries,
-                         total_guestbook=len(guestbook_entries),
-                         visible_messages=visible_messages,
-                         hidden_messages=hidden_messages,
-                         total_messages=len(all_messages),
-                         total_message_comments=total_message_comments,
-                         photobooth_count=photobooth_count,
+                         total_photos=stats['total_photos'],
+                         total_likes=stats['total_likes'],
+                         total_comments=stats['total_comments'],
+                         total_guestbook=stats['total_guestbook'],
+                         visible_message_count=stats['visible_messages'],
+                         hidden_message_count=stats['hidden_messages'],
+                         total_messages=stats['total_messages'],
+                         total_message_comments=stats['total_message_comments'],
+                         photobooth_count=stats['photobooth_count'],
                          email_settings=email_settings,
-                         immich_settings=immich_settings)
+                         immich_settings=immich_settings,
+                         job_stats=job_stats,
+                         admin_key=admin_key)
 
 @admin_bp.route('/dashboard')
 def admin_dashboard():
@@ -107,51 +97,32 @@ def admin_dashboard():
         else:
             return "Unauthorized", 401
     
-    photos = Photo.query.order_by(Photo.upload_date.desc()).all()
-    total_likes = sum(photo.likes for photo in photos)
-    total_comments = Comment.query.count()
-    guestbook_entries = GuestbookEntry.query.order_by(GuestbookEntry.created_at.desc()).all()
-    
-    # Get messages for admin
-    all_messages = Message.query.order_by(Message.created_at.desc()).all()
-    visible_messages = [m for m in all_messages if not m.is_hidden]
-    hidden_messages = [m for m in all_messages if m.is_hidden]
-    total_message_comments = MessageComment.query.count()
-    
-    # Count photobooth photos
-    photobooth_count = Photo.query.filter_by(is_photobooth=True).count()
+    # All counts come from one aggregate query; recent items are fetched lazily
+    stats = get_dashboard_stats()
     
     # Get email settings
-    email_settings = {
-        'enabled': Settings.get('email_enabled', 'false').lower() == 'true',
-        'smtp_server': Settings.get('email_smtp_server', 'smtp.gmail.com'),
-        'smtp_port': Settings.get('email_smtp_port', '587'),
-        'smtp_username': Settings.get('email_smtp_username', ''),
-        'smtp_password': Settings.get('email_smtp_password', ''),
-        'imap_server': Settings.get('email_imap_server', 'imap.gmail.com'),
-        'imap_port': Settings.get('email_imap_port', '993'),
-        'imap_username': Settings.get('email_imap_username', ''),
-        'imap_password': Settings.get('email_imap_password', ''),
-        'monitor_email': Settings.get('email_monitor_email', '')
-    }
+    email_settings = get_email_settings()
     
     # Get Immich settings
     immich_settings = get_immich_settings()
     
+    # Get media processing queue status
+    job_stats = get_job_stats()
+    
     return render_template('admin_dashboard.html',
-                         photos=photos,
-                         total_photos=len(photos),
-                         total_likes=total_likes,
-                         total_comments=total_comments,
-                         guestbook_entries=guestbook_entries,
-                         total_guestbook=len(guestbook_entries),
-                         visible_messages=visible_messages,
-                         hidden_messages=hidden_messages,
-                         total_messages=len(all_messages),
-                         total_message_comments=total_message_comments,
-                         photobooth_count=photobooth_count,
+                         total_photos=stats['total_photos'],
+                         total_likes=stats['total_likes'],
+                         total_comments=stats['total_comments'],
+                         total_guestbook=stats['total_guestbook'],
+                         visible_message_count=stats['visible_messages'],
+                         hidden_message_count=stats['hidden_messages'],
+                         total_messages=stats['total_messages'],
+                         total_message_comments=stats['total_message_comments'],
+                         photobooth_count=stats['photobooth_count'],
                          email_settings=email_settings,
-                         immich_settings=immich_settings)
+                         immich_settings=immich_settings,
+                         job_stats=job_stats,
+                         admin_key=admin_key)
 
 @admin_bp.route('/photos')
 def admin_photos():
@@ -164,19 +135,55 @@ def admin_photos():
     if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
         return "Unauthorized", 401
     
-    photos = Photo.query.order_by(Photo.upload_date.desc()).all()
-    total_likes = sum(photo.likes for photo in photos)
-    total_comments = Comment.query.count()
-    photobooth_count = Photo.query.filter_by(is_photobooth=True).count()
-    total_videos = Photo.query.filter_by(media_type='video').count()
+    # Rows are loaded incrementally from /admin/api/photos
+    stats = get_dashboard_stats()
     
     return render_template('admin_photos.html',
-                         photos=photos,
-                         total_photos=len(photos),
-                         total_videos=total_videos,
-                         total_likes=total_likes,
-                         total_comments=total_comments,
-                         photobooth_count=photobooth_count)
+                         total_photos=stats['total_photos'],
+                         total_videos=stats['total_videos'],
+                         total_likes=stats['total_likes'],
+                         total_comments=stats['total_comments'],
+                         photobooth_count=stats['photobooth_count'])
+
+@admin_bp.route('/api/recent/<content_type>')
+def admin_recent_items(content_type):
+    """Paginated recent photos, guestbook entries or messages for dashboard widgets"""
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    try:
+        return jsonify(get_recent_items(content_type, after=request.args.get('after'), limit=limit))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+@admin_bp.route('/api/<content_type>')
+def admin_list_api(content_type):
+    """Cursor-paginated, filtered JSON listing for the admin photos, guestbook and messages tables"""
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    listings = {
+        'photos': list_admin_photos,
+        'guestbook': list_admin_guestbook,
+        'messages': list_admin_messages
+    }
+    if content_type not in listings:
+        return jsonify({'error': f"Unknown list '{content_type}'"}), 404
+    
+    return jsonify(listings[content_type](request.args))
 
 @admin_bp.route('/email-settings')
 def admin_email_settings():
@@ -247,25 +254,14 @@ def admin_guestbook():
     if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
         return "Unauthorized", 401
     
-    # Get guestbook entries
-    guestbook_entries = GuestbookEntry.query.order_by(GuestbookEntry.created_at.desc()).all()
-    
-    # Calculate statistics
-    total_entries = len(guestbook_entries)
-    entries_with_photos = len([e for e in guestbook_entries if e.photo_filename])
-    entries_with_location = len([e for e in guestbook_entries if e.location])
-    
-    # Count recent entries (last 7 days)
-    from datetime import datetime, timedelta
-    week_ago = datetime.now() - timedelta(days=7)
-    recent_entries = len([e for e in guestbook_entries if e.created_at >= week_ago])
+    # Rows are loaded incrementally from /admin/api/guestbook
+    stats = get_guestbook_stats()
     
     return render_template('admin_guestbook.html',
-                         guestbook_entries=guestbook_entries,
-                         total_entries=total_entries,
-                         entries_with_photos=entries_with_photos,
-                         entries_with_location=entries_with_location,
-                         recent_entries=recent_entries)
+                         total_entries=stats['total_entries'],
+                         entries_with_photos=stats['entries_with_photos'],
+                         entries_with_location=stats['entries_with_location'],
+                         recent_entries=stats['recent_entries'])
 
 @admin_bp.route('/messages')
 def admin_messages():
@@ -278,22 +274,15 @@ def admin_messages():
     if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
         return "Unauthorized", 401
     
-    # Get messages
-    all_messages = Message.query.order_by(Message.created_at.desc()).all()
-    visible_messages = [m for m in all_messages if not m.is_hidden]
-    hidden_messages = [m for m in all_messages if m.is_hidden]
-    
-    # Calculate statistics
-    total_messages = len(all_messages)
-    total_comments = MessageComment.query.count()
-    messages_with_photos = len([m for m in all_messages if m.photo_filename])
+    # Rows are loaded incrementally from /admin/api/messages
+    stats = get_message_stats()
     
     return render_template('admin_messages.html',
-                         visible_messages=visible_messages,
-                         hidden_messages=hidden_messages,
-                         total_messages=total_messages,
-                         total_comments=total_comments,
-                         messages_with_photos=messages_with_photos)
+                         visible_message_count=stats['visible_messages'],
+                         hidden_message_count=stats['hidden_messages'],
+                         total_messages=stats['total_messages'],
+                         total_comments=stats['total_comments'],
+                         messages_with_photos=stats['messages_with_photos'])
 
 @admin_bp.route('/photobooth')
 def admin_photobooth():
@@ -472,147 +461,166 @@ def batch_download():
         return "Unauthorized", 401
     
     try:
-        # Create a temporary zip file
-        temp_dir = tempfile.mkdtemp()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        zip_filename = f"wedding_gallery_backup_{timestamp}.zip"
-        zip_path = os.path.join(temp_dir, zip_filename)
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add all photos
-            photos = Photo.query.all()
-            for photo in photos:
-                if photo.media_type == 'video':
-                    file_path = os.path.join(current_app.config['VIDEO_FOLDER'], photo.filename)
-                elif photo.is_photobooth:
-                    file_path = os.path.join(current_app.config['PHOTOBOOTH_FOLDER'], photo.filename)
-                else:
-                    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename)
-                
-                if os.path.exists(file_path):
-                    # Create organized folder structure in zip
-                    if photo.media_type == 'video':
-                        zip_path_in_archive = f"videos/{photo.filename}"
-                    elif photo.is_photobooth:
-                        zip_path_in_archive = f"photobooth/{photo.filename}"
-                    else:
-                        zip_path_in_archive = f"photos/{photo.filename}"
-                    
-                    zipf.write(file_path, zip_path_in_archive)
-                
-                # Add video thumbnails if they exist
-                if photo.media_type == 'video' and photo.thumbnail_filename:
-                    thumb_path = os.path.join(current_app.config['THUMBNAIL_FOLDER'], photo.thumbnail_filename)
-                    if os.path.exists(thumb_path):
-                        zipf.write(thumb_path, f"video_thumbnails/{photo.thumbnail_filename}")
-            
-            # Add guestbook photos
-            guestbook_entries = GuestbookEntry.query.all()
-            for entry in guestbook_entries:
-                if entry.photo_filename:
-                    file_path = os.path.join(current_app.config['GUESTBOOK_UPLOAD_FOLDER'], entry.photo_filename)
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, f"guestbook_photos/{entry.photo_filename}")
-            
-            # Add message board photos
-            messages = Message.query.all()
-            for message in messages:
-                if message.photo_filename:
-                    file_path = os.path.join(current_app.config['MESSAGE_UPLOAD_FOLDER'], message.photo_filename)
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, f"message_photos/{message.photo_filename}")
-            
-            # Add border files
-            border_settings = Settings.get('photobooth_border', '{}')
-            border_settings = json.loads(border_settings) if border_settings else {}
-            if border_settings.get('filename'):
-                border_path = os.path.join(current_app.config['BORDER_FOLDER'], border_settings['filename'])
-                if os.path.exists(border_path):
-                    zipf.write(border_path, f"borders/{border_settings['filename']}")
-            
-            # Create and add a data export (JSON file with all database content)
-            export_data = {
-                'export_timestamp': datetime.now().isoformat(),
-                'photos': [],
-                'guestbook_entries': [],
-                'messages': [],
-                'settings': {}
-            }
-            
-            # Export photos data
-            for photo in photos:
-                export_data['photos'].append({
-                    'id': photo.id,
-                    'filename': photo.filename,
-                    'original_filename': photo.original_filename,
-                    'uploader_name': photo.uploader_name,
-                    'upload_date': photo.upload_date.isoformat(),
-                    'description': photo.description,
-                    'likes': photo.likes,
-                    'media_type': photo.media_type,
-                    'duration': photo.duration,
-                    'is_photobooth': photo.is_photobooth,
-                    'comments': [
-                        {
-                            'commenter_name': comment.commenter_name,
-                            'content': comment.content,
-                            'created_at': comment.created_at.isoformat()
-                        } for comment in photo.comments
-                    ]
-                })
-            
-            # Export guestbook entries
-            for entry in guestbook_entries:
-                export_data['guestbook_entries'].append({
-                    'id': entry.id,
-                    'name': entry.name,
-                    'message': entry.message,
-                    'location': entry.location,
-                    'photo_filename': entry.photo_filename,
-                    'created_at': entry.created_at.isoformat()
-                })
-            
-            # Export messages
-            for message in messages:
-                export_data['messages'].append({
-                    'id': message.id,
-                    'author_name': message.author_name,
-                    'content': message.content,
-                    'photo_filename': message.photo_filename,
-                    'created_at': message.created_at.isoformat(),
-                    'likes': message.likes,
-                    'is_hidden': message.is_hidden,
-                    'comments': [
-                        {
-                            'commenter_name': comment.commenter_name,
-                            'content': comment.content,
-                            'created_at': comment.created_at.isoformat(),
-                            'is_hidden': comment.is_hidden
-                        } for comment in message.message_comments
-                    ]
-                })
-            
-            # Export settings
-            all_settings = Settings.query.all()
-            for setting in all_settings:
-                export_data['settings'][setting.key] = setting.value
-            
-            # Add the export data as JSON file
-            export_json = json.dumps(export_data, indent=2, ensure_ascii=False)
-            zipf.writestr('wedding_gallery_data_export.json', export_json)
-        
-        # Send the zip file
-        return send_file(
-            zip_path,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name=zip_filename
-        )
-        
+        archive = build_gallery_archive()
+        total_size = archive.get_size()
+        etag = archive.get_etag()
     except Exception as e:
         print(f"Error creating batch download: {e}")
         return f"Error creating download: {str(e)}", 500
 
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    headers = {
+        'Content-Disposition': f'attachment; filename="wedding_gallery_backup_{timestamp}.zip"',
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"'
+    }
+
+    # Resume support: honour a single byte range, unless If-Range names an older archive
+    start, end, status = 0, total_size - 1, 200
+    if_range = request.headers.get('If-Range')
+    if request.range and request.range.units == 'bytes' and len(request.range.ranges) == 1 \
+            and (not if_range or if_range == f'"{etag}"'):
+        byte_range = request.range.range_for_length(total_size)
+        if byte_range is None:
+            headers['Content-Range'] = f'bytes */{total_size}'
+            return Response(status=416, headers=headers)
+        start, end, status = byte_range[0], byte_range[1] - 1, 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{total_size}'
+    headers['Content-Length'] = str(end - start + 1)
+
+    download_id = request.args.get('download_id', '')
+    if not is_valid_download_id(download_id):
+        download_id = None
+    if download_id:
+        start_download_progress(download_id, total_size, start)
+
+    def on_progress(count, current_file):
+        update_download_progress(download_id, start + count, current_file=current_file)
+
+    def generate():
+        sent = start
+        try:
+            for chunk in archive.iter_bytes(start, end, progress=on_progress if download_id else None):
+                sent += len(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"Error streaming batch download at byte {sent}: {e}")
+            raise
+        finally:
+            if download_id:
+                update_download_progress(download_id, sent, finished=True)
+
+    return Response(generate(), status=status, mimetype='application/zip', headers=headers, direct_passthrough=True)
+
+@admin_bp.route('/batch-download/progress/<download_id>')
+def batch_download_progress(download_id):
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    progress = get_download_progress(download_id)
+    if not progress:
+        return jsonify({'error': 'Unknown download'}), 404
+    return jsonify(progress)
+
+@admin_bp.route('/api/backups')
+def api_backups():
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        backups = list_backups()
+        backups.reverse()  # newest first
+        return jsonify({'success': True, 'backups': backups})
+    except Exception as e:
+        print(f"Error listing backups: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/backups/create', methods=['POST'])
+def create_backup_route():
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    full = bool(data.get('full'))
+    
+    try:
+        # Backups can take minutes on a large gallery, so they run on the job queue
+        job = enqueue_job('create_backup', {'full': full}, user_identifier=sso_user_email or 'admin', max_attempts=1)
+        log_info('system', f"{'Full' if full else 'Incremental'} backup queued", details={'job_id': job.id})
+        return jsonify({'success': True, 'job_id': job.id})
+    except Exception as e:
+        db.session.rollback()
+        log_error('system', f'Error queueing backup: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/backups/<backup_id>/download')
+def download_backup(backup_id):
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return "Unauthorized", 401
+    
+    archive_path = get_backup_archive_path(backup_id)
+    if not archive_path:
+        return "Backup not found", 404
+    
+    return send_file(
+        os.path.abspath(archive_path),
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=f"wedding_gallery_{backup_id}.zip",
+        conditional=True
+    )
+
+@admin_bp.route('/backups/<backup_id>/restore', methods=['POST'])
+def restore_backup_route(backup_id):
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    if data.get('confirmation') != 'RESTORE':
+        return jsonify({'error': 'Invalid confirmation. Please type "RESTORE" to confirm.'}), 400
+    
+    if not get_backup_archive_path(backup_id):
+        return jsonify({'error': 'Backup not found'}), 404
+    
+    try:
+        result = restore_backup(backup_id, prune=bool(data.get('prune')))
+        log_info('system', f'Backup {backup_id} restored', details=result)
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
+        log_exception('system', f'Error restoring backup {backup_id}', exception=e)
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/system-reset', methods=['POST'])
 def system_reset():
     # Check for SSO session first
@@ -638,10 +646,17 @@ def system_reset():
         Message.query.delete()
         Comment.query.delete()
         Like.query.delete()
+        PhotoTag.query.delete()
+        Tag.query.delete()
         Photo.query.delete()
         GuestbookEntry.query.delete()
-        Settings.query.delete()
+        SlideshowActivity.query.delete()
+        # Keep the version row so other processes notice the reset and reload
+        Settings.query.filter(Settings.key != SETTINGS_VERSION_KEY).delete(synchronize_session=False)
+        Settings.bump_version()
         db.session.commit()
+        Settings.invalidate_cache()
+        clear_dashboard_stats_cache()
         
         # Delete all uploaded files
         upload_folders = [
@@ -651,7 +666,9 @@ def system_reset():
             current_app.config['PHOTOBOOTH_FOLDER'],
             current_app.config['GUESTBOOK_UPLOAD_FOLDER'],
             current_app.config['MESSAGE_UPLOAD_FOLDER'],
-            current_app.config['BORDER_FOLDER']
+            current_app.config['BORDER_FOLDER'],
+            current_app.config['DERIVATIVE_FOLDER'],
+            current_app.config['RENDITION_FOLDER']
         ]
         
         for folder in upload_folders:
@@ -858,10 +875,15 @@ def delete_photo(photo_id):
             os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename))
     except:
         pass
+    delete_image_derivatives(photo)
+    delete_renditions('photobooth' if photo.is_photobooth else 'photo', photo.filename)
+    clear_photo_tags(photo)
     
     # Delete from database
+    set_activity_active('photo', photo.id, False)
     db.session.delete(photo)
     db.session.commit()
+    clear_dashboard_stats_cache()
     
     return redirect(url_for('admin.admin'))
 
@@ -884,7 +906,9 @@ def delete_guestbook_entry(entry_id):
             os.remove(os.path.join(current_app.config['GUESTBOOK_UPLOAD_FOLDER'], entry.photo_filename))
         except:
             pass
+        delete_renditions('guestbook', entry.photo_filename)
     
+    set_activity_active('guestbook', entry.id, False)
     db.session.delete(entry)
     db.session.commit()
     
@@ -903,6 +927,7 @@ def toggle_message_visibility(message_id):
     
     message = Message.query.get_or_404(message_id)
     message.is_hidden = not message.is_hidden
+    set_activity_active('message', message.id, not message.is_hidden)
     db.session.commit()
     
     return redirect(url_for('admin.admin'))
@@ -926,7 +951,9 @@ def delete_message(message_id):
             os.remove(os.path.join(current_app.config['MESSAGE_UPLOAD_FOLDER'], message.photo_filename))
         except:
             pass
+        delete_renditions('message', message.photo_filename)
     
+    set_activity_active('message', message.id, False)
     db.session.delete(message)
     db.session.commit()
     
@@ -945,6 +972,8 @@ def toggle_message_comment_visibility(comment_id):
     
     comment = MessageComment.query.get_or_404(comment_id)
     comment.is_hidden = not comment.is_hidden
+    # comment_count only tracks visible comments
+    comment.message.comment_count = Message.comment_count + (-1 if comment.is_hidden else 1)
     db.session.commit()
     
     return redirect(url_for('admin.admin'))
@@ -961,6 +990,8 @@ def delete_message_comment(comment_id):
         return "Unauthorized", 401
     
     comment = MessageComment.query.get_or_404(comment_id)
+    if not comment.is_hidden:
+        comment.message.comment_count = Message.comment_count - 1
     db.session.delete(comment)
     db.session.commit()
     
@@ -1026,6 +1057,7 @@ def save_settings():
         Settings.set('email_imap_username', email_data.get('imap_username', ''))
         Settings.set('email_imap_password', email_data.get('imap_password', ''))
         Settings.set('email_monitor_email', email_data.get('monitor_email', ''))
+        notify_email_monitor()
     
     # Save Immich settings
     if 'immich_settings' in data:
@@ -1084,6 +1116,7 @@ def save_settings():
     if 'timezone_settings' in data:
         timezone_data = data['timezone_settings']
         Settings.set('timezone_settings', json.dumps(timezone_data))
+        clear_timezone_cache()
     
     # Save slideshow settings
     if 'slideshow_settings' in data:
@@ -1134,7 +1167,9 @@ def start_email_monitor_route():
         return "Unauthorized", 401
     
     try:
-        start_email_monitor()
+        if start_email_monitor() is None:
+            # Another process holds the leader lease; its monitor picks up new settings on its own
+            return jsonify({'success': True, 'message': 'Email monitor runs in the background service leader and will pick up the settings shortly'})
         return jsonify({'success': True, 'message': 'Email monitor started successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error starting email monitor: {str(e)}'})
@@ -1151,11 +1186,31 @@ def sync_immich_route():
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
     try:
-        result = sync_all_to_immich()
-        return jsonify({'success': True, 'message': result})
+        # A bulk sync can take a long time, so it runs on the job queue; only one at a time
+        job = MediaJob.query.filter(
+            MediaJob.job_type == 'immich_bulk_sync',
+            MediaJob.status.in_(['pending', 'running'])
+        ).first()
+        if job is None:
+            job = enqueue_job('immich_bulk_sync', user_identifier=sso_user_email or 'admin', max_attempts=1)
+        return jsonify({'success': True, 'message': f'Immich sync running in the background (job #{job.id})', 'job_id': job.id})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
+@admin_bp.route('/api/immich-sync-stats')
+def api_immich_sync_stats():
+    # Check for SSO session first
+    sso_user_email = session.get('sso_user_email')
+    sso_user_domain = session.get('sso_user_domain')
+    admin_key = request.args.get('key', '')
+    
+    # Verify admin access
+    if not verify_admin_access(admin_key, sso_user_email, sso_user_domain):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify({'success': True, **get_immich_sync_stats()})
+
 @admin_bp.route('/notification-users')
 def notification_users():
     # Check for SSO session first
@@ -1209,27 +1264,14 @@ def send_admin_notification():
             )
             db.session.add(notification)
             db.session.commit()
+            publish_notification(notification)
             
-            # The frontend will pick this up when it polls for notifications
             return jsonify({'success': True, 'message': f'Notification sent to {user.user_name}'})
         
         else:
             # Send mass notification
-            users = NotificationUser.query.filter_by(notifications_enabled=True).all()
-            sent_count = 0
-            
-            for user in users:
-                # Create notification in database for each user
-                notification = Notification(
-                    user_identifier=user.user_identifier,
-                    title=title,
-                    message=message,
-                    notification_type='admin'
-                )
-                db.session.add(notification)
-                sent_count += 1
-            
-            db.session.commit()
+            broadcast = send_broadcast_notification(title, message)
+            sent_count = broadcast.recipient_count
             
             return jsonify({
                 'success': True, 
@@ -1610,10 +1652,18 @@ def database_maintenance():
         # Run maintenance task
         success = maintenance_task()
         
+        # Backfill responsive image sizes for older uploads
+        derivatives_generated = generate_missing_derivatives()
+        
+        # Resync the full-text search index with the source tables
+        search_index_rebuilt = rebuild_search_index()
+        
         if success:
             return jsonify({
                 'success': True,
-                'message': 'Database maintenance completed successfully'
+                'message': 'Database maintenance completed successfully',
+                'derivatives_generated': derivatives_generated,
+                'search_index_rebuilt': search_index_rebuilt
             })
         else:
             return jsonify({
@@ -1,10 +1,14 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 import secrets
 from app.models.photo import Photo, Comment, Like
 from app.models.messages import Message, MessageComment, MessageLike
 from app.models.notifications import Notification, NotificationUser
 from app import db
-from app.utils.notification_utils import create_notification_with_push
+from app.utils.notification_utils import (create_notification_with_push, serialize_notifications, get_unread_notifications,
+                                          publish_notifications_read, notification_event_stream)
+from app.utils.event_hub import parse_last_event_id
+from app.utils.job_queue import get_user_jobs, serialize_job
+from app.utils.search_utils import search_all
 from datetime import datetime, date
 import json
 
@@ -83,6 +87,8 @@ def add_comment(photo_id):
         content=content
     )
     db.session.add(comment)
+    # Increment in SQL so concurrent comments are not lost
+    photo.comment_count = Photo.comment_count + 1
     db.session.commit()
     
     # Create database notification for the photo uploader if someone else commented
@@ -192,6 +198,8 @@ def add_message_comment(message_id):
         content=content
     )
     db.session.add(comment)
+    # Increment in SQL so concurrent comments are not lost
+    message.comment_count = Message.comment_count + 1
     db.session.commit()
     
     # Create database notification for the message author if someone else commented
@@ -235,28 +243,28 @@ def check_notifications():
         return jsonify({'notifications': [], 'count': 0})
     
     # Get unread notifications
-    notifications = Notification.query.filter_by(
-        user_identifier=user_identifier,
-        is_read=False
-    ).order_by(Notification.created_at.desc()).limit(10).all()
-    
-    notification_list = []
-    for notification in notifications:
-        notification_list.append({
-            'id': notification.id,
-            'title': notification.title,
-            'message': notification.message,
-            'type': notification.notification_type,
-            'created_at': notification.created_at.strftime('%B %d, %Y at %I:%M %p'),
-            'content_type': notification.content_type,
-            'content_id': notification.content_id
-        })
+    notification_list = serialize_notifications(get_unread_notifications(user_identifier))
     
     return jsonify({
         'notifications': notification_list,
         'count': len(notification_list)
     })
 
+@api_bp.route('/notifications/stream')
+def notification_stream():
+    """Server-Sent Events stream of the user's notifications, replacing periodic checks"""
+    user_identifier = request.cookies.get('user_identifier', '')
+    if not user_identifier:
+        # 204 tells EventSource not to reconnect
+        return '', 204
+    
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    return Response(
+        stream_with_context(notification_event_stream(user_identifier, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api_bp.route('/notifications/mark-read', methods=['POST'])
 def mark_notification_read():
     user_identifier = request.cookies.get('user_identifier', '')
@@ -275,6 +283,7 @@ def mark_notification_read():
         notification.is_read = True
         notification.read_at = datetime.utcnow()
         db.session.commit()
+        publish_notifications_read(user_identifier, [notification.id])
         return jsonify({'success': True})
     
     return jsonify({'success': False, 'error': 'Notification not found'})
@@ -297,6 +306,7 @@ def mark_all_notifications_read():
         notification.read_at = datetime.utcnow()
     
     db.session.commit()
+    publish_notifications_read(user_identifier)
     return jsonify({'success': True, 'count': len(unread_notifications)})
 
 @api_bp.route('/notifications/delete', methods=['POST'])
@@ -316,6 +326,8 @@ def delete_notification():
     if notification:
         db.session.delete(notification)
         db.session.commit()
+        # Deleted notifications drop out of the unread lists on open pages too
+        publish_notifications_read(user_identifier, [notification_id])
         return jsonify({'success': True})
     
     return jsonify({'success': False, 'error': 'Notification not found'})
@@ -443,4 +455,31 @@ def unregister_push_subscription():
     except Exception as e:
         print(f"Error unregistering push subscription: {e}")
         db.session.rollback()
-        return jsonify({'success': False, 'message': str(e)}) 
\ No newline at end of file
+        return jsonify({'success': False, 'message': str(e)}) 
+
+@api_bp.route('/jobs')
+def my_jobs():
+    """Processing status of the current visitor's recent uploads"""
+    user_identifier = request.cookies.get('user_identifier', '')
+    if not user_identifier:
+        return jsonify({'jobs': [], 'pending': 0})
+    
+    jobs = get_user_jobs(user_identifier)
+    pending = len([job for job in jobs if job.status in ('pending', 'running')])
+    
+    return jsonify({
+        'jobs': [serialize_job(job) for job in jobs],
+        'pending': pending
+    })
+
+@api_bp.route('/search')
+def search():
+    """Ranked full-text search across photos, guestbook entries and messages"""
+    query = request.args.get('q', '').strip()
+    types = [t for t in request.args.get('types', '').split(',') if t] or None
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    
+    if not query:
+        return jsonify({'results': []})
+    
+    return jsonify({'results': search_all(query, types, limit)})
@@ -5,8 +5,8 @@ import os
 from app.models.guestbook import GuestbookEntry
 from app import db
 from app.utils.file_utils import allowed_file
-from app.utils.settings_utils import get_immich_settings
-from app.utils.immich_utils import sync_file_to_immich
+from app.utils.media_jobs import enqueue_immich_sync
+from app.utils.slideshow_utils import record_activity, publish_activity
 from app.utils.captcha_utils import get_captcha_settings, validate_captcha, generate_captcha
 
 guestbook_bp = Blueprint('guestbook', __name__)
@@ -58,20 +58,21 @@ def sign_guestbook():
                 photo_filename=photo_filename
             )
             db.session.add(entry)
+            record_activity('guestbook', entry)
             db.session.commit()
+            publish_activity('guestbook', entry.id)
             
-            # Sync guestbook photo to Immich if enabled
+            # Queue guestbook photo sync to Immich if enabled
             if photo_filename:
                 try:
-                    immich_settings = get_immich_settings()
-                    if immich_settings['enabled'] and immich_settings['sync_guestbook']:
-                        file_path = os.path.join(current_app.config['GUESTBOOK_UPLOAD_FOLDER'], photo_filename)
-                        description = f"Guestbook photo by {entry.name} from {entry.location}"
-                        if entry.message:
-                            description += f" - {entry.message[:100]}"
-                        sync_file_to_immich(file_path, photo_filename, description)
+                    file_path = os.path.join(current_app.config['GUESTBOOK_UPLOAD_FOLDER'], photo_filename)
+                    description = f"Guestbook photo by {entry.name} from {entry.location}"
+                    if entry.message:
+                        description += f" - {entry.message[:100]}"
+                    enqueue_immich_sync(file_path, photo_filename, description, 'sync_guestbook',
+                                        user_identifier=request.cookies.get('user_identifier'))
                 except Exception as e:
-                    print(f"Error syncing guestbook photo to Immich: {e}")
+                    print(f"Error queueing guestbook photo sync to Immich: {e}")
             
             # Save user name in cookie
             resp = make_response(redirect(url_for('guestbook.guestbook')))
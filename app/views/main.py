@@ -4,8 +4,11 @@ import secrets
 from app.models.photo import Photo
 from app.models.settings import Settings
 from app.utils.settings_utils import get_email_settings
-from app.utils.db_optimization import db_optimizer, cached_query
-from app import db
+from app.utils.db_optimization import db_optimizer
+from app.utils.image_utils import get_photo_thumbnail_url, get_photo_srcset
+from app.utils.pagination import keyset_paginate
+from app.utils.search_utils import apply_photo_search
+from app.utils.tag_utils import get_tag_counts, filter_photos_by_tag
 
 main_bp = Blueprint('main', __name__)
 
@@ -47,57 +50,17 @@ def index():
     media_filter = request.args.get('media_type', '')
     tag_filter = request.args.get('tag', '')
     
-    # For lazy loading, we'll only load initial photos on the server
-    # The rest will be loaded via JavaScript API calls
-    page = request.args.get('page', 1, type=int)
-    per_page = 20  # Increased for better performance
-    
-    # Build query with filters using optimized approach
-    photos_query = Photo.query.options(
-        db.joinedload(Photo.comments)
-    )
-    
-    # Apply search filter with optimized LIKE queries
-    if search_query:
-        search_term = f'%{search_query}%'
-        photos_query = photos_query.filter(
-            db.or_(
-                Photo.uploader_name.ilike(search_term),
-                Photo.description.ilike(search_term),
-                Photo.tags.ilike(search_term)
-            )
-        )
+    # For lazy loading, we'll only load the first page on the server
+    # The rest will be loaded via JavaScript API calls using the returned cursor
+    per_page = 20
+    photos_query = _build_photos_query(search_query, media_filter, tag_filter)
+    photos_page = keyset_paginate(photos_query, Photo.upload_date, Photo.id,
+                                  after=request.args.get('after'), limit=per_page)
+    photos = photos_page['items']
+    next_cursor = photos_page['next_cursor']
     
-    # Apply media type filter
-    if media_filter:
-        if media_filter == 'photos':
-            photos_query = photos_query.filter(Photo.media_type == 'image')
-        elif media_filter == 'videos':
-            photos_query = photos_query.filter(Photo.media_type == 'video')
-        elif media_filter == 'photobooth':
-            photos_query = photos_query.filter(Photo.is_photobooth == True)
-    
-    # Apply tag filter
-    if tag_filter:
-        photos_query = photos_query.filter(Photo.tags.ilike(f'%{tag_filter}%'))
-    
-    # Order by upload date (newest first) - this uses the optimized index
-    photos_query = photos_query.order_by(Photo.upload_date.desc())
-    photos = photos_query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    # Get all unique tags for filter dropdown with caching
-    @cached_query(ttl=1800)  # Cache for 30 minutes
-    def get_all_tags():
-        all_tags = set()
-        # Use a more efficient query to get tags
-        tag_photos = Photo.query.filter(Photo.tags.isnot(None)).with_entities(Photo.tags).all()
-        for photo in tag_photos:
-            if photo.tags:
-                tags = [tag.strip() for tag in photo.tags.split(',') if tag.strip()]
-                all_tags.update(tags)
-        return sorted(list(all_tags))
-    
-    all_tags = get_all_tags()
+    # Tags with precomputed photo counts for the filter dropdown
+    all_tags = get_tag_counts()
     
     # Get email settings for the welcome modal
     email_settings = get_email_settings()
@@ -106,6 +69,7 @@ def index():
     if not request.cookies.get('user_identifier'):
         resp = make_response(render_template('index.html', 
                                           photos=photos, 
+                                          next_cursor=next_cursor,
                                           user_name=user_name,
                                           welcome_settings=welcome_settings,
                                           show_modal=show_modal,
@@ -119,6 +83,7 @@ def index():
     
     return render_template('index.html', 
                          photos=photos, 
+                         next_cursor=next_cursor,
                          user_name=user_name,
                          welcome_settings=welcome_settings,
                          show_modal=show_modal,
@@ -128,32 +93,10 @@ def index():
                          tag_filter=tag_filter,
                          all_tags=all_tags)
 
-@main_bp.route('/api/photos')
-def api_photos():
-    """API endpoint for lazy loading photos with optimized queries"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)  # Increased for better performance
-    
-    # Get search parameters
-    search_query = request.args.get('search', '').strip()
-    media_filter = request.args.get('media_type', '')
-    tag_filter = request.args.get('tag', '')
-    
-    # Build query with filters using optimized approach
-    photos_query = Photo.query.options(
-        db.joinedload(Photo.comments)
-    )
-    
-    # Apply search filter with optimized LIKE queries
-    if search_query:
-        search_term = f'%{search_query}%'
-        photos_query = photos_query.filter(
-            db.or_(
-                Photo.uploader_name.ilike(search_term),
-                Photo.description.ilike(search_term),
-                Photo.tags.ilike(search_term)
-            )
-        )
+def _build_photos_query(search_query, media_filter, tag_filter):
+    """Build the gallery query for the given search and filter parameters"""
+    # Full-text search (FTS5 when available, LIKE otherwise)
+    photos_query = apply_photo_search(Photo.query.filter(Photo.is_pending == False), search_query)
     
     # Apply media type filter
     if media_filter:
@@ -164,21 +107,58 @@ def api_photos():
         elif media_filter == 'photobooth':
             photos_query = photos_query.filter(Photo.is_photobooth == True)
     
-    # Apply tag filter
+    # Apply exact tag filter through the tag index
     if tag_filter:
-        photos_query = photos_query.filter(Photo.tags.ilike(f'%{tag_filter}%'))
+        photos_query = filter_photos_by_tag(photos_query, tag_filter)
+    
+    return photos_query
+
+@main_bp.route('/api/photos')
+def api_photos():
+    """API endpoint for lazy loading photos.
+
+    Pass `after=<cursor>` (the previous response's next_cursor) for keyset pagination;
+    the legacy `page` parameter still uses OFFSET pagination. The total is only
+    counted when `include_total=1` is given.
+    """
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
     
-    # Order by upload date (newest first) - this uses the optimized index
-    photos_query = photos_query.order_by(Photo.upload_date.desc())
-    photos = photos_query.paginate(page=page, per_page=per_page, error_out=False)
+    # Get search parameters
+    search_query = request.args.get('search', '').strip()
+    media_filter = request.args.get('media_type', '')
+    tag_filter = request.args.get('tag', '')
+    
+    photos_query = _build_photos_query(search_query, media_filter, tag_filter)
+    
+    if 'page' in request.args and 'after' not in request.args:
+        # Legacy offset pagination for older clients
+        page = request.args.get('page', 1, type=int)
+        photos_query = photos_query.order_by(Photo.upload_date.desc(), Photo.id.desc())
+        pagination = photos_query.paginate(page=page, per_page=per_page, error_out=False, count=include_total)
+        photos_page = {
+            'items': pagination.items,
+            'has_next': pagination.has_next if include_total else len(pagination.items) == per_page,
+            'next_cursor': None,
+            'total': pagination.total
+        }
+    else:
+        page = None
+        photos_page = keyset_paginate(photos_query, Photo.upload_date, Photo.id,
+                                      after=request.args.get('after'), limit=per_page,
+                                      include_total=include_total)
     
     # Convert photos to JSON-serializable format
     photos_data = []
-    for photo in photos.items:
+    for photo in photos_page['items']:
         photo_data = {
             'id': photo.id,
             'filename': photo.filename,
             'thumbnail_filename': photo.thumbnail_filename,
+            'thumbnail_url': get_photo_thumbnail_url(photo),
+            'srcset': get_photo_srcset(photo),
+            'width': photo.width,
+            'height': photo.height,
             'uploader_name': photo.uploader_name,
             'upload_date': photo.upload_date.strftime('%b %d, %Y'),
             'description': photo.description,
@@ -187,20 +167,23 @@ def api_photos():
             'is_photobooth': photo.is_photobooth,
             'duration': photo.duration,
             'likes': photo.likes,
-            'comments_count': len(photo.comments),
+            'comments_count': photo.comment_count or 0,
             'url': f'/photo/{photo.id}'
         }
         photos_data.append(photo_data)
     
-    return jsonify({
+    response = {
         'photos': photos_data,
-        'has_next': photos.has_next,
-        'has_prev': photos.has_prev,
-        'page': photos.page,
-        'pages': photos.pages,
-        'total': photos.total,
-        'per_page': photos.per_page
-    })
+        'has_next': photos_page['has_next'],
+        'next_cursor': photos_page['next_cursor'],
+        'per_page': per_page
+    }
+    if page is not None:
+        response['page'] = page
+    if include_total:
+        response['total'] = photos_page['total']
+    
+    return jsonify(response)
 
 @main_bp.route('/photo/<int:photo_id>')
 def view_photo(photo_id):
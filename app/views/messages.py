@@ -6,9 +6,9 @@ import os
 from app.models.messages import Message, MessageComment, MessageLike
 from app import db
 from app.utils.file_utils import allowed_file
-from app.utils.settings_utils import get_immich_settings
-from app.utils.immich_utils import sync_file_to_immich
+from app.utils.media_jobs import enqueue_immich_sync
 from app.utils.notification_utils import create_notification_with_push
+from app.utils.slideshow_utils import record_activity, publish_activity
 from app.utils.captcha_utils import get_captcha_settings, validate_captcha, generate_captcha
 
 messages_bp = Blueprint('messages', __name__)
@@ -77,20 +77,21 @@ def new_message():
                 photo_filename=photo_filename
             )
             db.session.add(message)
+            record_activity('message', message)
             db.session.commit()
+            publish_activity('message', message.id)
             
-            # Sync message photo to Immich if enabled
+            # Queue message photo sync to Immich if enabled
             if photo_filename:
                 try:
-                    immich_settings = get_immich_settings()
-                    if immich_settings['enabled'] and immich_settings['sync_messages']:
-                        file_path = os.path.join(current_app.config['MESSAGE_UPLOAD_FOLDER'], photo_filename)
-                        description = f"Message photo by {message.author_name}"
-                        if message.content:
-                            description += f" - {message.content[:100]}"
-                        sync_file_to_immich(file_path, photo_filename, description)
+                    file_path = os.path.join(current_app.config['MESSAGE_UPLOAD_FOLDER'], photo_filename)
+                    description = f"Message photo by {message.author_name}"
+                    if message.content:
+                        description += f" - {message.content[:100]}"
+                    enqueue_immich_sync(file_path, photo_filename, description, 'sync_messages',
+                                        user_identifier=user_identifier)
                 except Exception as e:
-                    print(f"Error syncing message photo to Immich: {e}")
+                    print(f"Error queueing message photo sync to Immich: {e}")
             
             # Save user name in cookie
             resp = make_response(redirect(url_for('messages.message_board')))
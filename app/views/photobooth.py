@@ -5,8 +5,9 @@ import os
 import secrets
 from app.models.photo import Photo
 from app import db
-from app.utils.settings_utils import get_immich_settings
-from app.utils.immich_utils import sync_file_to_immich
+from app.utils.media_jobs import enqueue_photo_processing
+from app.utils.slideshow_utils import record_activity, publish_activity
+from app.utils.tag_utils import set_photo_tags
 from app.models.settings import Settings
 import json
 
@@ -62,25 +63,21 @@ def save_photobooth_photo():
                 uploader_name=uploader_name,
                 uploader_identifier=user_identifier,
                 description=description,
-                tags=tags,
                 media_type='image',
                 is_photobooth=True
             )
             
             db.session.add(photo)
+            set_photo_tags(photo, tags)
+            record_activity('photo', photo)
             db.session.commit()
+            publish_activity('photo', photo.id)
             
-            # Sync to Immich if enabled
+            # Queue derivatives and Immich sync off the request path
             try:
-                immich_settings = get_immich_settings()
-                if immich_settings['enabled'] and immich_settings['sync_photobooth']:
-                    file_path = os.path.join(current_app.config['PHOTOBOOTH_FOLDER'], photo.filename)
-                    description = f"Photobooth photo by {photo.uploader_name}"
-                    if photo.description:
-                        description += f" - {photo.description}"
-                    sync_file_to_immich(file_path, photo.filename, description)
+                enqueue_photo_processing(photo, user_identifier)
             except Exception as e:
-                print(f"Error syncing photobooth to Immich: {e}")
+                print(f"Error queueing photobooth processing: {e}")
             
             # Save user name and identifier in cookies
             resp = jsonify({
@@ -1,15 +1,18 @@
-from flask import Blueprint, render_template, jsonify, request
-from app.models.photo import Photo
-from app.models.guestbook import GuestbookEntry
-from app.models.messages import Message
-from app.models.slideshow import SlideshowSettings, SlideshowActivity
+from flask import Blueprint, render_template, jsonify, request, Response, stream_with_context, send_file, abort
+from app.models.slideshow import SlideshowSettings
 from app.utils.db_optimization import cached_query
+from app.utils.slideshow_utils import (get_recent_activities, parse_activity_cursor, activity_cursor, latest_activity_id,
+                                       wait_for_activity, slideshow_event_stream, get_rendition_path,
+                                       build_prefetch_manifest, SLIDESHOW_MAX_WAIT, SLIDESHOW_PREFETCH_COUNT)
 from app import db
 from datetime import datetime, timedelta
 import json
+import os
 
 slideshow_bp = Blueprint('slideshow', __name__)
 
+SLIDESHOW_RENDITION_MAX_AGE = 365 * 24 * 60 * 60  # seconds
+
 @slideshow_bp.route('/slideshow')
 def slideshow():
     """Main slideshow page"""
@@ -18,93 +21,73 @@ def slideshow():
     
     return render_template('slideshow.html', settings=settings)
 
+def _activity_filters():
+    return {
+        'show_photos': request.args.get('show_photos', 'true') == 'true',
+        'show_guestbook': request.args.get('show_guestbook', 'true') == 'true',
+        'show_messages': request.args.get('show_messages', 'true') == 'true'
+    }
+
 @slideshow_bp.route('/api/slideshow/activities')
 def get_slideshow_activities():
-    """API endpoint to get activities for slideshow"""
+    """API endpoint to get activities for slideshow.
+
+    Without `since` this returns the newest activities in the time window. With the
+    `cursor` from a previous response as `since` it returns only newer activities,
+    oldest first, waiting up to `wait` seconds for some to arrive (long-poll).
+    `prefetch` lists the images of the first `prefetch` slides so the client can load
+    them before they are shown.
+    """
     # Get parameters
     hours_back = request.args.get('hours', 24, type=int)
     max_activities = request.args.get('max_activities', 50, type=int)
-    show_photos = request.args.get('show_photos', 'true') == 'true'
-    show_guestbook = request.args.get('show_guestbook', 'true') == 'true'
-    show_messages = request.args.get('show_messages', 'true') == 'true'
+    filters = _activity_filters()
     
     since_time = datetime.utcnow() - timedelta(hours=hours_back)
+    cursor = parse_activity_cursor(request.args.get('since'))
     
-    activities = []
-    
-    # Get recent photos if enabled
-    if show_photos:
-        photos = Photo.query.filter(
-            Photo.upload_date >= since_time
-        ).order_by(Photo.upload_date.desc()).limit(max_activities).all()
-        
-        for photo in photos:
-            activities.append({
-                'type': 'photo',
-                'id': photo.id,
-                'content': {
-                    'filename': photo.filename,
-                    'uploader_name': photo.uploader_name,
-                    'description': photo.description,
-                    'upload_date': photo.upload_date.isoformat(),
-                    'media_type': photo.media_type,
-                    'is_photobooth': photo.is_photobooth
-                },
-                'timestamp': photo.upload_date.isoformat(),
-                'summary': f"New photo uploaded by {photo.uploader_name}"
-            })
-    
-    # Get recent guestbook entries if enabled
-    if show_guestbook:
-        guestbook_entries = GuestbookEntry.query.filter(
-            GuestbookEntry.created_at >= since_time
-        ).order_by(GuestbookEntry.created_at.desc()).limit(max_activities).all()
-        
-        for entry in guestbook_entries:
-            activities.append({
-                'type': 'guestbook',
-                'id': entry.id,
-                'content': {
-                    'name': entry.name,
-                    'message': entry.message,
-                    'location': entry.location,
-                    'photo_filename': entry.photo_filename,
-                    'created_at': entry.created_at.isoformat()
-                },
-                'timestamp': entry.created_at.isoformat(),
-                'summary': f"Guestbook entry from {entry.name}"
-            })
-    
-    # Get recent messages if enabled
-    if show_messages:
-        messages = Message.query.filter(
-            Message.created_at >= since_time,
-            Message.is_hidden == False
-        ).order_by(Message.created_at.desc()).limit(max_activities).all()
-        
-        for message in messages:
-            activities.append({
-                'type': 'message',
-                'id': message.id,
-                'content': {
-                    'author_name': message.author_name,
-                    'content': message.content,
-                    'photo_filename': message.photo_filename,
-                    'created_at': message.created_at.isoformat()
-                },
-                'timestamp': message.created_at.isoformat(),
-                'summary': f"Message from {message.author_name}"
-            })
-    
-    # Sort by timestamp (newest first)
-    activities.sort(key=lambda x: x['timestamp'], reverse=True)
+    if cursor is None:
+        activities, cursor = get_recent_activities(since_time, max_activities, **filters)
+        has_more = False
+    else:
+        wait = min(max(request.args.get('wait', 0, type=int), 0), SLIDESHOW_MAX_WAIT)
+        activities, has_more = wait_for_activity(cursor, since_time, wait, max_activities, **filters)
     
     return jsonify({
         'activities': activities,
         'total_count': len(activities),
+        'cursor': activity_cursor(activities, cursor),
+        'has_more': has_more,
+        'prefetch': build_prefetch_manifest(activities, request.args.get('prefetch', SLIDESHOW_PREFETCH_COUNT, type=int)),
         'last_updated': datetime.utcnow().isoformat()
     })
 
+@slideshow_bp.route('/slideshow/rendition/<kind>/<size>/<filename>')
+def slideshow_rendition(kind, size, filename):
+    """Slideshow-sized copy of an uploaded image, generated on first request and cached"""
+    path = get_rendition_path(kind, size, filename)
+    if path is None:
+        abort(404)
+    # Upload filenames are never reused, so browsers may keep renditions for good
+    return send_file(os.path.abspath(path), max_age=SLIDESHOW_RENDITION_MAX_AGE)
+
+@slideshow_bp.route('/api/slideshow/stream')
+def slideshow_stream():
+    """Server-Sent Events stream of activities added after the `since` cursor"""
+    hours_back = request.args.get('hours', 24, type=int)
+    max_activities = request.args.get('max_activities', 50, type=int)
+    cursor = parse_activity_cursor(request.headers.get('Last-Event-ID'))
+    if cursor is None:
+        cursor = parse_activity_cursor(request.args.get('since'))
+    if cursor is None:
+        cursor = latest_activity_id()
+    
+    return Response(
+        stream_with_context(slideshow_event_stream(cursor, hours_back, max_activities, **_activity_filters())),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @slideshow_bp.route('/api/slideshow/settings', methods=['GET', 'POST'])
 def slideshow_settings():
     """API endpoint for slideshow settings"""
@@ -5,9 +5,11 @@ import secrets
 import os
 from app.models.photo import Photo
 from app import db
-from app.utils.file_utils import allowed_file, is_video, is_image, get_video_duration, create_video_thumbnail
-from app.utils.settings_utils import get_email_settings, get_immich_settings
-from app.utils.immich_utils import sync_file_to_immich
+from app.utils.file_utils import allowed_file, is_video, is_image
+from app.utils.settings_utils import get_email_settings
+from app.utils.media_jobs import enqueue_photo_processing
+from app.utils.slideshow_utils import record_activity, publish_activity
+from app.utils.tag_utils import set_photo_tags
 from app.utils.captcha_utils import is_captcha_enabled, validate_captcha, generate_captcha, get_captcha_settings
 from app.utils.system_logger import log_upload_event, log_error, log_exception
 
@@ -41,13 +43,6 @@ def upload():
             return redirect(request.url)
         
         if file and allowed_file(file.filename):
-            # Log successful upload start
-            log_upload_event(f"Upload started: {file.filename}", 
-                           user_identifier=user_identifier,
-                           details={'filename': file.filename, 'uploader_name': uploader_name})
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            
             uploader_name = request.form.get('uploader_name', 'Anonymous').strip() or 'Anonymous'
             description = request.form.get('description', '')
             tags = request.form.get('tags', '').strip()
@@ -57,84 +52,53 @@ def upload():
             if not user_identifier:
                 user_identifier = secrets.token_hex(16)
             
+            # Log successful upload start
+            log_upload_event(f"Upload started: {file.filename}", 
+                           user_identifier=user_identifier,
+                           details={'filename': file.filename, 'uploader_name': uploader_name})
+            filename = secure_filename(file.filename)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"{timestamp}_{filename}"
+            
             if is_video(filename):
-                # Handle video upload
-                filename = f"{timestamp}_{filename}"
+                # Handle video upload - duration check and thumbnail run in the job queue
                 filepath = os.path.join(current_app.config['VIDEO_FOLDER'], filename)
                 file.save(filepath)
-                
-                # Check video duration
-                duration = get_video_duration(filepath)
-                if duration and duration > current_app.config['MAX_VIDEO_DURATION']:
-                    os.remove(filepath)
-                    log_error('upload', f'Video too long: {duration}s > {current_app.config["MAX_VIDEO_DURATION"]}s', 
-                             user_identifier=user_identifier,
-                             details={'filename': file.filename, 'duration': duration})
-                    return render_template('upload.html', 
-                                         user_name=request.cookies.get('user_name', ''),
-                                         error=f'Video must be {current_app.config["MAX_VIDEO_DURATION"]} seconds or less')
-                
-                # Create thumbnail
-                thumbnail_filename = f"thumb_{timestamp}_{os.path.splitext(filename)[0]}.jpg"
-                thumbnail_path = os.path.join(current_app.config['THUMBNAIL_FOLDER'], thumbnail_filename)
-                
-                if not create_video_thumbnail(filepath, thumbnail_path):
-                    thumbnail_filename = None
-                
-                photo = Photo(
-                    filename=filename,
-                    original_filename=file.filename,
-                    uploader_name=uploader_name,
-                    uploader_identifier=user_identifier,
-                    description=description,
-                    tags=tags,
-                    media_type='video',
-                    thumbnail_filename=thumbnail_filename,
-                    duration=duration
-                )
+                media_type = 'video'
             else:
-                # Handle image upload
-                filename = f"{timestamp}_{filename}"
+                # Handle image upload - derivatives are generated in the job queue
                 filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
                 file.save(filepath)
-                
-                photo = Photo(
-                    filename=filename,
-                    original_filename=file.filename,
-                    uploader_name=uploader_name,
-                    uploader_identifier=user_identifier,
-                    description=description,
-                    tags=tags,
-                    media_type='image'
-                )
+                media_type = 'image'
+            
+            photo = Photo(
+                filename=filename,
+                original_filename=file.filename,
+                uploader_name=uploader_name,
+                uploader_identifier=user_identifier,
+                description=description,
+                media_type=media_type,
+                # Videos stay hidden until the duration check in the job queue passes
+                is_pending=(media_type == 'video')
+            )
             
             db.session.add(photo)
+            set_photo_tags(photo, tags)
+            record_activity('photo', photo)
             db.session.commit()
+            publish_activity('photo', photo.id)
             
             # Log successful upload
             log_upload_event(f"Upload completed: {photo.filename}", 
                            user_identifier=user_identifier,
                            details={'photo_id': photo.id, 'media_type': photo.media_type, 'file_size': os.path.getsize(filepath)})
             
-            # Sync to Immich if enabled
+            # Queue thumbnailing, derivatives and Immich sync off the request path
             try:
-                immich_settings = get_immich_settings()
-                if immich_settings['enabled']:
-                    if photo.media_type == 'video' and immich_settings['sync_videos']:
-                        file_path = os.path.join(current_app.config['VIDEO_FOLDER'], photo.filename)
-                        description = f"Wedding video by {photo.uploader_name}"
-                        if photo.description:
-                            description += f" - {photo.description}"
-                        sync_file_to_immich(file_path, photo.filename, description)
-                    elif photo.media_type == 'image' and immich_settings['sync_photos']:
-                        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], photo.filename)
-                        description = f"Wedding photo by {photo.uploader_name}"
-                        if photo.description:
-                            description += f" - {photo.description}"
-                        sync_file_to_immich(file_path, photo.filename, description)
+                enqueue_photo_processing(photo, user_identifier)
             except Exception as e:
-                log_exception('immich', f"Error syncing to Immich: {e}", exception=e, user_identifier=user_identifier)
-                print(f"Error syncing to Immich: {e}")
+                log_exception('upload', f"Error queueing media processing: {e}", exception=e, user_identifier=user_identifier)
+                print(f"Error queueing media processing: {e}")
             
             # Save user name in cookie
             resp = make_response(redirect(url_for('main.index')))
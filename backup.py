@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Backup command line tool
+
+Usage:
+    python backup.py create [--full]       Incremental backup (full if none exists yet)
+    python backup.py list                  Show all backups and their chains
+    python backup.py restore [BACKUP_ID] [--prune]
+                                           Restore the latest (or given) backup
+"""
+
+import argparse
+import os
+import sys
+
+# Add the current directory to Python path so we can import the app
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.backup_utils import create_backup, list_backups, restore_backup
+
+def format_size(num_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+def main():
+    parser = argparse.ArgumentParser(description='Create, list and restore wedding gallery backups')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = subparsers.add_parser('create', help='Create a backup')
+    create_parser.add_argument('--full', action='store_true', help='Package every file instead of only changes')
+
+    subparsers.add_parser('list', help='List backups')
+
+    restore_parser = subparsers.add_parser('restore', help='Restore a backup and its chain')
+    restore_parser.add_argument('backup_id', nargs='?', help='Backup to restore (default: latest)')
+    restore_parser.add_argument('--prune', action='store_true', help='Delete media that is not in the backup')
+
+    args = parser.parse_args()
+    app = create_app()
+
+    with app.app_context():
+        try:
+            if args.command == 'create':
+                print("🔄 Creating backup...")
+                manifest = create_backup(full=args.full)
+                print(f"✅ Backup {manifest['backup_id']} created ({len(manifest['included'])} file(s) packaged)")
+
+            elif args.command == 'list':
+                backups = list_backups()
+                if not backups:
+                    print("No backups found")
+                for backup in backups:
+                    archive_note = '' if backup['archive_exists'] else '  ❌ archive missing'
+                    parent_note = f" (parent {backup['parent_id']})" if backup['parent_id'] else ''
+                    print(f"{backup['backup_id']}  {backup['type']:<11}  "
+                          f"{format_size(backup['archive_size']):>10}  "
+                          f"{backup['included_count']} packaged / {backup['file_count']} files{parent_note}{archive_note}")
+
+            elif args.command == 'restore':
+                print("🔄 Restoring backup...")
+                result = restore_backup(args.backup_id, prune=args.prune)
+                print(f"✅ Restored {result['backup_id']}: {result['restored']} restored, "
+                      f"{result['unchanged']} unchanged, {result['pruned']} pruned")
+        except Exception as e:
+            print(f"❌ Backup command failed: {e}")
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,7 @@ mkdir -p static/uploads/videos
 mkdir -p static/uploads/thumbnails
 mkdir -p static/uploads/photobooth
 mkdir -p static/uploads/borders
+mkdir -p static/uploads/derivatives
 
 # Set secure file permissions
 echo "🔒 Setting secure file permissions..."
@@ -25,6 +26,7 @@ chmod 755 static/uploads/videos
 chmod 755 static/uploads/thumbnails
 chmod 755 static/uploads/photobooth
 chmod 755 static/uploads/borders
+chmod 755 static/uploads/derivatives
 
 # Set data directory permissions
 if [ -d "/app/data" ]; then
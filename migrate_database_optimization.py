@@ -59,6 +59,8 @@ def migrate_database_optimization():
             "CREATE INDEX IF NOT EXISTS idx_message_created_at ON message(created_at DESC)",
             "CREATE INDEX IF NOT EXISTS idx_message_is_hidden ON message(is_hidden)",
             "CREATE INDEX IF NOT EXISTS idx_message_author ON message(author_name)",
+            "CREATE INDEX IF NOT EXISTS idx_message_hidden_created ON message(is_hidden, created_at DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_message_likes ON message(likes DESC)",
             
             # Guestbook indexes
             "CREATE INDEX IF NOT EXISTS idx_guestbook_created_at ON guestbook_entry(created_at DESC)",
@@ -37,6 +37,156 @@ def migrate_database():
     else:
         print("✅ tags column already exists")
     
+    # --- Image Derivative Columns Migration ---
+    derivative_columns = {
+        'derivatives': 'TEXT',
+        'width': 'INTEGER',
+        'height': 'INTEGER'
+    }
+    for column_name, column_type in derivative_columns.items():
+        if column_name not in columns:
+            print(f"Adding {column_name} column to Photo table...")
+            cursor.execute(f"ALTER TABLE photo ADD COLUMN {column_name} {column_type}")
+            print(f"✅ {column_name} column added successfully!")
+        else:
+            print(f"✅ {column_name} column already exists")
+    
+    # --- Denormalized Comment Count Migration ---
+    if 'comment_count' not in columns:
+        print("Adding comment_count column to Photo table...")
+        cursor.execute("ALTER TABLE photo ADD COLUMN comment_count INTEGER DEFAULT 0")
+        cursor.execute("""
+            UPDATE photo SET comment_count = (
+                SELECT COUNT(*) FROM comment WHERE comment.photo_id = photo.id
+            )
+        """)
+        print("✅ comment_count column added and backfilled successfully!")
+    else:
+        print("✅ comment_count column already exists")
+    
+    # --- Pending Upload Migration ---
+    if 'is_pending' not in columns:
+        print("Adding is_pending column to Photo table...")
+        cursor.execute("ALTER TABLE photo ADD COLUMN is_pending BOOLEAN DEFAULT 0")
+        print("✅ is_pending column added successfully!")
+    else:
+        print("✅ is_pending column already exists")
+    
+    cursor.execute("PRAGMA table_info(message)")
+    message_columns = [column[1] for column in cursor.fetchall()]
+    
+    if message_columns and 'comment_count' not in message_columns:
+        print("Adding comment_count column to Message table...")
+        cursor.execute("ALTER TABLE message ADD COLUMN comment_count INTEGER DEFAULT 0")
+        # Only visible comments are counted, matching what the message board shows
+        cursor.execute("""
+            UPDATE message SET comment_count = (
+                SELECT COUNT(*) FROM message_comment
+                WHERE message_comment.message_id = message.id AND message_comment.is_hidden = 0
+            )
+        """)
+        print("✅ message comment_count column added and backfilled successfully!")
+    else:
+        print("✅ message comment_count column already exists")
+    
+    # --- Immich Retry Columns Migration ---
+    cursor.execute("PRAGMA table_info(immich_sync_log)")
+    sync_log_columns = [column[1] for column in cursor.fetchall()]
+    
+    if sync_log_columns and 'next_retry_at' not in sync_log_columns:
+        print("Adding next_retry_at column to ImmichSyncLog table...")
+        cursor.execute("ALTER TABLE immich_sync_log ADD COLUMN next_retry_at DATETIME")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_immich_sync_log_next_retry_at ON immich_sync_log (next_retry_at)")
+        # Existing failures become due for retry straight away
+        cursor.execute("UPDATE immich_sync_log SET next_retry_at = CURRENT_TIMESTAMP WHERE status = 'error'")
+        print("✅ next_retry_at column added successfully!")
+    else:
+        print("✅ next_retry_at column already exists")
+    
+    if sync_log_columns and 'description' not in sync_log_columns:
+        print("Adding description column to ImmichSyncLog table...")
+        cursor.execute("ALTER TABLE immich_sync_log ADD COLUMN description TEXT")
+        print("✅ description column added successfully!")
+    else:
+        print("✅ description column already exists")
+    
+    # --- Email Response Delivery Columns Migration ---
+    cursor.execute("PRAGMA table_info(email_log)")
+    email_log_columns = [column[1] for column in cursor.fetchall()]
+    
+    delivery_columns = {
+        'response_details': 'TEXT',
+        'delivery_status': 'VARCHAR(20)',
+        'delivery_attempts': 'INTEGER DEFAULT 0',
+        'delivery_error': 'TEXT',
+        'next_delivery_at': 'DATETIME',
+        'delivered_at': 'DATETIME'
+    }
+    if email_log_columns:
+        for column_name, column_type in delivery_columns.items():
+            if column_name not in email_log_columns:
+                print(f"Adding {column_name} column to EmailLog table...")
+                cursor.execute(f"ALTER TABLE email_log ADD COLUMN {column_name} {column_type}")
+                print(f"✅ {column_name} column added successfully!")
+            else:
+                print(f"✅ {column_name} column already exists")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_email_log_next_delivery_at ON email_log (next_delivery_at)")
+    
+    # --- Slideshow Activity Feed Migration ---
+    cursor.execute("PRAGMA table_info(slideshow_activity)")
+    activity_columns = [column[1] for column in cursor.fetchall()]
+    
+    if activity_columns and 'payload' not in activity_columns:
+        print("Adding payload column to SlideshowActivity table...")
+        cursor.execute("ALTER TABLE slideshow_activity ADD COLUMN payload TEXT")
+        print("✅ payload column added successfully!")
+    else:
+        print("✅ payload column already exists")
+    if activity_columns:
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_slideshow_activity_created_at ON slideshow_activity (created_at)")
+    
+    # Slideshow clients follow the feed by id, so ids must not be reused once the table
+    # is emptied. SQLite cannot add AUTOINCREMENT to a table, so it is rebuilt.
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'slideshow_activity'")
+    activity_table = cursor.fetchone()
+    if activity_table and 'AUTOINCREMENT' not in activity_table[0].upper():
+        print("Rebuilding SlideshowActivity table with AUTOINCREMENT ids...")
+        cursor.execute("""
+            CREATE TABLE slideshow_activity_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                activity_type VARCHAR(50) NOT NULL,
+                content_id INTEGER NOT NULL,
+                content_summary TEXT,
+                payload TEXT,
+                created_at DATETIME,
+                is_active BOOLEAN
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO slideshow_activity_new (id, activity_type, content_id, content_summary, payload, created_at, is_active)
+            SELECT id, activity_type, content_id, content_summary, payload, created_at, is_active FROM slideshow_activity
+        """)
+        cursor.execute("DROP TABLE slideshow_activity")
+        cursor.execute("ALTER TABLE slideshow_activity_new RENAME TO slideshow_activity")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_slideshow_activity_created_at ON slideshow_activity (created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_slideshow_activity_content ON slideshow_activity (activity_type, content_id)")
+        print("✅ SlideshowActivity table rebuilt successfully!")
+    elif activity_table:
+        print("✅ SlideshowActivity ids already use AUTOINCREMENT")
+    
+    # --- Broadcast Notification Migration ---
+    cursor.execute("PRAGMA table_info(notification)")
+    notification_columns = [column[1] for column in cursor.fetchall()]
+    
+    if notification_columns and 'broadcast_id' not in notification_columns:
+        print("Adding broadcast_id column to Notification table...")
+        cursor.execute("ALTER TABLE notification ADD COLUMN broadcast_id INTEGER")
+        print("✅ broadcast_id column added successfully!")
+    else:
+        print("✅ broadcast_id column already exists")
+    if notification_columns:
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_notification_broadcast_id ON notification (broadcast_id)")
+    
     # Commit changes
     conn.commit()
     conn.close()
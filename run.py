@@ -1,6 +1,11 @@
 from app import create_app, db
 from app.models import *
-from app.utils.email_utils import start_email_monitor, get_email_settings
+from app.utils.settings_utils import get_email_settings
+from app.utils.background_services import start_background_services
+from app.utils.search_utils import init_search_index
+from app.utils.db_optimization import db_optimizer
+from app.utils.tag_utils import migrate_photo_tags
+from app.utils.slideshow_utils import backfill_slideshow_activities
 from app.utils.system_logger import log_info, log_error, log_exception
 
 app = create_app()
@@ -9,32 +14,50 @@ if __name__ == '__main__':
     with app.app_context():
         db.create_all()
         
+        # Create query indexes (idempotent) used by gallery and admin listings
+        db_optimizer.create_indexes()
+        
+        # Create or attach the full-text search index
+        init_search_index()
+        
+        # Move any legacy comma-separated tags into the tag tables
+        try:
+            migrated = migrate_photo_tags()
+            if migrated:
+                print(f"Migrated tags for {migrated} photo(s)")
+        except Exception as e:
+            print(f"Error migrating photo tags: {e}")
+            db.session.rollback()
+        
+        # Create slideshow feed rows for content added before the feed was written
+        try:
+            backfilled = backfill_slideshow_activities()
+            if backfilled:
+                print(f"Added {backfilled} item(s) to the slideshow feed")
+        except Exception as e:
+            print(f"Error backfilling slideshow activities: {e}")
+            db.session.rollback()
+        
         # Log application startup
         try:
             log_info('system', 'Application started successfully')
         except Exception as e:
             print(f"Failed to log application startup: {e}")
         
-        # Start email monitor if enabled
+        # Report the email settings the monitor will use
         try:
             email_settings = get_email_settings()
             print(f"Email settings - Enabled: {email_settings['enabled']}, IMAP Username: {email_settings['imap_username']}, IMAP Password: {'*' * len(email_settings['imap_password']) if email_settings['imap_password'] else 'Not set'}")
-            
-            if email_settings['enabled'] and email_settings['imap_username'] and email_settings['imap_password']:
-                start_email_monitor()
-                print("Email monitor started successfully")
-                log_info('email', 'Email monitor started successfully')
-            else:
-                print("Email monitor not started - not enabled or not configured")
-                log_info('email', 'Email monitor not started - not enabled or not configured')
-                if not email_settings['enabled']:
-                    print("  - Email monitoring is disabled")
-                if not email_settings['imap_username']:
-                    print("  - IMAP username not configured")
-                if not email_settings['imap_password']:
-                    print("  - IMAP password not configured")
         except Exception as e:
-            print(f"Email monitor not started: {e}")
-            log_error('email', f'Email monitor failed to start: {e}')
+            print(f"Could not read email settings: {e}")
+        
+    # Start this process's job workers; the email monitor, retry scheduling and
+    # maintenance run in whichever process holds the leader lease
+    try:
+        start_background_services(app)
+    except Exception as e:
+        print(f"Background services not started: {e}")
+        with app.app_context():
+            log_error('system', f'Background services failed to start: {e}')
             
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import *  # noqa: F401,F403  registers every table for create_all
+from app.models.settings import Settings
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Application with a fresh SQLite database; upload folders are created under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    application = create_app()
+    application.config['TESTING'] = True
+
+    with application.app_context():
+        db.create_all()
+        Settings.invalidate_cache()
+        yield application
+        db.session.remove()
+        Settings.invalidate_cache()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,210 @@
+import base64
+import os
+import re
+import time
+
+import pytest
+
+from app import db
+from app.models.email import EmailLog, ProcessedEmail
+from app.models.photo import Photo
+from app.models.settings import Settings
+from app.utils import email_utils
+from app.utils.email_utils import EmailMonitor, process_email_photos
+
+
+class StubMailbox:
+    """In-memory messages served by StubIMAP connections"""
+
+    def __init__(self):
+        self.messages = {}
+
+    def add(self, uid, sender, subject, message_id, attachments=()):
+        """attachments: (filename, bytes) pairs, sent base64 encoded after a text part"""
+        headers = (f"From: {sender}\r\nSubject: {subject}\r\nMessage-ID: <{message_id}>\r\n\r\n").encode()
+        parts = [b'Hello from the wedding!']
+        structure = ['("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 23 1 NIL NIL NIL)']
+        for filename, data in attachments:
+            encoded = base64.encodebytes(data)
+            parts.append(encoded)
+            structure.append(f'("IMAGE" "JPEG" ("NAME" "{filename}") NIL NIL "BASE64" {len(encoded)} NIL'
+                             f' ("ATTACHMENT" ("FILENAME" "{filename}")) NIL)')
+        self.messages[uid] = {
+            'headers': headers,
+            'structure': ('(' + ''.join(structure) + ' "MIXED" ("BOUNDARY" "b") NIL NIL)').encode(),
+            'parts': parts,
+            'seen': False
+        }
+
+
+class StubIMAP:
+    """The subset of imaplib.IMAP4 that email processing uses, answering UID commands from a StubMailbox"""
+
+    capabilities = ('IMAP4REV1',)
+
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+        self.commands = []
+        self.logged_out = False
+
+    def uid(self, command, *args):
+        self.commands.append((command,) + args)
+        if command == 'SEARCH':
+            unseen = [str(uid).encode() for uid, message in sorted(self.mailbox.messages.items()) if not message['seen']]
+            return 'OK', [b' '.join(unseen)]
+        if command == 'STORE':
+            self.mailbox.messages[int(args[0])]['seen'] = True
+            return 'OK', [b'']
+        if command == 'FETCH':
+            return self._fetch(args[0], args[1])
+        return 'NO', [b'unsupported']
+
+    def _fetch(self, uids, items):
+        uids = uids.decode() if isinstance(uids, bytes) else uids
+        response = []
+        for sequence, uid in enumerate(int(uid) for uid in uids.split(',')):
+            message = self.mailbox.messages[uid]
+            part = re.search(r'BODY\.PEEK\[(\d+)\]<(\d+)\.(\d+)>', items)
+            if part:
+                section, offset, length = int(part.group(1)), int(part.group(2)), int(part.group(3))
+                data = message['parts'][section - 1][offset:offset + length]
+                response.append((f'{sequence + 1} (UID {uid} BODY[{section}]<{offset}> {{{len(data)}}}'.encode(), data))
+            else:
+                prefix = f'{sequence + 1} (UID {uid} BODYSTRUCTURE '.encode() + message['structure']
+                prefix += f" BODY[HEADER.FIELDS ({email_utils.EMAIL_HEADER_FIELDS})] {{{len(message['headers'])}}}".encode()
+                response.append((prefix, message['headers']))
+            response.append(b')')
+        return 'OK', response
+
+    def close(self):
+        pass
+
+    def logout(self):
+        self.logged_out = True
+
+
+@pytest.fixture
+def mailbox(app):
+    Settings.set('email_enabled', 'true')
+    Settings.set('email_imap_username', 'photos@example.com')
+    return StubMailbox()
+
+
+def _saved_files(app):
+    folder = app.config['UPLOAD_FOLDER']
+    return sorted(name for name in os.listdir(folder) if os.path.isfile(os.path.join(folder, name)))
+
+
+def test_process_email_photos_saves_attachments_and_marks_read(app, mailbox):
+    mailbox.add(1, 'Guest <guest@example.com>', 'Our photos', 'm1@example.com',
+                [('cake.jpg', b'\xff\xd8cake' * 100), ('dance.jpg', b'\xff\xd8dance' * 100)])
+    mail = StubIMAP(mailbox)
+
+    process_email_photos(mail=mail)
+
+    photos = Photo.query.order_by(Photo.id).all()
+    assert [photo.original_filename for photo in photos] == ['cake.jpg', 'dance.jpg']
+    assert all(photo.uploader_name == 'guest@example.com' for photo in photos)
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], photos[0].filename), 'rb') as f:
+        assert f.read() == b'\xff\xd8cake' * 100
+
+    log = EmailLog.query.one()
+    assert (log.status, log.photo_count) == ('success', 2)
+    assert ProcessedEmail.query.one().status == 'done'
+    assert mailbox.messages[1]['seen']
+    # A connection passed in is left open for the caller
+    assert not mail.logged_out
+
+
+def test_process_email_photos_rejects_email_without_photos(app, mailbox):
+    mailbox.add(1, 'guest@example.com', 'Hello', 'm1@example.com')
+
+    process_email_photos(mail=StubIMAP(mailbox))
+
+    assert Photo.query.count() == 0
+    assert EmailLog.query.one().status == 'rejected'
+    assert mailbox.messages[1]['seen']
+
+
+def test_process_email_photos_skips_already_processed_email(app, mailbox):
+    mailbox.add(1, 'guest@example.com', 'Photos', 'same@example.com', [('a.jpg', b'first')])
+    process_email_photos(mail=StubIMAP(mailbox))
+
+    # The same message delivered again, e.g. after the mailbox was restored
+    mailbox.add(2, 'guest@example.com', 'Photos', 'same@example.com', [('a.jpg', b'first')])
+    process_email_photos(mail=StubIMAP(mailbox))
+
+    assert Photo.query.count() == 1
+    assert EmailLog.query.count() == 1
+    assert mailbox.messages[2]['seen']
+
+
+def test_process_email_photos_downloads_in_parallel_over_connect(app, mailbox, monkeypatch):
+    monkeypatch.setattr(email_utils, 'EMAIL_FETCH_WORKERS', 2)
+    for uid in range(1, 5):
+        mailbox.add(uid, f'guest{uid}@example.com', 'Photos', f'm{uid}@example.com', [(f'p{uid}.jpg', b'photo %d' % uid)])
+    extra_connections = []
+
+    def connect(email_settings):
+        extra_connections.append(StubIMAP(mailbox))
+        return extra_connections[-1]
+
+    mail = StubIMAP(mailbox)
+    process_email_photos(mail=mail, connect=connect)
+
+    assert sorted(photo.original_filename for photo in Photo.query.all()) == ['p1.jpg', 'p2.jpg', 'p3.jpg', 'p4.jpg']
+    assert len(_saved_files(app)) == 4
+    assert all(message['seen'] for message in mailbox.messages.values())
+    # Photos were fetched over the extra connections, which are closed afterwards
+    assert extra_connections and all(connection.logged_out for connection in extra_connections)
+    assert not any('BODY.PEEK[2]' in str(command) for command in mail.commands)
+
+
+def test_process_email_photos_opens_and_closes_its_own_connection(app, mailbox):
+    mailbox.add(1, 'guest@example.com', 'Photos over its own connection', 'own@example.com', [('a.jpg', b'data')])
+    connections = []
+
+    def connect(email_settings):
+        connections.append(StubIMAP(mailbox))
+        return connections[-1]
+
+    process_email_photos(connect=connect)
+
+    assert Photo.query.count() == 1
+    assert len(connections) == 1 and connections[0].logged_out
+
+
+def test_process_email_photos_does_nothing_when_disabled(app, mailbox):
+    Settings.set('email_enabled', 'false')
+    mailbox.add(1, 'guest@example.com', 'Photos', 'm1@example.com', [('a.jpg', b'data')])
+    mail = StubIMAP(mailbox)
+
+    process_email_photos(mail=mail)
+
+    assert mail.commands == []
+    assert db.session.query(Photo.id).count() == 0
+
+
+def test_email_monitor_processes_mail_over_injected_connection(app, mailbox):
+    mailbox.add(1, 'guest@example.com', 'Photos from the monitor', 'monitor@example.com', [('a.jpg', b'data')])
+    connections = []
+
+    def connect(email_settings):
+        connections.append(StubIMAP(mailbox))
+        return connections[-1]
+
+    monitor = EmailMonitor(app, connect=connect)
+    monitor.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not mailbox.messages[1]['seen'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        monitor.stop()
+        monitor.thread.join(timeout=10)
+
+    assert mailbox.messages[1]['seen']
+    assert Photo.query.count() == 1
+    # Stopping ends the thread and logs out of the connection it opened
+    assert not monitor.is_alive()
+    assert len(connections) == 1 and connections[0].logged_out
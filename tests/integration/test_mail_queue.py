@@ -0,0 +1,68 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models.email import EmailLog
+from app.utils import mail_queue
+
+
+class RecordingSender:
+    """Stands in for the shared SMTP connection, recording recipients"""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.sent = []
+
+    def send(self, email_settings, recipient, subject, body):
+        time.sleep(self.delay)
+        self.sent.append(recipient)
+
+
+@pytest.fixture
+def sender(app, monkeypatch):
+    monkeypatch.setattr(mail_queue, 'is_smtp_configured', lambda email_settings: True)
+    recording = RecordingSender(delay=0.02)
+    monkeypatch.setattr(mail_queue, '_smtp_sender', recording)
+    return recording
+
+
+def _queue_replies(count):
+    for number in range(count):
+        db.session.add(EmailLog(sender_email=f'guest{number}@example.com', status='rejected',
+                                response_type='rejection', response_details='{"reason": "No photos"}',
+                                delivery_status='pending', delivery_attempts=0,
+                                next_delivery_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def test_deliver_pending_responses_sends_and_marks_replies(sender):
+    _queue_replies(3)
+
+    assert mail_queue.deliver_pending_responses() == (3, 0)
+
+    assert sorted(sender.sent) == ['guest0@example.com', 'guest1@example.com', 'guest2@example.com']
+    assert {log.delivery_status for log in EmailLog.query.all()} == {'sent'}
+    assert mail_queue.deliver_pending_responses() == (0, 0)
+
+
+def test_overlapping_deliveries_send_each_reply_once(app, sender):
+    _queue_replies(6)
+    results = []
+
+    def deliver():
+        with app.app_context():
+            results.append(mail_queue.deliver_pending_responses())
+            db.session.remove()
+
+    workers = [threading.Thread(target=deliver) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(sender.sent) == sorted(f'guest{number}@example.com' for number in range(6))
+    assert sum(sent for sent, _ in results) == 6
+    assert {log.delivery_status for log in EmailLog.query.all()} == {'sent'}
@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.photo import Photo
+
+
+def _add_photos(count):
+    start = datetime(2026, 1, 1)
+    for number in range(count):
+        db.session.add(Photo(filename=f'p{number}.jpg', original_filename=f'p{number}.jpg',
+                             uploader_name='Guest', upload_date=start + timedelta(minutes=number)))
+    db.session.commit()
+
+
+def test_api_photos_pages_with_cursor(client):
+    _add_photos(5)
+
+    first = client.get('/api/photos?per_page=2').get_json()
+    second = client.get(f"/api/photos?per_page=2&after={first['next_cursor']}").get_json()
+
+    assert [photo['filename'] for photo in first['photos']] == ['p4.jpg', 'p3.jpg']
+    assert [photo['filename'] for photo in second['photos']] == ['p2.jpg', 'p1.jpg']
+    assert first['has_next'] and second['has_next']
+
+
+def test_api_photos_clamps_per_page(client):
+    _add_photos(3)
+
+    # SQLite treats a negative LIMIT as no limit, so it must not reach the query
+    assert client.get('/api/photos?per_page=-3').get_json()['per_page'] == 1
+    assert len(client.get('/api/photos?per_page=-3').get_json()['photos']) == 1
+    assert client.get('/api/photos?per_page=1000').get_json()['per_page'] == 100
@@ -0,0 +1,16 @@
+from app import db
+from app.models.photo import Photo
+from app.utils import search_utils
+
+
+def test_search_clamps_limit(client, monkeypatch):
+    # Build the FTS5 index for this test's database; the module flag is restored afterwards
+    monkeypatch.setattr(search_utils, '_fts_ready', None)
+    assert search_utils.init_search_index()
+    for number in range(3):
+        db.session.add(Photo(filename=f'p{number}.jpg', original_filename=f'p{number}.jpg', description='cake'))
+    db.session.commit()
+
+    # SQLite treats a negative LIMIT as no limit, so it must not reach the query
+    assert len(client.get('/api/search?q=cake&limit=-1').get_json()['results']) == 1
+    assert len(client.get('/api/search?q=cake&limit=0').get_json()['results']) == 1
@@ -0,0 +1,83 @@
+import base64
+import io
+
+from PIL import Image
+
+from app import db
+from app.models.photo import Photo, Tag
+from app.models.slideshow import SlideshowActivity
+from app.utils import media_jobs
+from app.utils.job_queue import claim_next_job, run_job
+
+
+def _image_bytes(image_format):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), 'red').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def test_gallery_upload_saves_photo_with_tags(client):
+    response = client.post('/upload/', data={
+        'photo': (io.BytesIO(_image_bytes('JPEG')), 'cake.jpg'),
+        'uploader_name': 'Guest',
+        'tags': 'Cake, dance'
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    photo = Photo.query.one()
+    assert (photo.original_filename, photo.uploader_name, photo.tags) == ('cake.jpg', 'Guest', 'Cake, dance')
+    assert sorted((tag.slug, tag.photo_count) for tag in Tag.query.all()) == [('cake', 1), ('dance', 1)]
+    assert SlideshowActivity.query.filter_by(activity_type='photo', content_id=photo.id).count() == 1
+
+
+def test_photobooth_save_to_gallery_creates_photo(client):
+    image = 'data:image/png;base64,' + base64.b64encode(_image_bytes('PNG')).decode()
+
+    response = client.post('/photobooth/api/save', json={
+        'image': image,
+        'upload_to_gallery': True,
+        'uploader_name': 'Booth',
+        'tags': 'booth'
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['uploaded'] is True
+    photo = Photo.query.one()
+    assert photo.is_photobooth and photo.tags == 'booth'
+
+
+def _upload_video_and_process(client, monkeypatch, duration):
+    monkeypatch.setattr(media_jobs, 'get_video_duration', lambda path: duration)
+    monkeypatch.setattr(media_jobs, 'create_video_thumbnail', lambda path, thumbnail_path: False)
+    client.post('/upload/', data={
+        'photo': (io.BytesIO(b'not really a video'), 'toast.mp4'),
+        'uploader_name': 'Guest'
+    }, content_type='multipart/form-data')
+
+    # Hidden from the gallery and the slideshow until the duration check has run
+    photo = Photo.query.one()
+    assert photo.is_pending
+    assert client.get('/api/photos').get_json()['photos'] == []
+    assert not SlideshowActivity.query.filter_by(content_id=photo.id).one().is_active
+
+    job = claim_next_job('test')
+    assert job.job_type == 'process_video'
+    return photo.id, run_job(job)
+
+
+def test_video_is_shown_once_duration_check_passes(client, monkeypatch):
+    photo_id, succeeded = _upload_video_and_process(client, monkeypatch, duration=5)
+
+    assert succeeded
+    assert not db.session.get(Photo, photo_id).is_pending
+    assert [photo['id'] for photo in client.get('/api/photos').get_json()['photos']] == [photo_id]
+    assert SlideshowActivity.query.filter_by(content_id=photo_id).one().is_active
+
+
+def test_over_length_video_is_never_shown(client, monkeypatch):
+    photo_id, succeeded = _upload_video_and_process(client, monkeypatch, duration=3600)
+
+    assert not succeeded
+    assert db.session.get(Photo, photo_id) is None
+    assert client.get('/api/photos').get_json()['photos'] == []
+    assert not SlideshowActivity.query.filter_by(content_id=photo_id).one().is_active
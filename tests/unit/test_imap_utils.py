@@ -0,0 +1,131 @@
+import base64
+import binascii
+import io
+
+from app.utils.imap_utils import PartDecoder, iter_body_parts, parse_fetch_response
+
+HEADERS = b'From: Guest <guest@example.com>\r\nSubject: Photos\r\n\r\n'
+
+
+def test_parse_fetch_response_reads_atoms_lists_and_literals():
+    response = [
+        (b'1 (UID 42 FLAGS (\\Seen) BODY[HEADER.FIELDS (FROM SUBJECT)] {%d}' % len(HEADERS), HEADERS),
+        b')'
+    ]
+
+    messages = parse_fetch_response(response)
+
+    assert messages == [{
+        'UID': '42',
+        'FLAGS': ['\\Seen'],
+        'BODY[HEADER.FIELDS (FROM SUBJECT)]': HEADERS
+    }]
+
+
+def test_parse_fetch_response_splits_messages_and_decodes_quoted_strings():
+    response = [
+        b'1 (UID 7 BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 12 1 NIL NIL NIL))',
+        b'2 (UID 8 X-NOTE "say \\"hi\\"")'
+    ]
+
+    messages = parse_fetch_response(response)
+
+    assert [message['UID'] for message in messages] == ['7', '8']
+    assert messages[0]['BODYSTRUCTURE'][:3] == ['TEXT', 'PLAIN', ['CHARSET', 'utf-8']]
+    assert messages[0]['BODYSTRUCTURE'][3] is None
+    assert messages[1]['X-NOTE'] == 'say "hi"'
+
+
+def test_parse_fetch_response_keeps_partial_section_as_one_key():
+    response = [(b'1 (UID 3 BODY[2]<0> {5}', b'abcde'), b')']
+
+    assert parse_fetch_response(response) == [{'UID': '3', 'BODY[2]<0>': b'abcde'}]
+
+
+def test_iter_body_parts_numbers_multipart_sections():
+    structure = parse_fetch_response([
+        b'1 (UID 1 BODYSTRUCTURE (("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 20 2 NIL NIL NIL)'
+        b'("IMAGE" "JPEG" ("NAME" "cake.jpg") NIL NIL "BASE64" 4000 NIL ("ATTACHMENT" ("FILENAME" "cake.jpg")) NIL)'
+        b' "MIXED" ("BOUNDARY" "b1") NIL NIL))'
+    ])[0]['BODYSTRUCTURE']
+
+    parts = list(iter_body_parts(structure))
+
+    assert [part['section'] for part in parts] == ['1', '2']
+    assert parts[0]['content_type'] == 'text/plain'
+    assert parts[0]['disposition'] is None
+    assert parts[1] == {
+        'section': '2',
+        'content_type': 'image/jpeg',
+        'encoding': 'base64',
+        'size': 4000,
+        'disposition': 'attachment',
+        'filename': 'cake.jpg'
+    }
+
+
+def test_iter_body_parts_decodes_encoded_filenames():
+    structure = parse_fetch_response([
+        b'1 (UID 1 BODYSTRUCTURE (("IMAGE" "PNG" NIL NIL NIL "BASE64" 10 NIL'
+        b' ("ATTACHMENT" ("FILENAME*" "utf-8\'\'tarte%20fl%C3%A9e.png")) NIL)'
+        b'("IMAGE" "GIF" ("NAME" "=?utf-8?q?f=C3=AAte.gif?=") NIL NIL "BASE64" 10 NIL ("INLINE" NIL) NIL)'
+        b' "MIXED"))'
+    ])[0]['BODYSTRUCTURE']
+
+    filenames = [part['filename'] for part in iter_body_parts(structure)]
+
+    assert filenames == ['tarte flée.png', 'fête.gif']
+
+
+def test_iter_body_parts_descends_into_attached_emails():
+    inner = (b'(("TEXT" "PLAIN" NIL NIL NIL "7BIT" 5 1 NIL NIL NIL)'
+             b'("IMAGE" "JPEG" NIL NIL NIL "BASE64" 30 NIL ("ATTACHMENT" ("FILENAME" "inner.jpg")) NIL) "MIXED")')
+    structure = parse_fetch_response([
+        b'1 (UID 1 BODYSTRUCTURE (("TEXT" "PLAIN" NIL NIL NIL "7BIT" 5 1 NIL NIL NIL)'
+        b'("MESSAGE" "RFC822" NIL NIL NIL "7BIT" 500 ("date" "subj" NIL NIL NIL NIL NIL NIL NIL NIL) ' + inner + b' 20)'
+        b' "MIXED"))'
+    ])[0]['BODYSTRUCTURE']
+
+    parts = list(iter_body_parts(structure))
+
+    assert [(part['section'], part['filename']) for part in parts] == [('1', None), ('2.1', None), ('2.2', 'inner.jpg')]
+
+
+def test_iter_body_parts_single_part_email_is_section_one():
+    structure = ['IMAGE', 'JPEG', None, None, None, 'BASE64', '8', None, ['ATTACHMENT', ['FILENAME', 'a.jpg']], None]
+
+    assert [part['section'] for part in iter_body_parts(structure)] == ['1']
+
+
+def _decode_in_chunks(encoding, encoded, chunk_size):
+    output = io.BytesIO()
+    decoder = PartDecoder(encoding, output)
+    for start in range(0, len(encoded), chunk_size):
+        decoder.write(encoded[start:start + chunk_size])
+    decoder.close()
+    return output.getvalue()
+
+
+def test_part_decoder_base64_across_arbitrary_chunks():
+    data = bytes(range(256)) * 3
+    encoded = base64.encodebytes(data)  # wrapped at 76 characters with newlines
+
+    for chunk_size in (1, 3, 7, 76, 1000):
+        assert _decode_in_chunks('base64', encoded, chunk_size) == data
+
+
+def test_part_decoder_base64_tolerates_missing_padding():
+    assert _decode_in_chunks('base64', base64.b64encode(b'hello').rstrip(b'='), 2) == b'hello'
+
+
+def test_part_decoder_quoted_printable_keeps_escapes_and_soft_breaks_whole():
+    text = ('Café ' * 30).encode('utf-8')
+    encoded = binascii.b2a_qp(text)
+    assert b'=\n' in encoded
+
+    for chunk_size in (1, 2, 5, 64):
+        assert _decode_in_chunks('quoted-printable', encoded, chunk_size) == text
+
+
+def test_part_decoder_passes_other_encodings_through():
+    assert _decode_in_chunks('7bit', b'plain\r\nbytes', 4) == b'plain\r\nbytes'